@@ -51,8 +51,9 @@ class NetworkScannerServer:
 
         from concurrent.futures import ThreadPoolExecutor, as_completed
         from snmp_helper import SNMPHelper
+        snmp_infos = SNMPHelper.get_all_info_many([host['ip'] for host in all_hosts])
         def enrich_host(host):
-            host['snmp_info'] = SNMPHelper.get_all_info(host['ip'])
+            host['snmp_info'] = snmp_infos.get(host['ip'], {})
             host['name'] = HostScanner.get_hostname(host['ip'])
             return host
         with ThreadPoolExecutor(max_workers=100) as executor:
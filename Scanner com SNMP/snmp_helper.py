@@ -1,5 +1,44 @@
-import subprocess
-import re
+import asyncio
+import threading
+from pysnmp.hlapi.asyncio import (
+    get_cmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity,
+    NoSuchObject, NoSuchInstance, EndOfMibView,
+)
+
+SNMP_PORT = 161
+SNMP_TIMEOUT = 1
+SNMP_RETRIES = 1
+SNMP_CONCURRENCY = 100  # Hosts consultados ao mesmo tempo por get_all_info_many
+
+
+class _SnmpLoop:
+    # Loop asyncio numa thread de fundo, com um único SnmpEngine (um socket UDP)
+    # compartilhado por todas as consultas, venham de qualquer thread.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._engine = None
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='snmp-helper', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def engine(self):
+        # Só chamado dentro do loop: o dispatcher do pysnmp fica preso a ele
+        if self._engine is None:
+            self._engine = SnmpEngine()
+        return self._engine
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+
+_SNMP_LOOP = _SnmpLoop()
+
 
 class SNMPHelper:
     OIDS = {
@@ -16,24 +55,59 @@ class SNMPHelper:
     }
 
     @staticmethod
-    def snmp_get(ip, community, oid):
+    async def _get_many(ip, community, oids):
+        # Todos os OIDs numa única PDU GET (v1). Se o agente não tiver algum,
+        # responde noSuchName apontando o culpado em error_index: ele sai da
+        # lista e a consulta é repetida com os demais.
+        pending = list(oids)
+        values = {}
         try:
-            result = subprocess.check_output(
-                ['snmpget', '-v1', '-c', community, ip, oid],
-                stderr=subprocess.STDOUT
-            ).decode(errors='ignore')
-            match = re.search(r'=\s+\w+:\s+(.+)', result)
-            if match:
-                return match.group(1).strip()
-            return result.strip()
+            target = await UdpTransportTarget.create((ip, SNMP_PORT), timeout=SNMP_TIMEOUT, retries=SNMP_RETRIES)
+            while pending:
+                error_indication, error_status, error_index, var_binds = await get_cmd(
+                    _SNMP_LOOP.engine(),
+                    CommunityData(community, mpModel=0),
+                    target,
+                    ContextData(),
+                    *[ObjectType(ObjectIdentity(oid)) for oid in pending],
+                    lookupMib=False,
+                )
+                if error_indication:
+                    break
+                if error_status:
+                    bad = int(error_index) - 1
+                    if 0 <= bad < len(pending):
+                        del pending[bad]
+                        continue
+                    break
+                for oid, (_, value) in zip(pending, var_binds):
+                    if not isinstance(value, (NoSuchObject, NoSuchInstance, EndOfMibView)):
+                        values[oid] = str(value)
+                break
         except Exception:
-            return None
+            pass
+        return values
+
+    @classmethod
+    async def _get_info(cls, ip, community):
+        values = await cls._get_many(ip, community, list(cls.OIDS.values()))
+        return {desc: values[oid] for desc, oid in cls.OIDS.items() if values.get(oid)}
+
+    @classmethod
+    async def _get_info_many(cls, ips, community):
+        semaphore = asyncio.Semaphore(SNMP_CONCURRENCY)
+
+        async def get_one(ip):
+            async with semaphore:
+                return ip, await cls._get_info(ip, community)
+
+        return dict(await asyncio.gather(*(get_one(ip) for ip in ips)))
 
     @classmethod
     def get_all_info(cls, ip, community='public'):
-        info = {}
-        for desc, oid in cls.OIDS.items():
-            value = cls.snmp_get(ip, community, oid)
-            if value:
-                info[desc] = value
-        return info
+        return _SNMP_LOOP.run(cls._get_info(ip, community))
+
+    @classmethod
+    def get_all_info_many(cls, ips, community='public'):
+        # Consulta vários hosts de uma vez no loop de fundo; devolve {ip: info}
+        return _SNMP_LOOP.run(cls._get_info_many(list(ips), community))
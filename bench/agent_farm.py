@@ -0,0 +1,469 @@
+import argparse
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+import time
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Fazenda de agentes SNMP simulados para os benchmarks.
+#
+# Um único socket UDP atende milhares de agentes virtuais: no Linux, todo o
+# 127.0.0.0/8 é entregue à interface de loopback, e IP_PKTINFO informa para
+# qual endereço cada pedido foi enviado (e define a origem da resposta).
+# Cada agente tem latência, perda e OIDs ausentes próprios, sorteados de
+# forma determinística a partir da semente e do IP, então duas execuções com
+# os mesmos parâmetros veem exatamente a mesma rede. O ICMP é respondido
+# pelo próprio kernel na loopback.
+
+FARM_CIDR = '127.20.0.0/20'   # 4094 agentes
+FARM_PORT = 16161
+FARM_DNS_PORT = 16053
+FARM_COMMUNITY = 'public'
+FARM_INTERFACES = 4           # Linhas da ifTable/ifXTable de cada agente
+
+IP_PKTINFO = getattr(socket, 'IP_PKTINFO', 8)  # Linux; ausente no módulo socket de algumas versões
+_PKTINFO = struct.Struct('@i4s4s')
+
+# Tipos BER/SNMP
+_INTEGER, _OCTETS, _NULL, _OID, _SEQUENCE = 0x02, 0x04, 0x05, 0x06, 0x30
+_COUNTER32, _GAUGE32, _TIMETICKS, _COUNTER64 = 0x41, 0x42, 0x43, 0x46
+_NO_SUCH_OBJECT, _END_OF_MIB = 0x80, 0x82
+_GET, _GETNEXT, _RESPONSE, _GETBULK = 0xA0, 0xA1, 0xA2, 0xA5
+_NO_SUCH_NAME = 2
+
+Value = Tuple[int, Any]
+
+
+# --- Codificação BER mínima (só o que um agente SNMP v1/v2c precisa) ---
+
+def _length(n: int) -> bytes:
+    if n < 0x80:
+        return bytes([n])
+    raw = n.to_bytes((n.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(raw)]) + raw
+
+
+def _tlv(tag: int, payload: bytes) -> bytes:
+    return bytes([tag]) + _length(len(payload)) + payload
+
+
+def _int(value: int, tag: int = _INTEGER) -> bytes:
+    if tag == _INTEGER:
+        size = max(1, (value.bit_length() + 8) // 8)
+        return _tlv(tag, value.to_bytes(size, 'big', signed=True))
+    # Contadores e gauges são sem sinal; um zero à esquerda evita o bit de sinal
+    size = max(1, (value.bit_length() + 8) // 8)
+    return _tlv(tag, value.to_bytes(size, 'big'))
+
+
+def _oid_bytes(oid: Tuple[int, ...]) -> bytes:
+    out = bytearray([oid[0] * 40 + oid[1]])
+    for arc in oid[2:]:
+        chunk = [arc & 0x7F]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7F))
+            arc >>= 7
+        out.extend(reversed(chunk))
+    return _tlv(_OID, bytes(out))
+
+
+def _read(buf: bytes, offset: int) -> Tuple[int, bytes, int]:
+    """Lê um TLV; devolve (tag, conteúdo, próximo offset)."""
+    tag = buf[offset]
+    length = buf[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(buf[offset:offset + count], 'big')
+        offset += count
+    return tag, buf[offset:offset + length], offset + length
+
+
+def _parse_oid(raw: bytes) -> Tuple[int, ...]:
+    arcs = [raw[0] // 40, raw[0] % 40]
+    value = 0
+    for byte in raw[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            arcs.append(value)
+            value = 0
+    return tuple(arcs)
+
+
+def _oid(text: str) -> Tuple[int, ...]:
+    return tuple(int(arc) for arc in text.split('.'))
+
+
+# --- Agentes ---
+
+class AgentProfile:
+    """Comportamento de um agente virtual: latência, perda e OIDs que ele não tem."""
+
+    __slots__ = ('latency', 'loss', 'missing', 'mib', 'keys', 'started')
+
+    def __init__(self, ip: str, rng: random.Random, latency: float, jitter: float,
+                 loss: float, missing: float):
+        self.latency = max(0.0, latency + rng.uniform(-jitter, jitter))
+        self.loss = loss
+        self.started = time.monotonic() - rng.uniform(0, 86400)
+        self.mib: Dict[Tuple[int, ...], Callable[[], Value]] = {}
+        self._build(ip, rng)
+        # Parte dos OIDs é sorteada como ausente (agente sem UCD-SNMP, por exemplo)
+        self.missing = {oid for oid in self.mib if rng.random() < missing}
+        self.keys = sorted(oid for oid in self.mib if oid not in self.missing)
+
+    def _build(self, ip: str, rng: random.Random) -> None:
+        started = self.started
+
+        def const(tag: int, value: Any) -> Callable[[], Value]:
+            return lambda: (tag, value)
+
+        def uptime() -> Value:
+            return _TIMETICKS, int((time.monotonic() - started) * 100) & 0xFFFFFFFF
+
+        def counter(rate: int, tag: int = _COUNTER32) -> Callable[[], Value]:
+            mask = 0xFFFFFFFF if tag == _COUNTER32 else 0xFFFFFFFFFFFFFFFF
+            return lambda: (tag, int((time.monotonic() - started) * rate) & mask)
+
+        name = 'agent-' + ip.replace('.', '-')
+        mib = self.mib
+        mib[_oid('1.3.6.1.2.1.1.1.0')] = const(_OCTETS, f'Simulated agent {ip} (bench)'.encode())
+        mib[_oid('1.3.6.1.2.1.1.2.0')] = const(_OID, _oid('1.3.6.1.4.1.8072.3.2.10'))
+        mib[_oid('1.3.6.1.2.1.1.3.0')] = uptime
+        mib[_oid('1.3.6.1.2.1.1.4.0')] = const(_OCTETS, b'bench@localhost')
+        mib[_oid('1.3.6.1.2.1.1.5.0')] = const(_OCTETS, name.encode())
+        mib[_oid('1.3.6.1.2.1.1.7.0')] = const(_INTEGER, 72)
+        mib[_oid('1.3.6.1.2.1.2.1.0')] = const(_INTEGER, FARM_INTERFACES)
+        mib[_oid('1.3.6.1.4.1.2021.11.11.0')] = const(_INTEGER, rng.randint(0, 100))
+        mib[_oid('1.3.6.1.4.1.2021.4.5.0')] = const(_INTEGER, 4 * 1024 * 1024)
+        mib[_oid('1.3.6.1.4.1.2021.4.6.0')] = const(_INTEGER, rng.randint(0, 4 * 1024 * 1024))
+        for index in range(1, FARM_INTERFACES + 1):
+            mac = bytes([0x02, 0x00]) + ipaddress.ip_address(ip).packed[1:] + bytes([index])
+            rate = rng.randint(1000, 10_000_000)
+            if_entry = '1.3.6.1.2.1.2.2.1'
+            ifx_entry = '1.3.6.1.2.1.31.1.1.1'
+            mib[_oid(f'{if_entry}.1.{index}')] = const(_INTEGER, index)
+            mib[_oid(f'{if_entry}.2.{index}')] = const(_OCTETS, f'eth{index - 1}'.encode())
+            mib[_oid(f'{if_entry}.3.{index}')] = const(_INTEGER, 6)
+            mib[_oid(f'{if_entry}.4.{index}')] = const(_INTEGER, 1500)
+            mib[_oid(f'{if_entry}.5.{index}')] = const(_GAUGE32, 1_000_000_000)
+            mib[_oid(f'{if_entry}.6.{index}')] = const(_OCTETS, mac)
+            mib[_oid(f'{if_entry}.7.{index}')] = const(_INTEGER, 1)
+            mib[_oid(f'{if_entry}.8.{index}')] = const(_INTEGER, 1 if index <= FARM_INTERFACES // 2 + 1 else 2)
+            mib[_oid(f'{if_entry}.10.{index}')] = counter(rate)
+            mib[_oid(f'{if_entry}.16.{index}')] = counter(rate // 2)
+            mib[_oid(f'{ifx_entry}.1.{index}')] = const(_OCTETS, f'eth{index - 1}'.encode())
+            mib[_oid(f'{ifx_entry}.6.{index}')] = counter(rate, _COUNTER64)
+            mib[_oid(f'{ifx_entry}.10.{index}')] = counter(rate // 2, _COUNTER64)
+            mib[_oid(f'{ifx_entry}.15.{index}')] = const(_GAUGE32, 1000)
+            mib[_oid(f'{ifx_entry}.18.{index}')] = const(_OCTETS, f'uplink {index}'.encode())
+
+    def get(self, oid: Tuple[int, ...]) -> Optional[Value]:
+        if oid in self.missing:
+            return None
+        value = self.mib.get(oid)
+        return value() if value is not None else None
+
+    def next(self, oid: Tuple[int, ...]) -> Optional[Tuple[Tuple[int, ...], Value]]:
+        index = bisect_right(self.keys, oid)
+        if index >= len(self.keys):
+            return None
+        key = self.keys[index]
+        return key, self.mib[key]()
+
+
+def _encode_value(value: Value) -> bytes:
+    tag, raw = value
+    if tag == _OCTETS:
+        return _tlv(_OCTETS, raw)
+    if tag == _OID:
+        return _oid_bytes(raw)
+    return _int(raw, tag)
+
+
+class AgentFarm:
+    """
+    Milhares de agentes SNMP v1/v2c virtuais atrás de um único socket UDP.
+
+    Responde GET, GETNEXT e GETBULK. Pedidos com outra comunidade são
+    ignorados, como faria um agente real. Os contadores (`requests`,
+    `responses`, `dropped`) servem de medida de pacotes enviados pelo
+    scanner, inclusive retransmissões.
+    """
+
+    def __init__(self, cidr: str = FARM_CIDR, port: int = FARM_PORT, community: str = FARM_COMMUNITY,
+                 latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0,
+                 missing: float = 0.0, silent: float = 0.0, seed: int = 1):
+        self.network = ipaddress.ip_network(cidr, strict=False)
+        if self.network.version != 4:
+            raise ValueError("A fazenda de agentes só simula IPv4 (127.0.0.0/8 ou interfaces dummy)")
+        self.port = port
+        self.community = community.encode()
+        self.latency, self.jitter, self.loss, self.missing = latency, jitter, loss, missing
+        self.silent = silent
+        self.seed = seed
+        self.requests = 0
+        self.responses = 0
+        self.dropped = 0
+        self._agents: Dict[str, Optional[AgentProfile]] = {}
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def agent(self, ip: str) -> Optional[AgentProfile]:
+        """Perfil do agente no IP, criado sob demanda; None se o IP não tem agente."""
+        if ip in self._agents:
+            return self._agents[ip]
+        profile: Optional[AgentProfile] = None
+        address = ipaddress.ip_address(ip)
+        if address in self.network:
+            rng = random.Random(self.seed * 0x9E3779B1 ^ int(address))
+            # Parte dos endereços não tem agente SNMP (o host só responde ICMP)
+            if rng.random() >= self.silent:
+                profile = AgentProfile(ip, rng, self.latency, self.jitter, self.loss, self.missing)
+        self._agents[ip] = profile
+        return profile
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+        sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+        sock.bind(('0.0.0.0', self.port))
+        sock.setblocking(False)
+        self._sock = sock
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            assert self._loop is not None
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+
+    def stats(self) -> Dict[str, int]:
+        return {'requests': self.requests, 'responses': self.responses, 'dropped': self.dropped,
+                'agents': sum(1 for profile in self._agents.values() if profile is not None)}
+
+    def _on_readable(self) -> None:
+        assert self._sock is not None and self._loop is not None
+        while True:
+            try:
+                data, ancdata, _, addr = self._sock.recvmsg(65535, socket.CMSG_SPACE(_PKTINFO.size))
+            except (BlockingIOError, InterruptedError):
+                return
+            destination = None
+            for level, kind, payload in ancdata:
+                if level == socket.IPPROTO_IP and kind == IP_PKTINFO:
+                    destination = socket.inet_ntoa(_PKTINFO.unpack(payload[:_PKTINFO.size])[2])
+            if destination is None:
+                continue
+            self.requests += 1
+            agent = self.agent(destination)
+            if agent is None or (agent.loss and random.random() < agent.loss):
+                self.dropped += 1
+                continue
+            try:
+                response = self._respond(agent, data)
+            except (IndexError, ValueError):
+                response = None  # Pacote malformado: um agente real também ignoraria
+            if response is None:
+                self.dropped += 1
+            elif agent.latency:
+                self._loop.call_later(agent.latency, self._send, response, addr, destination)
+            else:
+                self._send(response, addr, destination)
+
+    def _send(self, data: bytes, addr: Tuple[str, int], source: str) -> None:
+        if self._sock is None:
+            return
+        pktinfo = _PKTINFO.pack(0, socket.inet_aton(source), b'\x00' * 4)
+        try:
+            self._sock.sendmsg([data], [(socket.IPPROTO_IP, IP_PKTINFO, pktinfo)], 0, addr)
+            self.responses += 1
+        except OSError:
+            self.dropped += 1
+
+    def _respond(self, agent: AgentProfile, data: bytes) -> Optional[bytes]:
+        _, message, _ = _read(data, 0)
+        _, version, offset = _read(message, 0)
+        _, community, offset = _read(message, offset)
+        pdu_type, pdu, _ = _read(message, offset)
+        if community != self.community:
+            return None
+        v1 = int.from_bytes(version, 'big') == 0
+        _, request_id, offset = _read(pdu, 0)
+        _, field1, offset = _read(pdu, offset)
+        _, field2, offset = _read(pdu, offset)
+        _, bindings, _ = _read(pdu, offset)
+        oids: List[Tuple[int, ...]] = []
+        offset = 0
+        while offset < len(bindings):
+            _, binding, offset = _read(bindings, offset)
+            _, raw_oid, _ = _read(binding, 0)
+            oids.append(_parse_oid(raw_oid))
+
+        results: List[bytes] = []
+        error_status = error_index = 0
+        if pdu_type == _GETBULK and not v1:
+            non_repeaters = int.from_bytes(field1, 'big')
+            repetitions = int.from_bytes(field2, 'big')
+            for oid in oids[:non_repeaters]:
+                results.append(self._next_binding(agent, oid))
+            cursors = oids[non_repeaters:]
+            for _ in range(repetitions):
+                if not cursors:
+                    break
+                row = []
+                for position, oid in enumerate(cursors):
+                    found = agent.next(oid)
+                    if found is None:
+                        row.append(_tlv(_SEQUENCE, _oid_bytes(oid) + _tlv(_END_OF_MIB, b'')))
+                    else:
+                        cursors[position] = found[0]
+                        row.append(_tlv(_SEQUENCE, _oid_bytes(found[0]) + _encode_value(found[1])))
+                results.extend(row)
+                if len(results) > 256:
+                    break
+        else:
+            for index, oid in enumerate(oids, start=1):
+                if pdu_type == _GETNEXT:
+                    binding = self._next_binding(agent, oid)
+                    if v1 and binding.endswith(_tlv(_END_OF_MIB, b'')):
+                        error_status, error_index = _NO_SUCH_NAME, index
+                    results.append(binding)
+                    continue
+                value = agent.get(oid)
+                if value is None:
+                    if v1:
+                        error_status, error_index = _NO_SUCH_NAME, index
+                    results.append(_tlv(_SEQUENCE, _oid_bytes(oid) + _tlv(_NO_SUCH_OBJECT, b'')))
+                else:
+                    results.append(_tlv(_SEQUENCE, _oid_bytes(oid) + _encode_value(value)))
+            if v1 and error_status:
+                # SNMPv1: erro devolve a lista original, com valores nulos
+                results = [_tlv(_SEQUENCE, _oid_bytes(oid) + _tlv(_NULL, b'')) for oid in oids]
+
+        body = (_tlv(_INTEGER, request_id) + _int(error_status) + _int(error_index)
+                + _tlv(_SEQUENCE, b''.join(results)))
+        return _tlv(_SEQUENCE, _tlv(_INTEGER, version) + _tlv(_OCTETS, community) + _tlv(_RESPONSE, body))
+
+    @staticmethod
+    def _next_binding(agent: AgentProfile, oid: Tuple[int, ...]) -> bytes:
+        found = agent.next(oid)
+        if found is None:
+            return _tlv(_SEQUENCE, _oid_bytes(oid) + _tlv(_END_OF_MIB, b''))
+        return _tlv(_SEQUENCE, _oid_bytes(found[0]) + _encode_value(found[1]))
+
+
+class FarmDns(asyncio.DatagramProtocol):
+    """
+    Servidor DNS mínimo que responde PTR para os agentes da fazenda, para que
+    o enriquecimento (DNS reverso) seja medido sem depender da rede real.
+    """
+
+    def __init__(self, farm: AgentFarm):
+        self.farm = farm
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        if len(data) < 12 or self.transport is None:
+            return
+        labels, offset = [], 12
+        while offset < len(data) and data[offset]:
+            length = data[offset]
+            labels.append(data[offset + 1:offset + 1 + length].decode('ascii', 'replace'))
+            offset += 1 + length
+        question = data[12:offset + 5]
+        ip = '.'.join(reversed(labels[:4])) if labels[4:6] == ['in-addr', 'arpa'] else ''
+        txid = data[:2]
+        if ip and self.farm.agent(ip) is not None:
+            name = b''.join(bytes([len(part)]) + part.encode() for part in
+                            ('agent-' + ip.replace('.', '-'), 'bench', 'local')) + b'\x00'
+            answer = b'\xc0\x0c' + struct.pack('!HHIH', 12, 1, 300, len(name)) + name
+            header = txid + struct.pack('!HHHHH', 0x8180, 1, 1, 0, 0)
+            self.transport.sendto(header + question + answer, addr)
+        else:
+            header = txid + struct.pack('!HHHHH', 0x8183, 1, 0, 0, 0)
+            self.transport.sendto(header + question, addr)
+
+
+async def _serve(farm: AgentFarm, dns_port: Optional[int], ready: Callable[[], None],
+                 stop: 'asyncio.Future[None]') -> None:
+    loop = asyncio.get_running_loop()
+    farm.start()
+    transport = None
+    if dns_port:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: FarmDns(farm), local_addr=('127.0.0.1', dns_port))
+    ready()
+    try:
+        await stop
+    finally:
+        farm.close()
+        if transport is not None:
+            transport.close()
+
+
+def run_in_process(conn: Any, options: Dict[str, Any], dns_port: Optional[int]) -> None:
+    """
+    Alvo de multiprocessing.Process: sobe a fazenda, avisa 'ready' pelo pipe e
+    responde até receber qualquer mensagem; devolve então os contadores.
+    """
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        farm = AgentFarm(**options)
+        stop = loop.create_future()
+
+        def on_message() -> None:
+            conn.recv()
+            loop.remove_reader(conn.fileno())
+            if not stop.done():
+                stop.set_result(None)
+
+        loop.add_reader(conn.fileno(), on_message)
+        await _serve(farm, dns_port, lambda: conn.send('ready'), stop)
+        conn.send(farm.stats())
+
+    asyncio.run(main())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Linha de comando: sobe a fazenda até Ctrl+C (para testes manuais do servidor)."""
+    parser = argparse.ArgumentParser(description="Fazenda de agentes SNMP simulados (loopback).")
+    parser.add_argument('--cidr', default=FARM_CIDR, help=f"Faixa dos agentes. Padrão: {FARM_CIDR}")
+    parser.add_argument('--port', type=int, default=FARM_PORT, help=f"Porta SNMP. Padrão: {FARM_PORT}")
+    parser.add_argument('--dns-port', type=int, default=FARM_DNS_PORT,
+                        help=f"Porta do DNS reverso em 127.0.0.1 (0 desativa). Padrão: {FARM_DNS_PORT}")
+    parser.add_argument('--community', default=FARM_COMMUNITY)
+    parser.add_argument('--latency', type=float, default=0.0, help="Latência média de resposta (ms)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Variação da latência por agente (ms)")
+    parser.add_argument('--loss', type=float, default=0.0, help="Probabilidade de perda de cada pedido")
+    parser.add_argument('--missing', type=float, default=0.0, help="Fração de OIDs ausentes em cada agente")
+    parser.add_argument('--silent', type=float, default=0.0, help="Fração de endereços sem agente SNMP")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    farm = AgentFarm(args.cidr, args.port, args.community, args.latency / 1000, args.jitter / 1000,
+                     args.loss, args.missing, args.silent, args.seed)
+
+    async def run() -> None:
+        stop = asyncio.get_running_loop().create_future()
+        print(f"Fazenda de agentes em {args.cidr}, porta {args.port}. Ctrl+C para encerrar.")
+        await _serve(farm, args.dns_port, lambda: None, stop)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print(f"Encerrada: {farm.stats()}")
+
+
+if __name__ == '__main__':
+    main()
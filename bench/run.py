@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from .agent_farm import FARM_COMMUNITY, FARM_DNS_PORT, FARM_PORT, run_in_process
+
+# Benchmark reprodutível do scanner contra a fazenda de agentes simulados.
+#
+# Cada cenário roda em um processo próprio (pico de RSS isolado), contra uma
+# fazenda nova em outro processo (contadores de pacotes isolados):
+#   probe_snmp_info  GET de SNMP_OIDS em cada agente
+#   scan_host        sondagem completa (SNMP, ICMP e enriquecimento) de cada endereço
+#   server           varredura de ponta a ponta pelo servidor TCP (protocolo NDJSON)
+#
+# Uso:
+#   python -m bench.run --save base.json
+#   python -m bench.run --baseline base.json   # sai com código 1 se houver regressão
+
+BENCH_CIDR = '127.20.0.0/22'  # 1022 agentes
+BENCH_CONCURRENCY = 256
+BENCH_TOLERANCE = 0.15        # Piora relativa aceita antes de acusar regressão
+SCENARIOS = ('probe_snmp_info', 'scan_host', 'server')
+
+Result = Dict[str, Any]
+
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def _icmp_echo_requests() -> Optional[int]:
+    """Echo Requests enviados pela máquina (IcmpMsg OutType8 em /proc/net/snmp)."""
+    try:
+        with open('/proc/net/snmp', encoding='ascii') as f:
+            lines = [line.split() for line in f if line.startswith('IcmpMsg:')]
+    except OSError:
+        return None
+    if len(lines) < 2:
+        return 0
+    counters = dict(zip(lines[0][1:], lines[1][1:]))
+    return int(counters.get('OutType8', 0))
+
+
+async def _probe_each(cidr: str, concurrency: int, probe: Any) -> Result:
+    from scanner.utils import parse_cidr
+
+    host_range = parse_cidr(cidr)
+    assert host_range is not None
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    found = 0
+
+    async def run(ip: str) -> None:
+        nonlocal found
+        async with semaphore:
+            started = time.perf_counter()
+            result = await probe(ip)
+            latencies.append(time.perf_counter() - started)
+            if result:
+                found += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(ip) for ip in host_range))
+    return {'hosts': host_range.size, 'found': found, 'elapsed': time.perf_counter() - started,
+            'latencies': latencies}
+
+
+async def _scenario_probe_snmp_info(cidr: str, concurrency: int) -> Result:
+    from scanner.probes import probe_snmp_info
+    return await _probe_each(cidr, concurrency, lambda ip: probe_snmp_info(ip, FARM_COMMUNITY))
+
+
+async def _scenario_scan_host(cidr: str, concurrency: int) -> Result:
+    from scanner.engine import scan_host
+    return await _probe_each(cidr, concurrency, lambda ip: scan_host(ip, FARM_COMMUNITY))
+
+
+async def _scenario_server(cidr: str, concurrency: int) -> Result:
+    """Servidor real (handle_client) em porta efêmera, com um cliente NDJSON."""
+    from scanner.server import handle_client
+
+    server = await asyncio.start_server(handle_client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=1024 * 1024)
+        frame = {'v': 1, 'id': 'bench', 'type': 'scan', 'cidr': cidr,
+                 'community': FARM_COMMUNITY, 'concurrency': concurrency}
+        started = time.perf_counter()
+        writer.write(json.dumps(frame).encode() + b'\n')
+        await writer.drain()
+        arrivals: List[float] = []
+        total = 0
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise RuntimeError("Servidor encerrou a conexão antes do quadro 'done'")
+            response = json.loads(line)
+            if response['type'] == 'host':
+                arrivals.append(time.perf_counter() - started)
+            elif response['type'] == 'accepted':
+                total = response['total']
+            elif response['type'] == 'error':
+                raise RuntimeError(response['message'])
+            elif response['type'] == 'done':
+                break
+        elapsed = time.perf_counter() - started
+        # Encerra a sessão como um cliente normal: EOF e espera o servidor fechar
+        writer.write_eof()
+        while await reader.read(65536):
+            pass
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+    # Sem medida por host do lado de fora do servidor: só o primeiro resultado
+    return {'hosts': total, 'found': len(arrivals), 'elapsed': elapsed, 'latencies': [],
+            'first_host': arrivals[0] if arrivals else None}
+
+
+def _run_scenario(conn: Any, name: str, cidr: str, concurrency: int,
+                  farm_port: int, dns_port: int) -> None:
+    """
+    Alvo do processo de cada cenário: aponta o scanner para a fazenda e mede.
+
+    O histórico e as séries temporais vão para um diretório temporário, para
+    que os hosts simulados não entrem nos dados do usuário.
+    """
+    import resource
+
+    from scanner import probes
+    from scanner.dns_resolver import PTR_RESOLVER
+    from scanner.probes import ENGINE_POOL
+    from scanner.store import RESULT_STORE
+    from scanner.timeseries import TIMESERIES
+
+    probes.SNMP_PORT = farm_port
+    PTR_RESOLVER.nameservers = [('127.0.0.1', dns_port)]
+    PTR_RESOLVER.hosts = {}
+    scenario = {
+        'probe_snmp_info': _scenario_probe_snmp_info,
+        'scan_host': _scenario_scan_host,
+        'server': _scenario_server,
+    }[name]
+
+    async def main() -> Result:
+        try:
+            return await scenario(cidr, concurrency)
+        finally:
+            ENGINE_POOL.close()
+            PTR_RESOLVER.close()
+
+    saved_paths = RESULT_STORE.path, TIMESERIES.path
+    with tempfile.TemporaryDirectory(prefix='scanner-bench-') as data_dir:
+        RESULT_STORE.path = os.path.join(data_dir, 'history.sqlite3')
+        TIMESERIES.path = os.path.join(data_dir, 'timeseries')
+        try:
+            result = asyncio.run(main())
+        finally:
+            RESULT_STORE.close()
+            TIMESERIES.close()
+            RESULT_STORE.path, TIMESERIES.path = saved_paths
+    # ru_maxrss em kB no Linux
+    result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    conn.send(result)
+
+
+def run_benchmark(name: str, cidr: str, concurrency: int, farm_options: Dict[str, Any],
+                  farm_port: int = FARM_PORT, dns_port: int = FARM_DNS_PORT) -> Result:
+    """Executa um cenário contra uma fazenda nova e devolve as métricas."""
+    context = multiprocessing.get_context('spawn')
+    farm_conn, farm_child = context.Pipe()
+    farm = context.Process(target=run_in_process, daemon=True,
+                           args=(farm_child, dict(farm_options, cidr=cidr, port=farm_port), dns_port))
+    farm.start()
+    # Sem a ponta do filho no pai, a morte do processo vira EOF em recv()
+    farm_child.close()
+    try:
+        ready = farm_conn.poll(30) and farm_conn.recv() == 'ready'
+    except EOFError:
+        ready = False
+    if not ready:
+        farm.kill()
+        raise RuntimeError("A fazenda de agentes não subiu")
+
+    icmp_before = _icmp_echo_requests()
+    conn, child = context.Pipe()
+    worker = context.Process(target=_run_scenario,
+                             args=(child, name, cidr, concurrency, farm_port, dns_port))
+    worker.start()
+    child.close()
+    try:
+        raw = conn.recv()
+    except EOFError:
+        raise RuntimeError(f"Cenário {name} terminou sem resultado") from None
+    finally:
+        worker.join()
+        farm_conn.send('stop')
+        farm_stats = farm_conn.recv()
+        farm.join()
+        conn.close()
+        farm_conn.close()
+    icmp_after = _icmp_echo_requests()
+
+    latencies = raw.pop('latencies')
+    p50 = _percentile(latencies, 50)
+    p99 = _percentile(latencies, 99)
+    result: Result = {
+        'scenario': name,
+        'hosts': raw['hosts'],
+        'found': raw['found'],
+        'elapsed_s': round(raw['elapsed'], 3),
+        'hosts_per_s': round(raw['hosts'] / raw['elapsed'], 1) if raw['elapsed'] else None,
+        'p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+        'p99_ms': round(p99 * 1000, 2) if p99 is not None else None,
+        'snmp_packets': farm_stats['requests'],
+        'snmp_dropped': farm_stats['dropped'],
+        'icmp_packets': icmp_after - icmp_before if icmp_before is not None and icmp_after is not None else None,
+        'peak_rss_mb': round(raw['peak_rss_mb'], 1),
+    }
+    if raw.get('first_host') is not None:
+        result['first_host_ms'] = round(raw['first_host'] * 1000, 1)
+    return result
+
+
+def compare(results: List[Result], baseline: List[Result], tolerance: float) -> List[str]:
+    """Lista as regressões em relação a uma execução anterior (--save)."""
+    previous = {entry['scenario']: entry for entry in baseline}
+    problems: List[str] = []
+    for result in results:
+        base = previous.get(result['scenario'])
+        if base is None:
+            continue
+        name = result['scenario']
+        if base.get('hosts_per_s') and result['hosts_per_s'] < base['hosts_per_s'] * (1 - tolerance):
+            problems.append(f"{name}: vazão caiu de {base['hosts_per_s']} para {result['hosts_per_s']} hosts/s")
+        for key, label in (('p99_ms', 'p99'), ('peak_rss_mb', 'pico de RSS'),
+                           ('snmp_packets', 'pacotes SNMP')):
+            old, new = base.get(key), result.get(key)
+            if old and new is not None and new > old * (1 + tolerance):
+                problems.append(f"{name}: {label} subiu de {old} para {new}")
+    return problems
+
+
+def _print_table(results: List[Result]) -> None:
+    columns = ('scenario', 'hosts', 'found', 'elapsed_s', 'hosts_per_s', 'p50_ms', 'p99_ms',
+               'snmp_packets', 'icmp_packets', 'peak_rss_mb')
+    rows = [[str(result.get(column, '-') if result.get(column) is not None else '-') for column in columns]
+            for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do scanner contra agentes SNMP simulados.")
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help="Cenário a executar (pode ser repetido). Padrão: todos")
+    parser.add_argument('--cidr', default=BENCH_CIDR, help=f"Faixa dos agentes (em 127.0.0.0/8). Padrão: {BENCH_CIDR}")
+    parser.add_argument('--concurrency', type=int, default=BENCH_CONCURRENCY)
+    parser.add_argument('--latency', type=float, default=1.0, help="Latência média dos agentes (ms). Padrão: 1")
+    parser.add_argument('--jitter', type=float, default=0.5, help="Variação da latência por agente (ms)")
+    parser.add_argument('--loss', type=float, default=0.0, help="Probabilidade de perda de cada pedido SNMP")
+    parser.add_argument('--missing', type=float, default=0.05, help="Fração de OIDs ausentes por agente")
+    parser.add_argument('--silent', type=float, default=0.1, help="Fração de endereços sem agente SNMP")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--port', type=int, default=FARM_PORT, help="Porta SNMP da fazenda")
+    parser.add_argument('--dns-port', type=int, default=FARM_DNS_PORT, help="Porta do DNS reverso da fazenda")
+    parser.add_argument('--save', help="Grava os resultados em JSON (linha de base para --baseline)")
+    parser.add_argument('--baseline', help="Compara com um JSON gravado por --save")
+    parser.add_argument('--tolerance', type=float, default=BENCH_TOLERANCE,
+                        help=f"Piora relativa aceita. Padrão: {BENCH_TOLERANCE}")
+    args = parser.parse_args(argv)
+
+    farm_options = {'latency': args.latency / 1000, 'jitter': args.jitter / 1000, 'loss': args.loss,
+                    'missing': args.missing, 'silent': args.silent, 'seed': args.seed}
+    results = []
+    for name in args.scenario or SCENARIOS:
+        print(f"Executando {name} em {args.cidr}...", file=sys.stderr)
+        results.append(run_benchmark(name, args.cidr, args.concurrency, farm_options, args.port, args.dns_port))
+    _print_table(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSÃO: {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
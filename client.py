@@ -1,12 +1,17 @@
+import codecs
+import json
 import socket
 import argparse
 import sys
+from typing import List
 
-def run_client(host: str, port: int, cidr: str, community: str):
+def run_client(host: str, port: int, cidr: str, community: str, sweep: bool = False):
     """
     Conecta-se ao servidor de varredura, envia uma requisição e imprime a resposta.
     """
     request = f"{cidr};{community}"
+    if sweep:
+        request += ";sweep"
 
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -20,16 +25,20 @@ def run_client(host: str, port: int, cidr: str, community: str):
             s.shutdown(socket.SHUT_WR)
 
             print("Aguardando resposta do servidor...")
-            response = b''
+            print("\n--- Resposta do Servidor ---")
+
+            # Imprime cada pedaço assim que chega; o decodificador incremental
+            # lida com caracteres UTF-8 divididos entre dois recv().
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
             while True:
                 chunk = s.recv(4096)
                 if not chunk:
                     # Fim da resposta
                     break
-                response += chunk
+                sys.stdout.write(decoder.decode(chunk))
+                sys.stdout.flush()
+            sys.stdout.write(decoder.decode(b'', final=True))
 
-            print("\n--- Resposta do Servidor ---")
-            print(response.decode('utf-8'))
             print("--- Fim da Resposta ---\n")
 
     except ConnectionRefusedError:
@@ -39,16 +48,51 @@ def run_client(host: str, port: int, cidr: str, community: str):
         print(f"\nOcorreu um erro inesperado: {e}", file=sys.stderr)
         sys.exit(1)
 
+def run_ndjson_client(host: str, port: int, cidrs: List[str], community: str, sweep: bool = False):
+    """
+    Envia várias varreduras por uma única conexão usando o protocolo NDJSON v1
+    e imprime cada quadro recebido (uma linha JSON) assim que chega.
+    """
+    mode = "sweep" if sweep else "full"
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.connect((host, port))
+            for request_id, cidr in enumerate(cidrs, start=1):
+                frame = {"v": 1, "id": str(request_id), "type": "scan", "cidr": cidr, "mode": mode}
+                if ',' in community:
+                    frame["credentials"] = [name for name in community.split(',') if name]
+                else:
+                    frame["community"] = community
+                s.sendall(json.dumps(frame).encode('utf-8') + b"\n")
+
+            # Sinaliza que não haverá novos jobs; o servidor conclui os atuais
+            s.shutdown(socket.SHUT_WR)
+
+            with s.makefile('rb') as stream:
+                for line in stream:
+                    sys.stdout.write(line.decode('utf-8'))
+                    sys.stdout.flush()
+
+    except ConnectionRefusedError:
+        print(f"\nERRO: Conexão recusada. O servidor está rodando em {host}:{port}?", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nOcorreu um erro inesperado: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Cliente para o serviço de Scanner de Rede.",
         formatter_class=argparse.RawTextHelpFormatter
     )
 
-    parser.add_argument("cidr", help="A faixa de rede em notação CIDR a ser escaneada. Ex: '192.168.1.0/24'")
+    parser.add_argument("cidr", nargs="+", help="A(s) faixa(s) de rede em notação CIDR a ser(em) escaneada(s). Ex: '192.168.1.0/24'")
     parser.add_argument("--host", default="127.0.0.1", help="O endereço do host do servidor. Padrão: 127.0.0.1")
     parser.add_argument("--port", type=int, default=35640, help="A porta do servidor. Padrão: 35640")
-    parser.add_argument("--community", default="public", help="A comunidade SNMP a ser usada. Padrão: 'public'")
+    parser.add_argument("--community", default="public", help="A comunidade SNMP a ser usada (várias separadas por vírgula). Padrão: 'public'")
+    parser.add_argument("--sweep", action="store_true", help="Apenas verifica quais hosts respondem a ICMP, sem SNMP nem enriquecimento.")
+    parser.add_argument("--ndjson", action="store_true", help="Usa o protocolo NDJSON v1: todas as faixas em uma conexão, saída em JSON por linha.")
 
     if len(sys.argv) == 1:
         parser.print_help(sys.stderr)
@@ -56,4 +100,8 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    run_client(args.host, args.port, args.cidr, args.community)
+    if args.ndjson:
+        run_ndjson_client(args.host, args.port, args.cidr, args.community, args.sweep)
+    else:
+        for cidr in args.cidr:
+            run_client(args.host, args.port, cidr, args.community, args.sweep)
@@ -0,0 +1,352 @@
+import asyncio
+import fcntl
+import socket
+import struct
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from .rate_control import AimdController
+
+ROUTE_TABLE_PATH = '/proc/net/route'
+
+ARP_RATE = 1000          # Pedidos por segundo no início da varredura
+ARP_MIN_RATE = 50        # Limites do ajuste AIMD do ritmo
+ARP_MAX_RATE = 10000
+ARP_TIMEOUT = 0.2        # Espera mínima (s) por uma resposta antes de repetir o pedido
+ARP_MAX_TIMEOUT = 1.0    # Teto da espera adaptativa (Wi-Fi em economia de energia)
+ARP_MIN_RETRIES = 1      # Repetições por endereço num segmento sem perdas observadas
+ARP_MAX_RETRIES = 4      # Repetições quando respostas chegam só nas repetições (perda)
+ARP_BACKLOG = 4096       # Endereços aceitos e ainda não entregues ao consumidor; além disso, `add` espera
+
+ETH_P_ARP = 0x0806
+_ETH_P_IP = 0x0800
+_ARPHRD_ETHER = 1
+_ARP_REQUEST = 1
+_ARP_REPLY = 2
+_RTF_UP = 0x1
+_SIOCGIFADDR = 0x8915
+_BROADCAST = b'\xff' * 6
+
+
+class AttachedNetwork:
+    """Uma sub-rede IPv4 diretamente conectada a uma interface Ethernet."""
+
+    __slots__ = ('interface', 'network', 'mask', 'address', 'mac')
+
+    def __init__(self, interface: str, network: int, mask: int, address: bytes, mac: bytes):
+        self.interface = interface
+        self.network = network
+        self.mask = mask
+        self.address = address
+        self.mac = mac
+
+    def __contains__(self, ip: int) -> bool:
+        return ip & self.mask == self.network
+
+
+def _interface_address(interface: str) -> Optional[bytes]:
+    """Endereço IPv4 principal da interface (ioctl SIOCGIFADDR)."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            ifreq = fcntl.ioctl(sock.fileno(), _SIOCGIFADDR, struct.pack('256s', interface.encode()[:15]))
+        except OSError:
+            return None
+    return ifreq[20:24]
+
+
+def _interface_mac(interface: str) -> Optional[bytes]:
+    try:
+        with open(f'/sys/class/net/{interface}/type', encoding='ascii') as f:
+            if int(f.read()) != _ARPHRD_ETHER:
+                return None
+        with open(f'/sys/class/net/{interface}/address', encoding='ascii') as f:
+            return bytes.fromhex(f.read().strip().replace(':', ''))
+    except (OSError, ValueError):
+        return None
+
+
+def attached_networks(path: str = ROUTE_TABLE_PATH) -> List[AttachedNetwork]:
+    """
+    Sub-redes diretamente conectadas (rotas sem gateway) em interfaces
+    Ethernet, lidas de /proc/net/route.
+
+    Returns:
+        As sub-redes, da mais específica para a menos; vazio em sistemas sem
+        /proc/net/route.
+    """
+    try:
+        with open(path, encoding='ascii') as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        return []
+    networks: List[AttachedNetwork] = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 8 or fields[0] == 'lo':
+            continue
+        try:
+            destination, gateway, flags, mask = (int(fields[i], 16) for i in (1, 2, 3, 7))
+        except ValueError:
+            continue
+        if gateway or not flags & _RTF_UP or not mask:
+            continue
+        # Os campos vêm na ordem de bytes do host (little-endian)
+        network = struct.unpack('!I', struct.pack('<I', destination))[0]
+        mask = struct.unpack('!I', struct.pack('<I', mask))[0]
+        address, mac = _interface_address(fields[0]), _interface_mac(fields[0])
+        if address is None or mac is None:
+            continue
+        networks.append(AttachedNetwork(fields[0], network, mask, address, mac))
+    networks.sort(key=lambda attached: attached.mask, reverse=True)
+    return networks
+
+
+def _build_request(attached: AttachedNetwork, target: bytes) -> bytes:
+    """Monta um quadro Ethernet com um ARP Request em broadcast."""
+    return (struct.pack('!6s6sH', _BROADCAST, attached.mac, ETH_P_ARP)
+            + struct.pack('!HHBBH6s4s6s4s', _ARPHRD_ETHER, _ETH_P_IP, 6, 4, _ARP_REQUEST,
+                          attached.mac, attached.address, b'\x00' * 6, target))
+
+
+def _parse_reply(frame: bytes) -> Optional[Tuple[str, str]]:
+    """Extrai (ip, mac) do remetente de um ARP Reply, ou None."""
+    if len(frame) < 42 or frame[12:14] != b'\x08\x06':
+        return None
+    if struct.unpack('!H', frame[20:22])[0] != _ARP_REPLY:
+        return None
+    mac = ':'.join(f'{byte:02x}' for byte in frame[22:28])
+    return socket.inet_ntoa(frame[28:32]), mac
+
+
+class ArpSweep:
+    """
+    Varredura ARP das sub-redes diretamente conectadas, com um socket
+    AF_PACKET por interface.
+
+    Os endereços chegam por `add` (de qualquer ordem e interface), que
+    espera enquanto `backlog` deles estiverem na fila, aguardando resposta
+    ou sem consumidor; os pedidos saem em ritmo controlado por AIMD; as respostas são lidas pelo
+    loop de eventos (add_reader) e trazem IP e MAC de uma vez. Um endereço
+    sem resposta dentro da janela é pedido de novo; quantas vezes depende da
+    perda observada: começa com `ARP_MIN_RETRIES` e sobe até
+    `ARP_MAX_RETRIES` quando hosts só respondem às repetições, como em
+    segmentos Wi-Fi com perda. A janela acompanha o maior RTT visto.
+
+    Requer CAP_NET_RAW; a criação levanta PermissionError sem ela.
+    """
+
+    def __init__(self, networks: List[AttachedNetwork], rate: int = ARP_RATE,
+                 timeout: float = ARP_TIMEOUT, backlog: int = ARP_BACKLOG):
+        self.networks = networks
+        self.backlog = backlog
+        self.rate = AimdController(rate, ARP_MIN_RATE, max(rate, ARP_MAX_RATE), increase=rate)
+        self.timeout = timeout
+        self.retries = ARP_MIN_RETRIES
+        self.requests = 0
+        self._sockets: Dict[str, socket.socket] = {}
+        self._queue: Deque[Tuple[str, bytes, AttachedNetwork, int]] = deque()
+        # ip -> (tentativa, enviado em); a fila de envios mantém a ordem de expiração
+        self._pending: Dict[str, Tuple[int, float]] = {}
+        self._sent: Deque[Tuple[str, bytes, AttachedNetwork, int, float]] = deque()
+        self._results: 'asyncio.Queue[Tuple[str, Optional[str]]]' = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._room = asyncio.Event()
+        self._finished = False
+        self._max_rtt = 0.0
+        loop = asyncio.get_running_loop()
+        try:
+            for attached in networks:
+                if attached.interface in self._sockets:
+                    continue
+                sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+                self._sockets[attached.interface] = sock
+                sock.bind((attached.interface, ETH_P_ARP))
+                sock.setblocking(False)
+                loop.add_reader(sock.fileno(), self._on_readable, sock)
+        except BaseException:
+            self.close()
+            raise
+
+    def network_for(self, ip: str) -> Optional[AttachedNetwork]:
+        """
+        A sub-rede conectada que contém o IP, ou None se ele estiver atrás de
+        um roteador (ou for o próprio endereço da interface, que não responde
+        ao próprio ARP).
+        """
+        try:
+            packed = socket.inet_aton(ip)
+        except OSError:
+            return None  # IPv6 ou inválido
+        value = struct.unpack('!I', packed)[0]
+        for attached in self.networks:
+            if value in attached:
+                return attached if packed != attached.address else None
+        return None
+
+    def _outstanding(self) -> int:
+        # Cada endereço aceito está em exatamente um destes até ser consumido
+        return len(self._queue) + len(self._pending) + self._results.qsize()
+
+    async def add(self, ip: str, attached: AttachedNetwork) -> None:
+        """
+        Agenda o pedido ARP de um endereço da sub-rede `attached`, esperando
+        vaga quando `backlog` endereços ainda não foram entregues por `stream`.
+        """
+        while self._outstanding() >= self.backlog:
+            self._room.clear()
+            await self._room.wait()
+        self._queue.append((ip, socket.inet_aton(ip), attached, 0))
+        self._wakeup.set()
+
+    def finish(self) -> None:
+        """Sinaliza que não haverá mais endereços; o stream termina após as repetições."""
+        self._finished = True
+        self._wakeup.set()
+
+    def _window(self) -> float:
+        return min(ARP_MAX_TIMEOUT, max(self.timeout, 2 * self._max_rtt))
+
+    def _on_readable(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                frame = sock.recv(128)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            parsed = _parse_reply(frame)
+            if parsed is None:
+                continue
+            ip, mac = parsed
+            entry = self._pending.pop(ip, None)
+            if entry is None:
+                continue  # Não pedido por nós, ou já respondido
+            attempt, sent_at = entry
+            rtt = time.monotonic() - sent_at
+            self._max_rtt = max(self._max_rtt, rtt)
+            if attempt:
+                # Só respondeu à repetição: houve perda neste segmento
+                self.retries = min(ARP_MAX_RETRIES, self.retries + 1)
+                self.rate.on_congestion()
+            else:
+                self.rate.on_success(rtt)
+            self._results.put_nowait((ip, mac))
+
+    def _expire(self, now: float) -> None:
+        """
+        Repete (ou desiste de) pedidos cuja janela passou e descarta do início
+        da fila de envios os já respondidos, sem esperar a janela deles.
+        """
+        deadline = now - self._window()
+        while self._sent:
+            ip, target, attached, attempt, sent_at = self._sent[0]
+            if self._pending.get(ip) != (attempt, sent_at):
+                self._sent.popleft()  # Já respondeu (ou foi repetido)
+                continue
+            if sent_at >= deadline:
+                break
+            self._sent.popleft()
+            if attempt < self.retries:
+                self._queue.append((ip, target, attached, attempt + 1))
+            else:
+                del self._pending[ip]
+                self._results.put_nowait((ip, None))
+
+    async def _send_all(self) -> None:
+        next_send = time.monotonic()
+        while True:
+            self._expire(time.monotonic())
+            if not self._queue:
+                if self._finished and not self._pending:
+                    return
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._window() / 2)
+                except asyncio.TimeoutError:
+                    pass
+                next_send = max(next_send, time.monotonic())
+                continue
+
+            ip, target, attached, attempt = self._queue.popleft()
+            sock = self._sockets[attached.interface]
+            sent_at = time.monotonic()
+            try:
+                sock.send(_build_request(attached, target))
+            except (BlockingIOError, InterruptedError):
+                # Fila da interface cheia: devolve o pedido e reduz o ritmo
+                self._queue.appendleft((ip, target, attached, attempt))
+                self.rate.on_congestion()
+                await asyncio.sleep(0.001)
+                continue
+            except OSError:
+                self._results.put_nowait((ip, None))
+                continue
+            self.requests += 1
+            self._pending[ip] = (attempt, sent_at)
+            self._sent.append((ip, target, attached, attempt, sent_at))
+
+            # Controle de ritmo: nunca à frente do ritmo corrente do AIMD
+            next_send += 1 / self.rate.value
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.1:
+                next_send = time.monotonic()
+
+    async def stream(self) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """
+        Produz (ip, mac) a cada resposta e (ip, None) para cada endereço que
+        esgotou as repetições, até `finish` ser chamado e tudo ser resolvido.
+        """
+        sender = asyncio.ensure_future(self._send_all())
+        try:
+            while not sender.done() or not self._results.empty():
+                try:
+                    result = await asyncio.wait_for(self._results.get(), 0.05)
+                except asyncio.TimeoutError:
+                    continue
+                self._room.set()
+                yield result
+            sender.result()
+        finally:
+            sender.cancel()
+            self.close()
+
+    def close(self) -> None:
+        """Fecha os sockets e remove os leitores do loop."""
+        loop = asyncio.get_running_loop()
+        for sock in self._sockets.values():
+            try:
+                loop.remove_reader(sock.fileno())
+            except ValueError:
+                pass
+            sock.close()
+        self._sockets.clear()
+        self._pending.clear()
+        self._sent.clear()
+        self._queue.clear()
+
+
+async def arp_sweep(ips: List[str], rate: int = ARP_RATE) -> Dict[str, str]:
+    """
+    Atalho para uma varredura ARP completa dos IPs que estão em sub-redes
+    diretamente conectadas (os demais são ignorados).
+
+    Returns:
+        Um dicionário {ip: mac} com os hosts que responderam.
+    """
+    sweep = ArpSweep(attached_networks(), rate)
+
+    async def feed() -> None:
+        for ip in ips:
+            attached = sweep.network_for(ip)
+            if attached is not None:
+                await sweep.add(ip, attached)
+        sweep.finish()
+
+    feeder = asyncio.ensure_future(feed())
+    try:
+        return {ip: mac async for ip, mac in sweep.stream() if mac is not None}
+    finally:
+        feeder.cancel()
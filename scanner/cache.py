@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+from .metrics import METRICS
+
+V = TypeVar('V')
+
+CACHE_MAX_SIZE = 65536
+
+# TTLs (s) por tipo de consulta: positivos e negativos (falhas/None)
+DNS_TTL, DNS_NEGATIVE_TTL = 3600.0, 30.0
+MAC_TTL, MAC_NEGATIVE_TTL = 300.0, 30.0
+VENDOR_TTL, VENDOR_NEGATIVE_TTL = 86400.0, 3600.0
+CREDENTIAL_TTL = 86400.0  # Credencial SNMP que funcionou para cada host
+
+
+class CacheStats:
+    """Contadores de uso de um cache."""
+
+    __slots__ = ('hits', 'negative_hits', 'misses', 'coalesced', 'evictions', 'expirations')
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.negative_hits + self.misses + self.coalesced
+        if not lookups:
+            return 0.0
+        return (self.hits + self.negative_hits + self.coalesced) / lookups
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {name: getattr(self, name) for name in self.__slots__}
+        stats['hit_rate'] = round(self.hit_rate, 4)
+        return stats
+
+
+class AsyncTTLCache(Generic[V]):
+    """
+    Cache LRU limitado, com TTL por entrada e coalescência de consultas.
+
+    Resultados None (inclusive falhas do carregador) são guardados como
+    negativos, com TTL próprio e mais curto. Consultas concorrentes pela mesma
+    chave compartilham um único carregamento em andamento: o carregador roda
+    numa task própria, então o cancelamento de quem pediu primeiro não afeta
+    os demais.
+    """
+
+    def __init__(self, name: str, max_size: int = CACHE_MAX_SIZE,
+                 ttl: float = 300.0, negative_ttl: float = 30.0):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = CacheStats()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Optional[V]]]' = OrderedDict()
+        self._in_flight: Dict[Hashable, 'asyncio.Future[Optional[V]]'] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Optional[V]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Devolve o valor em cache (ou None), sem carregar nem contar estatísticas."""
+        return self._lookup(key)[1]
+
+    def set(self, key: Hashable, value: Optional[V]) -> None:
+        """Guarda um valor; None é guardado como entrada negativa."""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Optional[V]]]) -> Optional[V]:
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            value = None
+        self.set(key, value)
+        return value
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Optional[V]]]) -> Optional[V]:
+        """
+        Devolve o valor em cache ou o carrega com `loader`.
+
+        Args:
+            key: A chave da consulta (ex: o IP).
+            loader: Função sem argumentos que devolve um awaitable com o valor.
+        """
+        found, value = self._lookup(key)
+        if found:
+            if value is None:
+                self.stats.negative_hits += 1
+            else:
+                self.stats.hits += 1
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats.coalesced += 1
+        else:
+            self.stats.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+
+class EnrichmentCache:
+    """
+    Caches compartilhados de enriquecimento: DNS reverso, MAC e fabricante,
+    além da credencial SNMP que funcionou para cada host.
+    """
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE):
+        self.dns: AsyncTTLCache[str] = AsyncTTLCache('dns', max_size, DNS_TTL, DNS_NEGATIVE_TTL)
+        self.mac: AsyncTTLCache[str] = AsyncTTLCache('mac', max_size, MAC_TTL, MAC_NEGATIVE_TTL)
+        self.vendor: AsyncTTLCache[str] = AsyncTTLCache('vendor', max_size, VENDOR_TTL, VENDOR_NEGATIVE_TTL)
+        # Valores são credentials.Credential (sem entradas negativas)
+        self.credential: AsyncTTLCache[Any] = AsyncTTLCache('credential', max_size, CREDENTIAL_TTL, 0.0)
+
+    def caches(self) -> Tuple[AsyncTTLCache, ...]:
+        return (self.dns, self.mac, self.vendor, self.credential)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Contadores de cada cache, indexados pelo nome."""
+        return {cache.name: dict(cache.stats.as_dict(), size=len(cache)) for cache in self.caches()}
+
+
+ENRICHMENT_CACHE = EnrichmentCache()
+
+
+def _cache_samples(field: str) -> Dict[Tuple[str, ...], float]:
+    return {(name,): stats[field] for name, stats in ENRICHMENT_CACHE.stats().items()}
+
+
+METRICS.gauge('scanner_cache_hit_ratio', 'Fração de consultas atendidas pelo cache (inclusive negativas).',
+              lambda: _cache_samples('hit_rate'), ('cache',))
+METRICS.gauge('scanner_cache_entries', 'Entradas em cada cache de enriquecimento.',
+              lambda: _cache_samples('size'), ('cache',))
+METRICS.counter_func('scanner_cache_hits_total', 'Consultas atendidas pelo cache.',
+                     lambda: _cache_samples('hits'), ('cache',))
+METRICS.counter_func('scanner_cache_misses_total', 'Consultas que precisaram do carregador.',
+                     lambda: _cache_samples('misses'), ('cache',))
@@ -0,0 +1,387 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import itertools
+import os
+import secrets
+import time
+from collections import deque
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple,
+    Union,
+)
+
+from .credentials import Community, encode_community
+from .discovery import DISCOVERY_TCP_PORTS
+from .engine import MAX_CONCURRENCY, HostInfo
+from .protocol import Frame, make_frame
+from .utils import HostRange
+
+CLUSTER_SHARD_SIZE = 256       # Endereços por shard enviado a um trabalhador
+HEARTBEAT_INTERVAL = 5.0       # Segundos entre heartbeats de cada trabalhador
+HEARTBEAT_TIMEOUT = 15.0       # Sem heartbeat por mais que isso, o trabalhador é dado como perdido
+SHARD_MAX_ATTEMPTS = 3         # Tentativas de um shard antes de a varredura falhar
+WORKER_WAIT_TIMEOUT = 30.0     # Tempo máximo esperando algum trabalhador voltar com shards pendentes
+CLUSTER_SECRET_ENV = 'SCANNER_CLUSTER_SECRET'  # Segredo compartilhado; sem ele, o coordenador recusa trabalhadores
+CLUSTER_EVENT_QUEUE_SIZE = 1024  # Eventos pendentes por varredura antes de a sessão do trabalhador parar de ler
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# Eventos repassados de um trabalhador à varredura dona do shard
+ShardEvent = Tuple[str, '_Assignment', Any]
+
+
+class ClusterError(RuntimeError):
+    """Varredura distribuída impossível: sem trabalhadores ou shard com falhas repetidas."""
+
+
+def _post_event(event: ShardEvent) -> None:
+    """
+    Entrega um evento sem esperar, para quem não pode aguardar (perda do
+    trabalhador): com a fila cheia, o evento entra como um put pendente,
+    atrás dos que já aguardam vaga.
+    """
+    events = event[1].events
+    try:
+        events.put_nowait(event)
+    except asyncio.QueueFull:
+        asyncio.ensure_future(events.put(event))
+
+
+def registration_proof(secret: str, nonce: str, name: str) -> str:
+    """Resposta do trabalhador ao desafio de registro: HMAC-SHA256 do nonce e do nome."""
+    return hmac.new(secret.encode(), f"{nonce}:{name}".encode(), hashlib.sha256).hexdigest()
+
+
+class _Assignment:
+    """Um shard de uma varredura, com as tentativas e os hosts já entregues."""
+
+    __slots__ = ('shard', 'events', 'attempts', 'seen', 'worker', 'shard_id')
+
+    def __init__(self, shard: HostRange, events: 'asyncio.Queue[ShardEvent]'):
+        self.shard = shard
+        self.events = events
+        self.attempts = 0
+        # IPs já repassados: se o shard for refeito em outro trabalhador,
+        # os hosts encontrados na tentativa anterior não são repetidos
+        self.seen: Set[str] = set()
+        self.worker: Optional['RemoteWorker'] = None
+        self.shard_id = ''
+
+
+class RemoteWorker:
+    """
+    Trabalhador remoto registrado, visto pelo coordenador.
+
+    O trabalhador abre a conexão (atravessa NAT e roteadores de cada site),
+    envia `register` e a partir daí a sessão NDJSON passa a carregar shards
+    do coordenador para ele e hosts, `done` e `heartbeat` dele de volta.
+    """
+
+    def __init__(self, name: str, session: Any, networks: List[Network], capacity: int):
+        self.name = name
+        self.session = session
+        self.networks = networks
+        self.capacity = max(1, capacity)
+        self.assignments: Dict[str, _Assignment] = {}
+        self.completed = 0
+        self.last_heartbeat = time.monotonic()
+        # Sessão parada esperando vaga na fila de uma varredura: não lê os
+        # heartbeats, mas o trabalhador está vivo
+        self.blocked = False
+        self.handlers: Dict[str, Callable[[Frame], Awaitable[None]]] = {
+            'heartbeat': self._on_heartbeat,
+            'host': self._on_host,
+            'done': self._on_done,
+            'error': self._on_error,
+        }
+
+    @property
+    def load(self) -> float:
+        return len(self.assignments) / self.capacity
+
+    @property
+    def free(self) -> bool:
+        return len(self.assignments) < self.capacity
+
+    def locality(self, shard: HostRange) -> int:
+        """
+        Quanto do shard está nos segmentos declarados pelo trabalhador (onde
+        há ARP/MAC): 2 se inteiro numa rede, 1 se só em parte, 0 se nada.
+
+        Os shards não são alinhados às redes declaradas, então um shard pode
+        atravessar a fronteira de uma delas; basta conferir as pontas, já que
+        redes e shards são intervalos contíguos.
+        """
+        best = 0
+        for network in self.networks:
+            if network.version != shard.version:
+                continue
+            low, high = int(network.network_address), int(network.broadcast_address)
+            if low <= shard.first and shard.last <= high:
+                return 2
+            if shard.first <= high and low <= shard.last:
+                best = 1
+        return best
+
+    async def assign(self, assignment: _Assignment, shard_id: str, community: Community,
+                     concurrency: int, tcp_ports: Sequence[int] = DISCOVERY_TCP_PORTS) -> None:
+        assignment.worker = self
+        assignment.shard_id = shard_id
+        assignment.attempts += 1
+        self.assignments[shard_id] = assignment
+        shard = assignment.shard
+        await self.session.send(make_frame(
+            'shard', shard_id, first=str(shard.address(shard.first)), last=str(shard.address(shard.last)),
+            concurrency=concurrency, tcp_ports=list(tcp_ports), **encode_community(community)))
+
+    async def revoke(self, shard_id: str) -> None:
+        """Cancela um shard em andamento (varredura cancelada ou encerrada)."""
+        if self.assignments.pop(shard_id, None) is not None:
+            try:
+                await self.session.send(make_frame('cancel', shard_id))
+            except (ConnectionError, RuntimeError):
+                pass
+
+    def fail_all(self, reason: str) -> None:
+        """Devolve às varreduras todos os shards deste trabalhador (conexão perdida)."""
+        assignments, self.assignments = self.assignments, {}
+        for assignment in assignments.values():
+            _post_event(('failed', assignment, reason))
+
+    async def _deliver(self, event: ShardEvent) -> None:
+        """
+        Repassa um evento à varredura dona do shard. Com a fila cheia (cliente
+        lento), a sessão deixa de ler o socket até haver vaga, e o TCP segura
+        o trabalhador.
+        """
+        events = event[1].events
+        if not events.full():
+            events.put_nowait(event)
+            return
+        self.blocked = True
+        try:
+            await events.put(event)
+        finally:
+            self.blocked = False
+            self.last_heartbeat = time.monotonic()
+
+    async def _on_heartbeat(self, frame: Frame) -> None:
+        self.last_heartbeat = time.monotonic()
+
+    async def _on_host(self, frame: Frame) -> None:
+        assignment = self.assignments.get(frame.get('id'))  # type: ignore[arg-type]
+        if assignment is not None and isinstance(frame.get('host'), dict):
+            await self._deliver(('host', assignment, frame['host']))
+
+    async def _on_done(self, frame: Frame) -> None:
+        assignment = self.assignments.pop(frame.get('id'), None)  # type: ignore[arg-type]
+        if assignment is not None:
+            self.completed += 1
+            await self._deliver(('done', assignment, None))
+
+    async def _on_error(self, frame: Frame) -> None:
+        assignment = self.assignments.pop(frame.get('id'), None)  # type: ignore[arg-type]
+        if assignment is not None:
+            await self._deliver(('failed', assignment, frame.get('message', '')))
+        else:
+            print(f"[CLUSTER] Erro do trabalhador {self.name}: {frame.get('message')}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'networks': [str(network) for network in self.networks],
+            'capacity': self.capacity,
+            'in_flight': len(self.assignments),
+            'completed': self.completed,
+        }
+
+
+class Cluster:
+    """
+    Coordenador de varreduras distribuídas entre trabalhadores remotos.
+
+    A faixa é cortada em shards de `CLUSTER_SHARD_SIZE` endereços. Cada shard
+    vai, de preferência, para um trabalhador que declarou a rede do shard (o
+    único capaz de ver MACs naquele segmento) e, entre eles, para o menos
+    carregado; sem trabalhador local, vai para o menos carregado de todos.
+    Um trabalhador sem heartbeat por `HEARTBEAT_TIMEOUT` s, ou cuja conexão
+    caiu, é removido e seus shards voltam para a fila da varredura.
+    """
+
+    def __init__(self, secret: Optional[str] = None) -> None:
+        self.secret = secret
+        self.workers: Dict[str, RemoteWorker] = {}
+        self._ids = itertools.count(1)
+        self._changed = asyncio.Event()
+        self._reaper: Optional['asyncio.Task[None]'] = None
+
+    def challenge(self) -> str:
+        """Nonce de uso único enviado ao trabalhador antes do registro."""
+        return secrets.token_hex(16)
+
+    def register(self, session: Any, frame: Frame, nonce: str) -> RemoteWorker:
+        """
+        Registra o trabalhador que enviou `register`, depois de conferir sua
+        resposta ao desafio `nonce` (registration_proof com o segredo do
+        cluster). Quem entra recebe shards com as credenciais SNMP das
+        varreduras, por isso não há registro sem segredo configurado.
+
+        Raises:
+            ValueError: sem segredo configurado, com prova inválida, nome já
+            registrado ou alguma rede declarada inválida.
+        """
+        if not self.secret:
+            raise ValueError(f"registro de trabalhadores desativado (defina {CLUSTER_SECRET_ENV})")
+        name = frame.get('name')
+        if not isinstance(name, str) or not name:
+            raise ValueError("campo 'name' obrigatório")
+        proof = frame.get('proof')
+        if not isinstance(proof, str) or not hmac.compare_digest(
+                proof, registration_proof(self.secret, nonce, name)):
+            raise ValueError("prova de registro inválida")
+        if name in self.workers:
+            # Uma reconexão legítima espera o reaper derrubar a conexão antiga
+            raise ValueError(f"já existe um trabalhador registrado como {name}")
+        networks = [ipaddress.ip_network(str(cidr), strict=False) for cidr in frame.get('networks', [])]
+        worker = RemoteWorker(name, session, networks, int(frame.get('capacity', 1)))
+        self.workers[name] = worker
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.ensure_future(self._reap())
+        self._notify()
+        return worker
+
+    def unregister(self, worker: RemoteWorker, reason: str) -> None:
+        if self.workers.get(worker.name) is worker:
+            del self.workers[worker.name]
+        worker.fail_all(reason)
+        self._notify()
+
+    def _notify(self) -> None:
+        # Acorda varreduras esperando por capacidade livre
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _reap(self) -> None:
+        while self.workers:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            for worker in list(self.workers.values()):
+                if not worker.blocked and now - worker.last_heartbeat > HEARTBEAT_TIMEOUT:
+                    print(f"[CLUSTER] Trabalhador {worker.name} sem heartbeat; shards serão redistribuídos.")
+                    self.unregister(worker, "sem heartbeat")
+                    worker.session.writer.close()
+
+    def _pick(self, shard: HostRange) -> Optional[RemoteWorker]:
+        free = [worker for worker in self.workers.values() if worker.free]
+        if not free:
+            return None
+        # Mais do shard no segmento do trabalhador primeiro; depois, menor carga
+        return min(free, key=lambda worker: (-worker.locality(shard), worker.load))
+
+    @staticmethod
+    def shards(host_range: HostRange, size: int = CLUSTER_SHARD_SIZE) -> Iterable[HostRange]:
+        return host_range.chunks(size)
+
+    async def stream(self, shards: Iterable[HostRange], community: Community,
+                     concurrency: int = MAX_CONCURRENCY,
+                     tcp_ports: Sequence[int] = DISCOVERY_TCP_PORTS) -> AsyncIterator[HostInfo]:
+        """
+        Distribui os shards entre os trabalhadores e produz cada host ativo
+        assim que o trabalhador o envia.
+
+        Os shards são consumidos sob demanda: cada trabalhador recebe no máximo
+        `capacity` shards por vez, e `concurrency` é dividido entre eles. Os
+        eventos esperam numa fila de `CLUSTER_EVENT_QUEUE_SIZE` posições; cheia,
+        as sessões dos trabalhadores param de ler até o consumidor avançar.
+
+        Raises:
+            ClusterError: se não houver trabalhadores por `WORKER_WAIT_TIMEOUT`
+            s ou se um shard falhar `SHARD_MAX_ATTEMPTS` vezes.
+        """
+        events: 'asyncio.Queue[ShardEvent]' = asyncio.Queue(CLUSTER_EVENT_QUEUE_SIZE)
+        shard_iter = iter(shards)
+        retry: Deque[_Assignment] = deque()
+        in_flight: Set[_Assignment] = set()
+        exhausted = False
+        idle_since: Optional[float] = None
+        try:
+            while True:
+                # Distribui enquanto houver shard e trabalhador com vaga
+                while True:
+                    if retry:
+                        assignment = retry.popleft()
+                    elif not exhausted:
+                        shard = next(shard_iter, None)
+                        if shard is None:
+                            exhausted = True
+                            continue
+                        assignment = _Assignment(shard, events)
+                    else:
+                        break
+                    worker = self._pick(assignment.shard)
+                    if worker is None:
+                        retry.appendleft(assignment)
+                        break
+                    in_flight.add(assignment)
+                    await worker.assign(assignment, f"s{next(self._ids)}", community,
+                                        max(1, concurrency // worker.capacity), tcp_ports)
+
+                if not in_flight and not retry:
+                    break
+
+                if not self.workers:
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since > WORKER_WAIT_TIMEOUT:
+                        raise ClusterError("Nenhum trabalhador registrado no coordenador")
+                else:
+                    idle_since = None
+
+                changed = asyncio.ensure_future(self._changed.wait())
+                getter = asyncio.ensure_future(events.get())
+                try:
+                    await asyncio.wait({changed, getter}, timeout=HEARTBEAT_INTERVAL,
+                                       return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    changed.cancel()
+                    getter.cancel()
+                if not getter.done() or getter.cancelled():
+                    continue
+
+                event: Optional[ShardEvent] = getter.result()
+                while event is not None:
+                    kind, assignment, payload = event
+                    if kind == 'host':
+                        if payload.get('ip') not in assignment.seen:
+                            assignment.seen.add(payload.get('ip'))
+                            yield payload
+                    elif kind == 'done':
+                        in_flight.discard(assignment)
+                        self._notify()
+                    elif kind == 'failed' and assignment in in_flight:
+                        in_flight.discard(assignment)
+                        worker_name = assignment.worker.name if assignment.worker else '?'
+                        if assignment.attempts >= SHARD_MAX_ATTEMPTS:
+                            raise ClusterError(
+                                f"Shard {assignment.shard} falhou {assignment.attempts} vezes"
+                                f" (último trabalhador {worker_name}: {payload})")
+                        print(f"[CLUSTER] Shard {assignment.shard} falhou em {worker_name} ({payload});"
+                              " redistribuindo.")
+                        retry.append(assignment)
+                    event = events.get_nowait() if not events.empty() else None
+        finally:
+            # Varredura encerrada ou cancelada: libera as vagas nos trabalhadores
+            for assignment in in_flight:
+                if assignment.worker is not None:
+                    await assignment.worker.revoke(assignment.shard_id)
+            # Esvazia a fila para liberar sessões de trabalhadores paradas num put
+            while not events.empty():
+                events.get_nowait()
+            self._notify()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [worker.stats() for worker in self.workers.values()]
+
+
+CLUSTER = Cluster(os.environ.get(CLUSTER_SECRET_ENV))
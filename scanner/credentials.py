@@ -0,0 +1,241 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from pysnmp.hlapi.asyncio import (
+    CommunityData, UsmUserData,
+    usmAesCfb128Protocol, usmAesCfb256Protocol, usmDESPrivProtocol, usmHMAC192SHA256AuthProtocol,
+    usmHMACMD5AuthProtocol, usmHMACSHAAuthProtocol, usmNoAuthProtocol, usmNoPrivProtocol,
+)
+
+from .cache import ENRICHMENT_CACHE
+from .probes import probe_snmp_info
+
+SNMP_VERSIONS = ('1', '2c', '3')
+CREDENTIAL_PREFER_GRACE = 0.05  # Espera mínima (s) por uma resposta v2c/v3 depois de o v1 responder
+
+_AUTH_PROTOCOLS = {
+    'md5': usmHMACMD5AuthProtocol,
+    'sha': usmHMACSHAAuthProtocol,
+    'sha256': usmHMAC192SHA256AuthProtocol,
+}
+_PRIV_PROTOCOLS = {
+    'des': usmDESPrivProtocol,
+    'aes': usmAesCfb128Protocol,
+    'aes256': usmAesCfb256Protocol,
+}
+
+
+class Credential:
+    """
+    Uma credencial SNMP: comunidade (v1/v2c) ou usuário USM (v3).
+
+    Imutável e comparável, para servir de chave de job e de cache. O repr
+    não mostra segredos.
+    """
+
+    __slots__ = ('version', 'community', 'user', 'auth_key', 'auth_protocol', 'priv_key', 'priv_protocol')
+
+    def __init__(self, version: str, community: str = '', user: str = '',
+                 auth_key: str = '', auth_protocol: str = 'sha',
+                 priv_key: str = '', priv_protocol: str = 'aes'):
+        if version not in SNMP_VERSIONS:
+            raise ValueError(f"Versão SNMP desconhecida: {version}")
+        if version == '3':
+            if not user:
+                raise ValueError("Credencial v3 sem 'user'")
+            if auth_key and auth_protocol not in _AUTH_PROTOCOLS:
+                raise ValueError(f"Protocolo de autenticação desconhecido: {auth_protocol}")
+            if priv_key and priv_protocol not in _PRIV_PROTOCOLS:
+                raise ValueError(f"Protocolo de privacidade desconhecido: {priv_protocol}")
+            if priv_key and not auth_key:
+                raise ValueError("Credencial v3 com 'priv_key' exige 'auth_key'")
+        elif not community:
+            raise ValueError(f"Credencial v{version} sem 'community'")
+        self.version = version
+        self.community = community
+        self.user = user
+        self.auth_key = auth_key
+        self.auth_protocol = auth_protocol
+        self.priv_key = priv_key
+        self.priv_protocol = priv_protocol
+
+    def _key(self) -> Tuple[str, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Credential) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return f"Credential(v{self.version}, {self.user or '<comunidade>'})"
+
+    def auth_data(self) -> Union[CommunityData, UsmUserData]:
+        """Dados de autenticação do pysnmp para esta credencial."""
+        if self.version == '3':
+            return UsmUserData(
+                self.user,
+                authKey=self.auth_key or None,
+                privKey=self.priv_key or None,
+                authProtocol=_AUTH_PROTOCOLS[self.auth_protocol] if self.auth_key else usmNoAuthProtocol,
+                privProtocol=_PRIV_PROTOCOLS[self.priv_protocol] if self.priv_key else usmNoPrivProtocol,
+            )
+        return CommunityData(self.community, mpModel=0 if self.version == '1' else 1)
+
+    def as_dict(self) -> Dict[str, str]:
+        """Forma serializável (quadros NDJSON para trabalhadores remotos)."""
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name)}
+
+
+Credentials = Tuple[Credential, ...]
+# O que as varreduras aceitam: uma comunidade v1 (como sempre) ou uma lista de credenciais
+Community = Union[str, Credentials]
+
+
+def parse_credentials(entries: Any) -> Credentials:
+    """
+    Interpreta a lista de credenciais de uma requisição.
+
+    Cada item é um objeto com "version" ('1', '2c' ou '3') e "community"
+    ou, no v3, "user", "auth_key", "auth_protocol", "priv_key" e
+    "priv_protocol". Um item só com "community" (ou uma string) vira duas
+    credenciais, v2c e v1, para alcançar agentes antigos sem abrir mão do
+    v2c onde ele existe.
+
+    Raises:
+        ValueError: se a lista estiver vazia ou algum item for inválido.
+    """
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("Campo 'credentials' deve ser uma lista não vazia")
+    credentials: List[Credential] = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'community': entry}
+        if not isinstance(entry, dict):
+            raise ValueError(f"Credencial inválida: {entry!r}")
+        fields = {name: str(value) for name, value in entry.items() if name in Credential.__slots__}
+        if 'version' in fields:
+            candidates = [Credential(**fields)]
+        else:
+            candidates = [Credential('2c', **fields), Credential('1', **fields)]
+        for credential in candidates:
+            if credential not in credentials:
+                credentials.append(credential)
+    return tuple(credentials)
+
+
+def encode_community(community: Community) -> Dict[str, Any]:
+    """Campos de quadro que transportam uma comunidade ou lista de credenciais."""
+    if isinstance(community, str):
+        return {'community': community}
+    return {'credentials': [credential.as_dict() for credential in community]}
+
+
+def decode_community(frame: Dict[str, Any]) -> Community:
+    """Inverso de encode_community (levanta ValueError em credenciais inválidas)."""
+    if 'credentials' in frame:
+        return tuple(Credential(**{str(name): str(value) for name, value in entry.items()})
+                     for entry in frame['credentials'])
+    return str(frame.get('community', 'public'))
+
+
+async def probe_snmp_credentials(ip: str, credentials: Sequence[Credential]
+                                 ) -> Optional[Tuple[Dict[str, str], Credential]]:
+    """
+    Lê os atributos do host (SNMP_OIDS) com a primeira credencial que funcionar.
+
+    Se o host já respondeu antes a uma das credenciais (cache por host), só
+    ela é usada, com um único GET. Senão, todas são tentadas ao mesmo tempo
+    e a primeira resposta vence; as demais tentativas são canceladas. Uma
+    resposta v1 ainda espera um instante pelas tentativas v2c/v3, que
+    trazem GETBULK e contadores de 64 bits e, por isso, são as que ficam
+    guardadas sempre que o agente aceitar.
+
+    Returns:
+        (atributos, credencial vencedora), ou None se nenhuma funcionar.
+    """
+    cached = ENRICHMENT_CACHE.credential.get(ip)
+    if cached is not None and cached in credentials:
+        info = await probe_snmp_info(ip, auth=cached.auth_data())
+        if info:
+            return info, cached
+        # A credencial deixou de valer (ou o agente calou): tenta as outras
+        ENRICHMENT_CACHE.credential.invalidate(ip)
+        credentials = [credential for credential in credentials if credential != cached]
+    if not credentials:
+        return None
+
+    started = time.monotonic()
+    attempts = {asyncio.ensure_future(probe_snmp_info(ip, auth=credential.auth_data())): credential
+                for credential in credentials}
+    pending = set(attempts)
+    fallback: Optional[Tuple[Dict[str, str], Credential]] = None
+    deadline: Optional[float] = None
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break  # Acabou a espera pelo v2c/v3
+            for task in done:
+                info = task.result()
+                if not info:
+                    continue
+                credential = attempts[task]
+                if credential.version != '1':
+                    ENRICHMENT_CACHE.credential.set(ip, credential)
+                    return info, credential
+                if fallback is None:
+                    fallback = (info, credential)
+                    elapsed = time.monotonic() - started
+                    deadline = time.monotonic() + max(CREDENTIAL_PREFER_GRACE, elapsed)
+            if fallback is not None and not any(attempts[task].version != '1' for task in pending):
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+    if fallback is not None:
+        ENRICHMENT_CACHE.credential.set(ip, fallback[1])
+    return fallback
+
+
+async def cached_credential(ip: str, credentials: Sequence[Credential]) -> Optional[Credential]:
+    """
+    Credencial de um host para consultas repetidas (coletas, walks, o GET de
+    sysName do monitor).
+
+    Usa a vencedora guardada em cache se ela estiver na lista; senão,
+    probe_snmp_credentials descobre (e guarda) uma. None se nenhuma funcionar.
+    """
+    cached = ENRICHMENT_CACHE.credential.get(ip)
+    if cached is not None and cached in credentials:
+        return cached
+    result = await probe_snmp_credentials(ip, credentials)
+    return result[1] if result else None
+
+
+async def snmp_auth(ip: str, community: Community, version: str = '1') -> Any:
+    """
+    Dados de autenticação do pysnmp para consultar um host.
+
+    Uma comunidade única usa `version` ('1' para GET, '2c' para GETBULK); uma
+    lista de credenciais usa a credencial do host (cached_credential), na
+    versão em que ela venceu.
+
+    Returns:
+        CommunityData ou UsmUserData, ou None se nenhuma credencial funcionar.
+    """
+    if isinstance(community, str):
+        return CommunityData(community, mpModel=0 if version == '1' else 1)
+    credential = await cached_credential(ip, community)
+    return credential.auth_data() if credential is not None else None
+
+
+async def probe_snmp_any(ip: str, community: Community) -> Optional[Dict[str, str]]:
+    """probe_snmp_info com uma comunidade v1 ou com uma lista de credenciais."""
+    if isinstance(community, str):
+        return await probe_snmp_info(ip, community)
+    result = await probe_snmp_credentials(ip, community)
+    return result[0] if result else None
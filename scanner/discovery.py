@@ -0,0 +1,149 @@
+import asyncio
+from typing import AsyncIterator, Iterable, Optional, Sequence, Set, Tuple
+
+from .arp_sweep import ArpSweep, attached_networks
+from .cache import ENRICHMENT_CACHE
+from .icmp_sweep import IcmpSweep, icmp_available
+from .metrics import HOSTS_TOTAL
+from .neighbors import NEIGHBOR_TABLE
+from .probes import probe_tcp
+
+DISCOVERY_TCP_PORTS = (80, 443)   # Portas tentadas em quem não respondeu ao ICMP (vazio desativa)
+DISCOVERY_TCP_CONCURRENCY = 256    # Endereços sondados por TCP ao mesmo tempo
+DISCOVERY_QUEUE_SIZE = 256         # Hosts encontrados aguardando o consumidor; além disso, a descoberta espera
+
+# Um host vivo e como ele foi descoberto: 'icmp', 'arp' ou 'tcp'
+Discovered = Tuple[str, str]
+
+
+def _open_arp_sweep() -> Optional[ArpSweep]:
+    """Varredura ARP das sub-redes conectadas, ou None (nenhuma, ou sem CAP_NET_RAW)."""
+    networks = attached_networks()
+    if not networks:
+        return None
+    try:
+        return ArpSweep(networks)
+    except PermissionError:
+        return None
+    except OSError as e:
+        print(f"AVISO: Varredura ARP indisponível ({e}); usando apenas ICMP e TCP.")
+        return None
+
+
+async def discover_stream(ips: Iterable[str], ports: Sequence[int] = DISCOVERY_TCP_PORTS,
+                          concurrency: int = DISCOVERY_TCP_CONCURRENCY) -> AsyncIterator[Discovered]:
+    """
+    Descoberta barata de hosts ativos, sem SNMP: produz (ip, método) assim
+    que cada host é encontrado.
+
+    Endereços de sub-redes diretamente conectadas são descobertos por ARP
+    (ArpSweep): a resposta traz o MAC junto, que já fica no cache de
+    enriquecimento, e a falta dela basta para declarar o endereço vazio.
+
+    Os demais recebem um único Echo Request (IcmpSweep, um socket). Os que
+    não respondem dentro da janela ganham uma segunda chance, sem esperar o
+    fim da varredura (um endereço vazio custa, então, um Echo Request e um
+    SYN por porta de `ports`):
+
+    - sem varredura ARP (sem CAP_NET_RAW), o próprio Echo Request fez o
+      kernel resolver o ARP no segmento local; uma entrada completa na tabela
+      de vizinhos prova que o host existe, mesmo que ele filtre ICMP;
+    - conexões TCP a `ports` (SYN-ACK ou RST contam), no máximo
+      `concurrency` endereços por vez.
+
+    Sem permissão para ICMP, os endereços remotos vão direto para a segunda
+    chance.
+
+    Os hosts encontrados passam por uma fila limitada
+    (`DISCOVERY_QUEUE_SIZE`): se o consumidor (o SNMP) atrasar, a descoberta
+    espera, e o IcmpSweep pausa os envios quando as respostas se acumulam.
+    """
+    found: 'asyncio.Queue[Optional[Discovered]]' = asyncio.Queue(DISCOVERY_QUEUE_SIZE)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks: Set['asyncio.Future[None]'] = set()
+
+    async def probe_ports(ip: str) -> None:
+        try:
+            if await probe_tcp(ip, ports):
+                await found.put((ip, 'tcp'))
+            else:
+                HOSTS_TOTAL.inc('down')
+        finally:
+            semaphore.release()
+
+    async def second_chance(ip: str) -> None:
+        if arp is None and NEIGHBOR_TABLE.lookup(ip) is not None:
+            await found.put((ip, 'arp'))
+            return
+        if not ports:
+            HOSTS_TOTAL.inc('down')
+            return
+        await semaphore.acquire()
+        task = asyncio.ensure_future(probe_ports(ip))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def remote(ips: Iterable[str]) -> AsyncIterator[str]:
+        # Desvia para o ARP o que está no segmento local; `add` espera vaga
+        # na janela do ARP, então os endereços são lidos sob demanda
+        for ip in ips:
+            attached = arp.network_for(ip) if arp is not None else None
+            if attached is None:
+                yield ip
+            else:
+                await arp.add(ip, attached)
+
+    async def resolve_local() -> None:
+        assert arp is not None
+        async for ip, mac in arp.stream():
+            if mac is None:
+                HOSTS_TOTAL.inc('down')
+            else:
+                ENRICHMENT_CACHE.mac.set(ip, mac)
+                await found.put((ip, 'arp'))
+
+    async def sweep() -> None:
+        local = asyncio.ensure_future(resolve_local()) if arp is not None else None
+        try:
+            if icmp_available():
+                replies = IcmpSweep().stream(remote(ips), report_silent=True)
+                try:
+                    async for ip, rtt in replies:
+                        if rtt is None:
+                            await second_chance(ip)
+                        else:
+                            await found.put((ip, 'icmp'))
+                finally:
+                    await replies.aclose()
+            else:
+                print("AVISO: Sem permissão para ICMP; descoberta apenas por ARP e TCP.")
+                async for ip in remote(ips):
+                    await second_chance(ip)
+            if local is not None:
+                arp.finish()  # type: ignore[union-attr]
+                await local
+            if tasks:
+                await asyncio.gather(*tasks)
+        except Exception:
+            await found.put(None)
+            raise
+        finally:
+            if local is not None:
+                local.cancel()
+            for task in tasks:
+                task.cancel()
+        await found.put(None)
+
+    arp = _open_arp_sweep()
+    sweeper = asyncio.ensure_future(sweep())
+    try:
+        while True:
+            item = await found.get()
+            if item is None:
+                break
+            yield item
+        await sweeper  # Propaga falhas da varredura
+    finally:
+        sweeper.cancel()
+        if arp is not None:
+            arp.close()
@@ -0,0 +1,315 @@
+import asyncio
+import ipaddress
+import random
+import socket
+import struct
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+RESOLV_CONF_PATH = '/etc/resolv.conf'
+HOSTS_PATH = '/etc/hosts'
+DNS_PORT = 53
+DNS_TIMEOUT = 1.0       # Espera (s) por resposta de cada tentativa
+DNS_ATTEMPTS = 2        # Tentativas por consulta, alternando servidores
+DNS_CONCURRENCY = 256   # Consultas PTR em andamento ao mesmo tempo, somando as varreduras do loop
+DNS_SCAN_CONCURRENCY = 64  # Consultas PTR em andamento de uma única varredura (ver new_scan_limiter)
+DNS_SOCKET_QUERIES = 256  # Consultas por socket antes de trocar (nova porta de origem)
+
+_TYPE_PTR = 12
+_CLASS_IN = 1
+_RCODE_NOERROR = 0
+_RCODE_NXDOMAIN = 3
+
+Nameserver = Tuple[str, int]
+
+
+def read_nameservers(path: str = RESOLV_CONF_PATH) -> List[Nameserver]:
+    """Lê as linhas "nameserver" do resolv.conf."""
+    servers: List[Nameserver] = []
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    # Remove o identificador de zona (fe80::1%eth0)
+                    servers.append((fields[1].split('%')[0], DNS_PORT))
+    except OSError:
+        pass
+    return servers
+
+
+def read_hosts_file(path: str = HOSTS_PATH) -> Dict[str, str]:
+    """Lê o /etc/hosts como {ip: primeiro nome}, como faz gethostbyaddr."""
+    names: Dict[str, str] = {}
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if len(fields) >= 2:
+                    names.setdefault(fields[0], fields[1])
+    except OSError:
+        pass
+    return names
+
+
+def build_ptr_query(txid: int, ip: str) -> bytes:
+    """Monta a consulta DNS PTR (com recursão) para o nome reverso do IP."""
+    header = struct.pack('!HHHHHH', txid, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(
+        bytes([len(label)]) + label.encode('ascii')
+        for label in ipaddress.ip_address(ip).reverse_pointer.split('.')
+    ) + b'\x00'
+    return header + qname + struct.pack('!HH', _TYPE_PTR, _CLASS_IN)
+
+
+def _reverse_name(ip: str) -> str:
+    """Nome reverso do IP como aparece na pergunta (comparação sem caixa)."""
+    return ipaddress.ip_address(ip).reverse_pointer.lower()
+
+
+def _read_name(message: bytes, offset: int) -> Tuple[str, int]:
+    """Decodifica um nome DNS (com ponteiros de compressão) a partir de `offset`."""
+    labels: List[str] = []
+    end: Optional[int] = None
+    jumps = 0
+    while True:
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            jumps += 1
+            if jumps > 32:
+                raise ValueError("Laço de compressão no nome DNS")
+            offset = ((length & 0x3F) << 8) | message[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(message[offset:offset + length].decode('ascii', errors='replace'))
+        offset += length
+    return '.'.join(labels), end if end is not None else offset
+
+
+def read_question(message: bytes) -> Tuple[int, str, int]:
+    """
+    Lê o id de transação e a primeira pergunta de uma mensagem DNS.
+
+    Returns:
+        (txid, nome em minúsculas, tipo); levanta ValueError se não houver
+        exatamente uma pergunta da classe IN.
+    """
+    txid, _, qdcount = struct.unpack_from('!HHH', message, 0)
+    if qdcount != 1:
+        raise ValueError("Resposta DNS sem exatamente uma pergunta")
+    name, offset = _read_name(message, 12)
+    qtype, qclass = struct.unpack_from('!HH', message, offset)
+    if qclass != _CLASS_IN:
+        raise ValueError("Pergunta DNS fora da classe IN")
+    return txid, name.lower(), qtype
+
+
+def parse_ptr_response(message: bytes) -> Tuple[int, int, Optional[str]]:
+    """
+    Interpreta uma resposta DNS.
+
+    Returns:
+        (txid, rcode, nome) onde nome é o primeiro registro PTR da seção de
+        respostas, ou None se não houver.
+    """
+    txid, flags, qdcount, ancount, _, _ = struct.unpack_from('!HHHHHH', message, 0)
+    rcode = flags & 0x000F
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(message, offset)
+        offset += 4
+    for _ in range(ancount):
+        _, offset = _read_name(message, offset)
+        rtype, _, _, rdlength = struct.unpack_from('!HHIH', message, offset)
+        offset += 10
+        if rtype == _TYPE_PTR:
+            name, _ = _read_name(message, offset)
+            return txid, rcode, name or None
+        offset += rdlength
+    return txid, rcode, None
+
+
+class _NameserverProtocol(asyncio.DatagramProtocol):
+    """
+    Socket UDP conectado a um servidor de nomes; entrega as respostas por
+    txid, só quando a pergunta repetida na resposta é a que foi feita.
+    """
+
+    def __init__(self) -> None:
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        # txid -> (nome reverso perguntado, futuro da resposta)
+        self.pending: Dict[int, Tuple[str, 'asyncio.Future[bytes]']] = {}
+        self.queries = 0
+        self.retired = False
+
+    def connection_made(self, transport) -> None:  # type: ignore[override]
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        try:
+            txid, name, qtype = read_question(data)
+        except (ValueError, struct.error, IndexError):
+            return
+        entry = self.pending.get(txid)
+        if entry is None or entry[0] != name or qtype != _TYPE_PTR:
+            return  # Resposta atrasada, de outra consulta ou forjada: a consulta continua esperando
+        future = entry[1]
+        if not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP port unreachable etc.: as consultas expiram pelo timeout
+        pass
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        for _, future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Socket DNS fechado"))
+        self.transport = None
+
+
+class AsyncPTRResolver:
+    """
+    Resolvedor de DNS reverso (PTR) não bloqueante.
+
+    Fala diretamente com os servidores do resolv.conf por UDP, com um socket
+    por servidor. As consultas são enviadas em pipeline, sem esperar umas
+    pelas outras, e as respostas são casadas pelo id de transação e pela
+    pergunta. Cada socket é trocado após `DNS_SOCKET_QUERIES` consultas, para
+    que a porta de origem também varie, e fechado quando as suas pendentes
+    terminam. Sockets e semáforo ficam por loop de eventos, como no
+    SnmpEnginePool.
+
+    Dois limites valem para as consultas em andamento: o semáforo do loop
+    (`concurrency`, para todas as varreduras juntas) e, opcionalmente, o
+    limitador de cada varredura (new_scan_limiter), para que uma faixa
+    grande não ocupe todas as vagas e atrase as outras. Cada tentativa
+    expira em `timeout` segundos e a seguinte vai para o próximo servidor.
+    Nomes do /etc/hosts são respondidos localmente, como faria
+    gethostbyaddr.
+
+    O cache (inclusive o negativo, para IPs sem PTR) fica na camada de
+    enriquecimento, em ENRICHMENT_CACHE.dns.
+    """
+
+    def __init__(self, nameservers: Optional[List[Nameserver]] = None,
+                 timeout: float = DNS_TIMEOUT, attempts: int = DNS_ATTEMPTS,
+                 concurrency: int = DNS_CONCURRENCY, hosts: Optional[Dict[str, str]] = None):
+        self.nameservers = nameservers if nameservers is not None else read_nameservers()
+        self.timeout = timeout
+        self.attempts = attempts
+        self.concurrency = concurrency
+        self.hosts = hosts if hosts is not None else read_hosts_file()
+        self._loops: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]' = \
+            weakref.WeakKeyDictionary()
+
+    def _state(self) -> '_LoopState':
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = _LoopState(self.concurrency)
+        return state
+
+    async def _protocol_for(self, state: '_LoopState', server: Nameserver) -> _NameserverProtocol:
+        protocol = state.protocols.get(server)
+        if protocol is not None and protocol.transport is not None and not protocol.retired:
+            return protocol
+        opening = state.opening.get(server)
+        if opening is None:
+            opening = asyncio.ensure_future(self._open(state, server))
+            state.opening[server] = opening
+            opening.add_done_callback(lambda _: state.opening.pop(server, None))
+        return await asyncio.shield(opening)
+
+    async def _open(self, state: '_LoopState', server: Nameserver) -> _NameserverProtocol:
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ':' in server[0] else socket.AF_INET
+        # Sem bind explícito: o kernel sorteia a porta de origem de cada socket
+        _, protocol = await loop.create_datagram_endpoint(
+            _NameserverProtocol, remote_addr=server, family=family)
+        state.protocols[server] = protocol
+        return protocol
+
+    async def _query(self, state: '_LoopState', server: Nameserver, ip: str) -> Tuple[int, Optional[str]]:
+        protocol = await self._protocol_for(state, server)
+        protocol.queries += 1
+        if protocol.queries >= DNS_SOCKET_QUERIES:
+            # A próxima consulta a este servidor abre um socket novo
+            protocol.retired = True
+        txid = random.getrandbits(16)
+        while txid in protocol.pending:
+            txid = random.getrandbits(16)
+        future = asyncio.get_running_loop().create_future()
+        protocol.pending[txid] = (_reverse_name(ip), future)
+        try:
+            protocol.transport.sendto(build_ptr_query(txid, ip))  # type: ignore[union-attr]
+            response = await asyncio.wait_for(future, self.timeout)
+        finally:
+            protocol.pending.pop(txid, None)
+            if protocol.retired and not protocol.pending and protocol.transport is not None:
+                protocol.transport.close()
+        _, rcode, name = parse_ptr_response(response)
+        return rcode, name
+
+    async def resolve(self, ip: str, limiter: Optional[asyncio.Semaphore] = None) -> Optional[str]:
+        """
+        Devolve o nome PTR do IP, ou None se não houver (ou se nenhum servidor
+        responder).
+
+        `limiter` é o limitador da varredura que pediu a consulta, criado com
+        new_scan_limiter; ele é respeitado antes do semáforo do loop.
+        """
+        if ip in self.hosts:
+            return self.hosts[ip]
+        if not self.nameservers:
+            return None
+        if limiter is None:
+            return await self._resolve(ip)
+        async with limiter:
+            return await self._resolve(ip)
+
+    async def _resolve(self, ip: str) -> Optional[str]:
+        state = self._state()
+        async with state.semaphore:
+            for attempt in range(self.attempts):
+                server = self.nameservers[attempt % len(self.nameservers)]
+                try:
+                    rcode, name = await self._query(state, server, ip)
+                except (asyncio.TimeoutError, OSError, ValueError, struct.error, IndexError):
+                    continue
+                if rcode in (_RCODE_NOERROR, _RCODE_NXDOMAIN):
+                    return name
+                # SERVFAIL/REFUSED: tenta o próximo servidor
+        return None
+
+    @staticmethod
+    def new_scan_limiter(concurrency: int = DNS_SCAN_CONCURRENCY) -> asyncio.Semaphore:
+        """Limitador das consultas PTR de uma varredura, para passar a resolve()."""
+        return asyncio.Semaphore(max(1, concurrency))
+
+    def close(self) -> None:
+        """Fecha os sockets abertos no loop de eventos corrente."""
+        state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is None:
+            return
+        for protocol in state.protocols.values():
+            if protocol.transport is not None:
+                protocol.transport.close()
+
+
+class _LoopState:
+    """Sockets e semáforo do resolvedor num loop de eventos."""
+
+    __slots__ = ('semaphore', 'protocols', 'opening')
+
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.protocols: Dict[Nameserver, _NameserverProtocol] = {}
+        self.opening: Dict[Nameserver, 'asyncio.Future[_NameserverProtocol]'] = {}
+
+
+PTR_RESOLVER = AsyncPTRResolver()
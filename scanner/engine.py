@@ -0,0 +1,264 @@
+import asyncio
+import socket
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set
+
+from .cache import ENRICHMENT_CACHE
+from .credentials import Community, probe_snmp_any
+from .discovery import DISCOVERY_TCP_PORTS, Discovered, discover_stream
+from .dns_resolver import PTR_RESOLVER
+from .icmp_sweep import IcmpSweep
+from .mac_vendor_lookup import MACVendorLookup
+from .metrics import HOSTS_TOTAL, STAGE_SECONDS
+from .neighbors import NEIGHBOR_TABLE
+from .probes import probe_icmp
+from .rate_control import PROBE_LIMITER
+
+# Tipo de resultado detalhado, alinhado ao formato da versão "Scanner com SNMP"
+HostInfo = Dict[str, Optional[str]]
+
+MAX_CONCURRENCY = 512  # Número máximo de hosts sondados simultaneamente
+LIVE_QUEUE_SIZE = 1024  # Hosts descobertos aguardando o SNMP e o enriquecimento
+
+
+def reverse_dns(ip: str) -> Optional[str]:
+    """Tenta resolver o nome DNS do host (PTR record)."""
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except Exception:
+        return None
+
+
+async def lookup_name(ip: str, dns_limiter: Optional[asyncio.Semaphore] = None) -> Optional[str]:
+    """
+    Resolve o nome DNS do host, consultando o cache antes do resolvedor PTR
+    assíncrono (limitado por `dns_limiter`, o limitador da varredura). Sem
+    servidores de nomes configurados, recorre a reverse_dns no executor.
+    """
+    with STAGE_SECONDS.time('reverse_dns'):
+        if PTR_RESOLVER.nameservers:
+            return await ENRICHMENT_CACHE.dns.get_or_load(
+                ip, lambda: PTR_RESOLVER.resolve(ip, dns_limiter))
+        loop = asyncio.get_running_loop()
+        return await ENRICHMENT_CACHE.dns.get_or_load(
+            ip, lambda: loop.run_in_executor(None, reverse_dns, ip))
+
+
+async def lookup_mac(ip: str) -> Optional[str]:
+    """Obtém o MAC do host pelo snapshot da tabela de vizinhos, com cache."""
+    with STAGE_SECONDS.time('mac_lookup'):
+        return await ENRICHMENT_CACHE.mac.get_or_load(ip, lambda: NEIGHBOR_TABLE.resolve(ip))
+
+
+async def lookup_vendor(mac: str) -> str:
+    """Descobre o fabricante de um MAC, com cache."""
+    async def load() -> str:
+        if MACVendorLookup.ONLINE_LOOKUP:
+            # A consulta online bloqueia; só ela precisa do executor
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, MACVendorLookup.get_vendor, mac)
+        return MACVendorLookup.get_vendor(mac)
+
+    with STAGE_SECONDS.time('vendor_lookup'):
+        return await ENRICHMENT_CACHE.vendor.get_or_load(mac.upper(), load) or "Unknown"
+
+
+def _new_host(ip: str) -> HostInfo:
+    return {
+        'ip': ip,
+        'name': None,
+        'mac': None,
+        'vendor': None,
+        'snmp_info': None,
+    }
+
+
+async def _enrich(host_info: HostInfo, dns_limiter: Optional[asyncio.Semaphore] = None) -> HostInfo:
+    """Preenche nome, MAC e fabricante de um host ativo (via caches compartilhados)."""
+    ip = host_info['ip']
+    assert ip is not None
+    name, mac = await asyncio.gather(lookup_name(ip, dns_limiter), lookup_mac(ip))
+    host_info['name'] = name
+    host_info['mac'] = mac
+    host_info['vendor'] = await lookup_vendor(mac) if mac else "Unknown"
+    return host_info
+
+
+async def scan_host(ip: str, community: Community) -> Optional[HostInfo]:
+    """
+    Escaneia um host individual no loop de eventos corrente e devolve
+    informações detalhadas ou None.
+
+    As sondagens SNMP/ICMP são corrotinas nativas; o enriquecimento (DNS
+    reverso, MAC e fabricante) só acontece para hosts ativos e passa pelos
+    caches compartilhados de ENRICHMENT_CACHE. Para faixas, scan_stream
+    descobre os hosts ativos antes e usa enrich_host.
+    """
+    host_info = _new_host(ip)
+
+    try:
+        # Sondagens limitadas pela janela adaptativa (AIMD) compartilhada
+        async with PROBE_LIMITER:
+            # Primeiro tenta SNMP completo
+            snmp_full = await probe_snmp_any(ip, community)
+            if snmp_full:
+                host_info['snmp_info'] = snmp_full
+
+            # Checa se host está vivo: SNMP ok ou ICMP responde
+            alive = bool(snmp_full)
+            if not alive:
+                icmp_result = await probe_icmp(ip)
+                alive = bool(icmp_result)
+        if not alive:
+            HOSTS_TOTAL.inc('down')
+            return None  # host aparentemente inativo
+        HOSTS_TOTAL.inc('snmp' if snmp_full else 'icmp')
+        return await _enrich(host_info)
+
+    except PermissionError:
+        print(f"AVISO: Permissões insuficientes para ICMP em {ip}.")
+        HOSTS_TOTAL.inc('error')
+        return None
+    except Exception as e:
+        print(f"Erro ao escanear {ip}: {e}")
+        HOSTS_TOTAL.inc('error')
+        return None
+
+
+async def enrich_host(ip: str, community: Community, method: str = 'icmp',
+                      dns_limiter: Optional[asyncio.Semaphore] = None) -> Optional[HostInfo]:
+    """
+    Segunda fase da varredura: SNMP completo e enriquecimento de um host que
+    a descoberta já encontrou ativo (por `method`: icmp, arp ou tcp).
+
+    Um host sem SNMP continua sendo reportado, só sem `snmp_info`.
+    `dns_limiter` é o limitador de consultas PTR da varredura.
+    """
+    host_info = _new_host(ip)
+    try:
+        async with PROBE_LIMITER:
+            snmp_full = await probe_snmp_any(ip, community)
+        host_info['snmp_info'] = snmp_full  # type: ignore[assignment]
+        HOSTS_TOTAL.inc('snmp' if snmp_full else method)
+        return await _enrich(host_info, dns_limiter)
+    except Exception as e:
+        print(f"Erro ao escanear {ip}: {e}")
+        HOSTS_TOTAL.inc('error')
+        return None
+
+
+async def scan_stream(ips: Iterable[str], community: Community, concurrency: int = MAX_CONCURRENCY,
+                      tcp_ports: Sequence[int] = DISCOVERY_TCP_PORTS) -> AsyncIterator[HostInfo]:
+    """
+    Escaneia os IPs em duas fases e produz cada host ativo assim que termina.
+
+    Fase um (discover_stream): descoberta barata dos hosts vivos, com um
+    único Echo Request por endereço e ARP/TCP para quem filtra ICMP. Fase
+    dois (enrich_host): SNMP completo e enriquecimento só dos vivos, com no
+    máximo `concurrency` em andamento. As fases se comunicam por uma fila
+    limitada (`LIVE_QUEUE_SIZE`), então o enriquecimento começa enquanto a
+    descoberta ainda percorre a faixa, e um endereço vazio nunca espera por
+    um timeout de SNMP.
+
+    Os IPs são consumidos do iterável sob demanda e nada é expandido
+    antecipadamente, de modo que a memória fica constante mesmo para faixas
+    enormes. As consultas PTR da varredura têm um limitador próprio
+    (DNS_SCAN_CONCURRENCY), além do limite do resolvedor no loop. Hosts que só respondem a SNMP (ICMP filtrado, nenhuma das
+    `tcp_ports` e fora do segmento local) não são encontrados; `tcp_ports`
+    vazio desliga a segunda chance por TCP.
+    """
+    # Um snapshot da tabela de vizinhos por varredura; misses a relêem
+    NEIGHBOR_TABLE.refresh()
+
+    live: 'asyncio.Queue[Optional[Discovered]]' = asyncio.Queue(LIVE_QUEUE_SIZE)
+    results: 'asyncio.Queue[Optional[HostInfo]]' = asyncio.Queue(max(1, concurrency))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    dns_limiter = PTR_RESOLVER.new_scan_limiter()
+
+    async def discover() -> None:
+        discovered = discover_stream(ips, tcp_ports)
+        try:
+            async for found in discovered:
+                await live.put(found)
+        except Exception:
+            await live.put(None)
+            raise
+        finally:
+            await discovered.aclose()
+        await live.put(None)
+
+    async def enrich(ip: str, method: str) -> None:
+        try:
+            result = await enrich_host(ip, community, method, dns_limiter)
+            if result:
+                # Espera o consumidor: contrapressão até a descoberta
+                await results.put(result)
+        finally:
+            semaphore.release()
+
+    async def enrich_all() -> None:
+        tasks: Set['asyncio.Future[None]'] = set()
+        try:
+            while True:
+                found = await live.get()
+                if found is None:
+                    break
+                await semaphore.acquire()
+                task = asyncio.ensure_future(enrich(*found))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        await results.put(None)
+
+    discovery = asyncio.ensure_future(discover())
+    enrichment = asyncio.ensure_future(enrich_all())
+    try:
+        while True:
+            info = await results.get()
+            if info is None:
+                break
+            yield info
+        await discovery  # Propaga falhas da descoberta
+    finally:
+        # Consumidor desistiu (ex: cliente desconectou): cancela o restante
+        discovery.cancel()
+        enrichment.cancel()
+
+
+async def scan_hosts(ips: Iterable[str], community: Community, concurrency: int = MAX_CONCURRENCY,
+                     tcp_ports: Sequence[int] = DISCOVERY_TCP_PORTS) -> List[HostInfo]:
+    """
+    Escaneia vários hosts concorrentemente no loop corrente.
+
+    Args:
+        ips: Os endereços IP a sondar.
+        community: A comunidade SNMP (v1) ou uma lista de credenciais.
+        concurrency: Limite de hosts sondados ao mesmo tempo.
+        tcp_ports: Portas da segunda chance por TCP (vazio desativa).
+
+    Returns:
+        A lista de hosts ativos, na ordem em que as sondagens terminaram.
+    """
+    return [host async for host in scan_stream(ips, community, concurrency, tcp_ports)]
+
+
+async def sweep_stream(ips: Iterable[str]) -> AsyncIterator[HostInfo]:
+    """
+    Varredura rápida de atividade: um único socket ICMP para a faixa inteira,
+    sem SNMP nem enriquecimento. Produz cada host assim que ele responde.
+    """
+    async for ip, _ in IcmpSweep().stream(ips):
+        yield _new_host(ip)
+
+
+async def sweep_hosts(ips: Iterable[str]) -> List[HostInfo]:
+    """
+    Executa sweep_stream até o fim.
+
+    Returns:
+        Os hosts que responderam ao Echo Request, na ordem das respostas.
+    """
+    return [host async for host in sweep_stream(ips)]
@@ -0,0 +1,318 @@
+import asyncio
+import errno
+import os
+import socket
+import struct
+import time
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Deque, Dict, Iterable, Optional, Tuple, Union
+
+from .rate_control import ICMP_RTTS, AimdController, RttTable, report_rtt
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+SWEEP_RATE = 2000        # Pacotes por segundo no início da varredura
+SWEEP_MIN_RATE = 100     # Limites do ajuste AIMD do ritmo
+SWEEP_MAX_RATE = 20000
+SWEEP_TIMEOUT = 1.0      # Janela de espera (s) após o último envio, até haver RTTs medidos
+SWEEP_PAYLOAD = b'scanner-sweep'
+SWEEP_BACKLOG = 65536    # Endereços enviados e ainda não entregues ao consumidor; além disso, o envio espera
+
+# Endereços a varrer: um iterável comum ou assíncrono (que pode esperar entre um e outro)
+Addresses = Union[Iterable[str], AsyncIterable[str]]
+
+
+def _checksum(data: bytes) -> int:
+    """Calcula o checksum da Internet (RFC 1071)."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _build_echo(icmp_type: int, ident: int, seq: int) -> bytes:
+    """Monta um pacote ICMP Echo Request com o checksum preenchido."""
+    header = struct.pack('!BBHHH', icmp_type, 0, 0, ident, seq)
+    checksum = _checksum(header + SWEEP_PAYLOAD)
+    return struct.pack('!BBHHH', icmp_type, 0, checksum, ident, seq) + SWEEP_PAYLOAD
+
+
+class _SweepSocket:
+    """Um socket ICMP (raw ou datagrama) de uma família de endereços."""
+
+    def __init__(self, family: int):
+        self.family = family
+        proto = socket.IPPROTO_ICMP if family == socket.AF_INET else socket.IPPROTO_ICMPV6
+        try:
+            self.sock = socket.socket(family, socket.SOCK_RAW, proto)
+            self.raw = True
+        except PermissionError:
+            # Ping sockets sem privilégios (Linux, net.ipv4.ping_group_range).
+            # O kernel substitui o identificador pelo "porto" do socket.
+            self.sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+            self.raw = False
+        self.sock.setblocking(False)
+        self.request_type = ICMP_ECHO_REQUEST if family == socket.AF_INET else ICMPV6_ECHO_REQUEST
+        self.reply_type = ICMP_ECHO_REPLY if family == socket.AF_INET else ICMPV6_ECHO_REPLY
+
+    def parse_reply(self, data: bytes) -> Optional[Tuple[int, int]]:
+        """Extrai (identificador, sequência) de um Echo Reply, ou None."""
+        if self.raw and self.family == socket.AF_INET:
+            # Raw sockets IPv4 entregam o cabeçalho IP junto
+            data = data[(data[0] & 0x0F) * 4:]
+        if len(data) < 8 or data[0] != self.reply_type:
+            return None
+        ident, seq = struct.unpack('!HH', data[4:8])
+        return ident, seq
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+async def _aiter(ips: Addresses) -> AsyncIterator[str]:
+    if isinstance(ips, AsyncIterable):
+        async for ip in ips:
+            yield ip
+    else:
+        for ip in ips:
+            yield ip
+
+
+def icmp_available(family: int = socket.AF_INET) -> bool:
+    """Indica se o processo consegue abrir um socket ICMP (raw ou ping socket)."""
+    try:
+        _SweepSocket(family).close()
+    except PermissionError:
+        return False
+    return True
+
+
+class IcmpSweep:
+    """
+    Varredura ICMP de uma faixa inteira usando um único socket por família.
+
+    Os Echo Requests são enviados em ritmo controlado e as respostas são
+    casadas por endereço de origem, identificador e número de sequência.
+    Hosts que não respondem expiram juntos, numa única janela após o último
+    envio, em vez de um timeout por host.
+
+    O ritmo começa em `rate` pacotes/s e é ajustado por AIMD: cresce a cada
+    resposta e cai pela metade quando os RTTs inflam em relação ao mínimo da
+    sub-rede ou quando o kernel recusa envios (ENOBUFS). Sem `timeout`
+    explícito, a janela final é o maior timeout medido (ICMP_RTTS) entre as
+    sub-redes varridas.
+
+    O envio também acompanha o consumidor: com `backlog` endereços aguardando
+    resposta ou entrega, ele pausa até o consumidor de stream() avançar.
+    """
+
+    def __init__(self, rate: int = SWEEP_RATE, timeout: Optional[float] = None,
+                 rtts: RttTable = ICMP_RTTS, backlog: int = SWEEP_BACKLOG):
+        self.rate = AimdController(rate, SWEEP_MIN_RATE, max(rate, SWEEP_MAX_RATE), increase=rate)
+        self.timeout = timeout if timeout is not None else SWEEP_TIMEOUT
+        self.adaptive_timeout = timeout is None
+        self.rtts = rtts
+        self.backlog = max(1, backlog)
+        self.ident = (os.getpid() ^ id(self)) & 0xFFFF
+        self._sockets: Dict[int, _SweepSocket] = {}
+        self._pending: Dict[str, Tuple[int, float]] = {}
+        # Envios em ordem, para expirar pendências sem percorrer o dicionário
+        self._sent: Deque[Tuple[str, int, float]] = deque()
+        self._silent: Deque[str] = deque()
+        self._report_silent = False
+        self._replies: 'asyncio.Queue[Tuple[str, float]]' = asyncio.Queue()
+        self._window = 0.0
+
+    def _socket_for(self, ip: str) -> _SweepSocket:
+        family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+        sweep_socket = self._sockets.get(family)
+        if sweep_socket is None:
+            try:
+                sweep_socket = _SweepSocket(family)
+            except PermissionError:
+                print("ERRO FATAL: Permissão negada para criar raw sockets. Tente executar com 'sudo'.")
+                raise
+            self._sockets[family] = sweep_socket
+            asyncio.get_running_loop().add_reader(
+                sweep_socket.sock.fileno(), self._on_readable, sweep_socket)
+        return sweep_socket
+
+    def _on_readable(self, sweep_socket: _SweepSocket) -> None:
+        while True:
+            try:
+                data, addr = sweep_socket.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            parsed = sweep_socket.parse_reply(data)
+            if parsed is None:
+                continue
+            ident, seq = parsed
+            if sweep_socket.raw and ident != self.ident:
+                continue  # Resposta a outro processo/varredura
+            src = addr[0]
+            entry = self._pending.get(src)
+            if entry is None or entry[0] != seq:
+                continue
+            del self._pending[src]
+            rtt = time.monotonic() - entry[1]
+            report_rtt(self.rtts, src, rtt, self.rate)
+            self._replies.put_nowait((src, rtt * 1000))
+
+    def _current_window(self) -> float:
+        return self._window if self.adaptive_timeout and self._window else self.timeout
+
+    def _expire(self, now: float) -> None:
+        """
+        Descarta pendências mais velhas que a janela, mantendo a memória
+        limitada. Com report_silent, elas ficam guardadas para serem
+        produzidas como endereços silenciosos.
+        """
+        deadline = now - self._current_window()
+        while self._sent and self._sent[0][2] < deadline:
+            ip, seq, sent_at = self._sent.popleft()
+            if self._pending.get(ip) != (seq, sent_at):
+                continue  # Já respondeu (ou foi reenviado)
+            del self._pending[ip]
+            if self._report_silent:
+                self._silent.append(ip)
+
+    def _outstanding(self) -> int:
+        return len(self._pending) + self._replies.qsize() + len(self._silent)
+
+    async def _send_all(self, ips: Addresses) -> None:
+        next_send = time.monotonic()
+        sent = -1
+        async for ip in _aiter(ips):
+            sent += 1
+            if self._outstanding() >= self.backlog:
+                # Consumidor atrasado: espera ele retirar respostas e silêncios
+                while self._outstanding() >= self.backlog:
+                    await asyncio.sleep(0.01)
+                    self._expire(time.monotonic())
+                next_send = time.monotonic()
+            sweep_socket = self._socket_for(ip)
+            seq = sent & 0xFFFF
+            packet = _build_echo(sweep_socket.request_type, self.ident, seq)
+            sent_at = time.monotonic()
+            self._pending[ip] = (seq, sent_at)
+            self._sent.append((ip, seq, sent_at))
+            while True:
+                try:
+                    sweep_socket.sock.sendto(packet, (ip, 0))
+                    break
+                except (BlockingIOError, InterruptedError):
+                    # Buffer de envio cheio: estamos mais rápidos que a interface
+                    self.rate.on_congestion()
+                    await asyncio.sleep(0.001)
+                except OSError as e:
+                    if e.errno == errno.ENOBUFS:
+                        self.rate.on_congestion()
+                        await asyncio.sleep(0.001)
+                        continue
+                    # Rede inalcançável etc.: trata como host inativo
+                    self._pending.pop(ip, None)
+                    if self._report_silent:
+                        self._silent.append(ip)
+                    break
+
+            if self.adaptive_timeout and sent % 256 == 0:
+                # Amostrado: consultar a tabela a cada pacote custaria mais que o envio
+                self._window = max(self._window, self.rtts.timeout_for(ip, self.timeout))
+
+            # Controle de ritmo: nunca à frente do ritmo corrente do AIMD
+            next_send += 1 / self.rate.value
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -0.1:
+                # Atrasado (loop ocupado): não tenta compensar com uma rajada
+                next_send = time.monotonic()
+            if sent and sent % 0x10000 == 0:
+                self._expire(time.monotonic())
+
+    async def stream(self, ips: Addresses,
+                     report_silent: bool = False) -> AsyncIterator[Tuple[str, Optional[float]]]:
+        """
+        Varre os IPs e produz (ip, rtt_ms) à medida que as respostas chegam.
+
+        Com `report_silent`, também produz (ip, None) para cada endereço que
+        não respondeu, assim que a janela de espera dele expira, para que
+        outra sondagem possa tentar o endereço sem esperar o fim da faixa.
+
+        Levanta PermissionError se nenhum tipo de socket ICMP puder ser criado.
+        """
+        self._report_silent = report_silent
+        sender = asyncio.ensure_future(self._send_all(ips))
+        try:
+            deadline = None
+            while True:
+                if sender.done() and deadline is None:
+                    sender.result()  # Propaga PermissionError e afins
+                    deadline = time.monotonic() + self._current_window()
+                if report_silent:
+                    self._expire(time.monotonic())
+                    while self._silent:
+                        yield self._silent.popleft(), None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if not self._pending and self._replies.empty():
+                        break
+                    if remaining <= 0:
+                        break
+                    wait = min(remaining, 0.05) if report_silent else remaining
+                else:
+                    wait = 0.05
+                try:
+                    yield await asyncio.wait_for(self._replies.get(), wait)
+                except asyncio.TimeoutError:
+                    continue
+            # Respostas que chegaram junto com o fim da janela
+            while not self._replies.empty():
+                yield self._replies.get_nowait()
+            if report_silent:
+                # Quem ainda estava pendente no fim da janela não respondeu
+                self._silent.extend(self._pending)
+                self._pending.clear()
+                while self._silent:
+                    yield self._silent.popleft(), None
+        finally:
+            sender.cancel()
+            self.close()
+
+    async def sweep(self, ips: Iterable[str]) -> Dict[str, float]:
+        """Varre os IPs e devolve {ip: rtt_ms} dos hosts que responderam."""
+        return {ip: rtt async for ip, rtt in self.stream(ips) if rtt is not None}
+
+    def close(self) -> None:
+        """Fecha os sockets e remove os leitores do loop."""
+        loop = asyncio.get_running_loop()
+        for sweep_socket in self._sockets.values():
+            loop.remove_reader(sweep_socket.sock.fileno())
+            sweep_socket.close()
+        self._sockets.clear()
+        self._pending.clear()
+        self._sent.clear()
+
+
+async def icmp_sweep(ips: Iterable[str], rate: int = SWEEP_RATE,
+                     timeout: Optional[float] = None) -> Dict[str, float]:
+    """
+    Atalho para uma varredura ICMP completa com um único socket.
+
+    Args:
+        ips: Os endereços IP a sondar.
+        rate: Pacotes enviados por segundo no início (ajustado por AIMD).
+        timeout: Janela de espera por respostas após o último envio; se
+            omitida, vem dos RTTs medidos nas sub-redes varridas.
+
+    Returns:
+        Um dicionário {ip: rtt_ms} com os hosts que responderam.
+    """
+    return await IcmpSweep(rate, timeout).sweep(ips)
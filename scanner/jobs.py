@@ -0,0 +1,285 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .cluster import CLUSTER
+from .credentials import Community
+from .discovery import DISCOVERY_TCP_PORTS
+from .engine import MAX_CONCURRENCY, scan_stream, sweep_stream
+from .metrics import METRICS
+from .records import HostRecord
+from .sharding import SHARD_POOL
+from .store import RESULT_STORE
+from .utils import HostRange
+
+JOB_PROBE_BUDGET = 4 * MAX_CONCURRENCY  # Sondagens reservadas somando todos os jobs em execução
+JOB_QUEUE_LIMIT = 32                    # Jobs aguardando vaga; além disso, novas varreduras são recusadas
+SWEEP_JOB_COST = 64                     # Reserva de uma varredura ICMP (um único socket, com ritmo próprio)
+SUBSCRIBER_QUEUE_SIZE = 256             # Eventos ao vivo pendentes por assinante (além disso, o job espera)
+SUBSCRIBER_STALL_TIMEOUT = 30.0         # Espera máxima (s) por um assinante parado antes de desligá-lo
+
+# Eventos entregues aos assinantes de um job:
+#   ('host', HostInfo), ('done', ativos, duração) ou ('error', mensagem)
+JobEvent = Tuple[Any, ...]
+JobKey = Tuple[HostRange, Community, str, bool, bool, Tuple[int, ...]]
+
+
+class JobRejected(Exception):
+    """Varredura recusada: a fila de jobs está cheia."""
+
+
+class JobSubscription:
+    """
+    Fila de eventos de um assinante de job.
+
+    Os hosts encontrados antes da assinatura são reentregues a partir da
+    lista do job (sem cópia); os eventos seguintes passam por uma fila
+    limitada, e o job espera quando ela está cheia.
+    """
+
+    __slots__ = ('_job', '_replayed', '_replay_end', '_queue')
+
+    def __init__(self, job: 'ScanJob', maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self._job = job
+        self._replayed = 0
+        self._replay_end = len(job.hosts)
+        self._queue: 'asyncio.Queue[JobEvent]' = asyncio.Queue(maxsize)
+
+    async def get(self) -> JobEvent:
+        if self._replayed < self._replay_end:
+            record = self._job.hosts[self._replayed]
+            self._replayed += 1
+            return ('host', record.to_info())
+        return await self._queue.get()
+
+    async def put(self, event: JobEvent, timeout: float) -> bool:
+        """Entrega um evento ao vivo; False se o assinante não abriu espaço a tempo."""
+        try:
+            await asyncio.wait_for(self._queue.put(event), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def abort(self, message: str) -> None:
+        """Descarta o que está pendente e encerra o fluxo com um evento de erro."""
+        self._replay_end = self._replayed
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(('error', message))
+
+
+class _CountingIterator:
+    """Iterador que conta quantos endereços já foram entregues às sondagens."""
+
+    def __init__(self, iterable: Iterable[Any], weight: Callable[[Any], int] = lambda _: 1):
+        self._iterator = iter(iterable)
+        self._weight = weight
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        value = next(self._iterator)
+        self.count += self._weight(value)
+        return value
+
+
+class ScanJob:
+    """
+    Uma varredura em andamento, compartilhada por todos os clientes que
+    pediram a mesma faixa, comunidade e modo.
+
+    Cada assinante tem sua fila de eventos (JobSubscription). Quem chega com
+    o job já rodando recebe primeiro os hosts encontrados até ali e depois
+    segue ao vivo. As filas são limitadas: o job espera o assinante mais
+    lento, o que propaga a contrapressão do socket do cliente até as
+    sondagens; um assinante parado por mais de `SUBSCRIBER_STALL_TIMEOUT`
+    é desligado com um evento de erro, e os demais seguem.
+    """
+
+    def __init__(self, job_id: str, key: JobKey, cidr: str, concurrency: int):
+        self.id = job_id
+        self.key = key
+        self.host_range, self.community, self.mode, self.sharded, self.distributed, self.tcp_ports = key
+        self.cidr = cidr
+        self.concurrency = concurrency
+        self.cost = SWEEP_JOB_COST if self.mode == 'sweep' else concurrency
+        self.hosts: List[HostRecord] = []  # Compactos; o dicionário só existe na entrega
+        self.finished = False
+        self.task: Optional['asyncio.Task[None]'] = None
+        self._addresses: Optional[_CountingIterator] = None
+        self._subscribers: Set[JobSubscription] = set()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def dispatched(self) -> int:
+        """Endereços já entregues às sondagens (0 enquanto o job está na fila)."""
+        return self._addresses.count if self._addresses is not None else 0
+
+    def subscribe(self) -> JobSubscription:
+        subscription = JobSubscription(self)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: JobSubscription) -> None:
+        self._subscribers.discard(subscription)
+
+    async def _publish(self, event: JobEvent) -> None:
+        subscriptions = list(self._subscribers)
+        delivered = await asyncio.gather(
+            *(subscription.put(event, SUBSCRIBER_STALL_TIMEOUT) for subscription in subscriptions))
+        for subscription, ok in zip(subscriptions, delivered):
+            if not ok and subscription in self._subscribers:
+                self._subscribers.discard(subscription)
+                subscription.abort(
+                    f"Cliente não acompanhou a varredura por {SUBSCRIBER_STALL_TIMEOUT:.0f}s; "
+                    "entrega interrompida")
+
+    async def run(self) -> None:
+        if self.distributed:
+            self._addresses = _CountingIterator(CLUSTER.shards(self.host_range), lambda shard: shard.size)
+            stream = CLUSTER.stream(self._addresses, self.community, max(1, self.concurrency), self.tcp_ports)
+        elif self.sharded:
+            self._addresses = _CountingIterator(SHARD_POOL.shards(self.host_range), lambda shard: shard.size)
+            stream = SHARD_POOL.stream(self._addresses, self.community, max(1, self.concurrency), self.tcp_ports)
+        elif self.mode == 'sweep':
+            self._addresses = _CountingIterator(self.host_range)
+            stream = sweep_stream(self._addresses)
+        else:
+            self._addresses = _CountingIterator(self.host_range)
+            stream = scan_stream(self._addresses, self.community, max(1, self.concurrency), self.tcp_ports)
+        started = time.monotonic()
+        scan_id = RESULT_STORE.begin_scan(self.cidr, self.mode)
+        failure: Optional[str] = None
+        try:
+            async for info in stream:
+                self.hosts.append(HostRecord.from_info(info))
+                RESULT_STORE.record(scan_id, info)
+                await self._publish(('host', info))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failure = f"Falha na varredura: {e}"
+        finally:
+            self.finished = True
+            await stream.aclose()
+            # Fecha o registro no histórico também em falhas e cancelamentos
+            RESULT_STORE.finish_scan(scan_id, len(self.hosts))
+
+        if failure is not None:
+            await self._publish(('error', failure))
+        else:
+            await self._publish(('done', len(self.hosts), time.monotonic() - started))
+
+
+class JobManager:
+    """
+    Fila central de varreduras, com deduplicação e controle de admissão.
+
+    Pedidos idênticos (mesma faixa, comunidade e modo) enquanto um job está
+    na fila ou em execução assinam esse mesmo job em vez de repetir a
+    varredura. Cada job reserva sua concorrência de um orçamento global de
+    sondagens (`JOB_PROBE_BUDGET`); sem orçamento livre, ele espera na fila
+    (em ordem de chegada) e, com a fila cheia, é recusado. Quando o último
+    assinante sai (cancelamento ou desconexão), o job é cancelado e suas
+    sondagens pendentes também.
+    """
+
+    def __init__(self, budget: int = JOB_PROBE_BUDGET, queue_limit: int = JOB_QUEUE_LIMIT):
+        self.budget = budget
+        self.queue_limit = queue_limit
+        self.in_use = 0
+        self._ids = itertools.count(1)
+        self._jobs: Dict[JobKey, ScanJob] = {}
+        self._queue: Deque[ScanJob] = deque()
+
+    def submit(self, cidr: str, host_range: HostRange, community: Community, mode: str,
+               concurrency: int = MAX_CONCURRENCY, sharded: bool = False, distributed: bool = False,
+               tcp_ports: Sequence[int] = DISCOVERY_TCP_PORTS) -> Tuple[ScanJob, JobSubscription, bool]:
+        """
+        Inicia (ou enfileira) uma varredura, ou assina uma idêntica já em andamento.
+
+        `tcp_ports` são as portas da segunda chance da descoberta (modo full;
+        a varredura ICMP não as usa).
+
+        Returns:
+            O job, a fila de eventos do assinante e se o job já existia.
+
+        Raises:
+            JobRejected: se o job precisar esperar e a fila estiver cheia.
+        """
+        ports = tuple(tcp_ports) if mode == 'full' else ()
+        key: JobKey = (host_range, community, mode, sharded, distributed, ports)
+        job = self._jobs.get(key)
+        shared = job is not None and not job.finished
+        if not shared:
+            job = ScanJob(f"j{next(self._ids)}", key, cidr, min(concurrency, self.budget))
+            if self._queue or job.cost > self.budget - self.in_use:
+                if len(self._queue) >= self.queue_limit:
+                    raise JobRejected(
+                        f"Servidor ocupado: {len(self._queue)} varreduras na fila. Tente novamente mais tarde.")
+                self._queue.append(job)
+            else:
+                self._start(job)
+            self._jobs[key] = job
+        assert job is not None
+        return job, job.subscribe(), shared
+
+    def position(self, job: ScanJob) -> int:
+        """Posição do job na fila (1 = próximo), ou 0 se já está em execução."""
+        try:
+            return self._queue.index(job) + 1
+        except ValueError:
+            return 0
+
+    def detach(self, job: ScanJob, subscription: JobSubscription) -> None:
+        job.unsubscribe(subscription)
+        if job.subscribers or job.finished:
+            return
+        # Ninguém mais espera por este job
+        if job.task is None:
+            self._queue.remove(job)
+            self._forget(job)
+        else:
+            job.task.cancel()
+
+    def _start(self, job: ScanJob) -> None:
+        self.in_use += job.cost
+        job.task = asyncio.ensure_future(job.run())
+        job.task.add_done_callback(lambda _: self._finished(job))
+
+    def _finished(self, job: ScanJob) -> None:
+        self.in_use -= job.cost
+        self._forget(job)
+        self._admit()
+
+    def _forget(self, job: ScanJob) -> None:
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+
+    def _admit(self) -> None:
+        while self._queue and self._queue[0].cost <= self.budget - self.in_use:
+            self._start(self._queue.popleft())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'running': len(self._jobs) - len(self._queue),
+            'queued': len(self._queue),
+            'probe_budget': self.budget,
+            'probes_reserved': self.in_use,
+            'subscribers': sum(job.subscribers for job in self._jobs.values()),
+        }
+
+
+JOBS = JobManager()
+
+METRICS.gauge('scanner_jobs', 'Varreduras por estado.',
+              lambda: {('running',): JOBS.stats()['running'], ('queued',): JOBS.stats()['queued']}, ('state',))
+METRICS.gauge('scanner_job_probes_reserved', 'Sondagens reservadas do orçamento global pelos jobs em execução.',
+              lambda: JOBS.in_use)
@@ -1,11 +1,23 @@
+from typing import Optional
+
+from .oui_db import DEFAULT_INDEX_PATH, OUIDatabase
+
+
 class MACVendorLookup:
     """Realiza resolução de fabricante a partir do endereço MAC.
 
-    Primeiro tenta uma tabela local de OUIs comuns.
-    Caso não encontre, faz uma consulta rápida à API pública macvendors.com.
-    Caso a consulta falhe, retorna "Unknown".
+    Primeiro consulta o índice offline do registro do IEEE (ver oui_db.py),
+    sem acesso à rede. Sem o índice, tenta uma tabela local de OUIs comuns.
+    A consulta à API pública macvendors.com é bloqueante e fica desativada
+    por padrão (ONLINE_LOOKUP). Caso nada seja encontrado, retorna "Unknown".
     """
 
+    INDEX_PATH = DEFAULT_INDEX_PATH
+    ONLINE_LOOKUP = False
+
+    _database: Optional[OUIDatabase] = None
+    _database_loaded = False
+
     LOCAL_OUI = {
         '00:1A:2B': 'Cisco',
         '00:1B:63': 'Apple',
@@ -31,23 +43,43 @@ class MACVendorLookup:
         '00:1D:72': 'Acer',
     }
 
-    @staticmethod
-    def get_vendor(mac: str) -> str:
+    @classmethod
+    def database(cls) -> Optional[OUIDatabase]:
+        """Abre (uma única vez) o índice de OUIs mapeado em memória."""
+        if not cls._database_loaded:
+            cls._database = OUIDatabase.open(cls.INDEX_PATH)
+            cls._database_loaded = True
+            if cls._database is None:
+                print(f"AVISO: Índice de OUI não encontrado em {cls.INDEX_PATH}; usando a tabela "
+                      "local de OUIs. Gere-o com 'python -m scanner.oui_db build'.")
+        return cls._database
+
+    @classmethod
+    def get_vendor(cls, mac: str) -> str:
         """Tenta descobrir o fabricante associado a um endereço MAC."""
         if not mac:
             return "Unknown"
 
         try:
+            database = cls.database()
+            if database is not None:
+                vendor = database.lookup(mac)
+                if vendor:
+                    return vendor
+
             oui_parts = mac.upper().replace('-', ':').replace('.', ':').split(':')[:3]
             if len(oui_parts) < 3:
                 return "Unknown"
             oui = ':'.join(oui_parts)
 
-            # Primeiro tenta tabela local
-            if oui in MACVendorLookup.LOCAL_OUI:
-                return MACVendorLookup.LOCAL_OUI[oui]
+            # Tabela local de OUIs comuns
+            if oui in cls.LOCAL_OUI:
+                return cls.LOCAL_OUI[oui]
+
+            if not cls.ONLINE_LOOKUP:
+                return "Unknown"
 
-            # Fallback: consulta rápida API pública (timeout curto)
+            # Fallback opcional: consulta rápida API pública (timeout curto)
             import urllib.request
             url = f'https://api.macvendors.com/{"-".join(oui_parts)}'
             try:
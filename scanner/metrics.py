@@ -0,0 +1,240 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+METRICS_HOST = '127.0.0.1'    # Só local por padrão; '0.0.0.0' expõe /metrics em todas as interfaces
+METRICS_PORT = 9464           # Porta lateral do endpoint /metrics (0 desativa)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelValues = Tuple[str, ...]
+GaugeSample = Union[float, Dict[LabelValues, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    @abstractmethod
+    def collect(self) -> List[str]:
+        """Linhas de amostra no formato texto do Prometheus (sem o cabeçalho)."""
+
+
+class Counter(_Metric):
+    """Contador monotônico, opcionalmente com rótulos."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> List[str]:
+        return [f'{self.name}{_labels(self.label_names, labels)} {_number(value)}'
+                for labels, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """
+    Histograma de latências (s) com baldes cumulativos fixos.
+
+    Cada observação custa uma busca binária e dois incrementos; nada é
+    alocado no caminho quente além da primeira vez que um rótulo aparece.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Por rótulo: [contagens por balde (+Inf no fim), soma]
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Mede o bloco (inclusive awaits), mesmo que ele termine com exceção."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series is not None else 0
+
+    def collect(self) -> List[str]:
+        lines: List[str] = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {_number(total[0])}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Valor instantâneo, lido no momento da coleta por uma função."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], GaugeSample],
+                 labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._read = read
+
+    def collect(self) -> List[str]:
+        try:
+            sample = self._read()
+        except Exception:
+            return []
+        if isinstance(sample, dict):
+            return [f'{self.name}{_labels(self.label_names, labels)} {_number(value)}'
+                    for labels, value in sample.items()]
+        return [f'{self.name} {_number(sample)}']
+
+
+class CounterFunc(Gauge):
+    """Contador mantido em outro lugar (ex: estatísticas de cache), lido na coleta."""
+
+    kind = 'counter'
+
+
+class MetricsRegistry:
+    """Métricas do processo, expostas no formato texto do Prometheus."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))  # type: ignore[return-value]
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = STAGE_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], GaugeSample],
+              labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, read, labels))  # type: ignore[return-value]
+
+    def counter_func(self, name: str, documentation: str, read: Callable[[], GaugeSample],
+                     labels: Sequence[str] = ()) -> CounterFunc:
+        return self.register(CounterFunc(name, documentation, read, labels))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            samples = metric.collect()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+
+# Estágios de uma sondagem: icmp, tcp_connect, snmp_get, snmp_bulk (walks), reverse_dns,
+# mac_lookup, vendor_lookup e response_write (escrita do resultado para o cliente).
+STAGE_SECONDS = METRICS.histogram(
+    'scanner_stage_seconds', 'Duração de cada estágio da sondagem de um host.', ('stage',))
+SNMP_OIDS_TOTAL = METRICS.counter(
+    'scanner_snmp_oids_total', 'OIDs pedidos a hosts que responderam ao SNMP, por OID e resultado (ok, missing).',
+    ('oid', 'result'))
+HOSTS_TOTAL = METRICS.counter(
+    'scanner_hosts_total', 'Hosts sondados, por resultado (snmp, icmp, arp, tcp, down, error).', ('result',))
+
+
+def _default_executor_queue() -> float:
+    # Tarefas aguardando uma thread do executor padrão (DNS/ARP/fabricante bloqueantes)
+    executor = getattr(asyncio.get_running_loop(), '_default_executor', None)
+    queue = getattr(executor, '_work_queue', None)
+    return queue.qsize() if queue is not None else 0
+
+
+METRICS.gauge('scanner_executor_queue_depth', 'Tarefas esperando thread no executor padrão.',
+              _default_executor_queue)
+
+
+async def _handle_scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+        path = request.split(b' ', 2)[1] if request.count(b' ') >= 2 else b''
+        if path.split(b'?')[0] in (b'/metrics', b'/'):
+            status, body = '200 OK', METRICS.render().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            status, body, content_type = '404 Not Found', b'not found\n', 'text/plain'
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                     f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str = METRICS_HOST,
+                               port: int = METRICS_PORT) -> Optional[asyncio.AbstractServer]:
+    """
+    Sobe o endpoint HTTP /metrics na porta lateral.
+
+    Returns:
+        O servidor, ou None se a porta for 0 ou estiver ocupada (a varredura
+        segue funcionando sem métricas).
+    """
+    if not port:
+        return None
+    try:
+        server = await asyncio.start_server(_handle_scrape, host, port, reuse_address=True)
+    except OSError as e:
+        print(f"AVISO: Métricas indisponíveis; porta {port} em uso ({e}).")
+        return None
+    print(f"[MÉTRICAS] Endpoint em http://{host}:{port}/metrics")
+    return server
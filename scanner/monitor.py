@@ -0,0 +1,266 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from .credentials import Community, snmp_auth
+from .engine import HostInfo, scan_stream
+from .icmp_sweep import IcmpSweep
+from .jobs import SUBSCRIBER_QUEUE_SIZE, SUBSCRIBER_STALL_TIMEOUT
+from .neighbors import NEIGHBOR_TABLE
+from .probes import ProbeResult, probe_snmp
+from .records import HostRecord
+from .utils import HostRange
+
+MONITOR_INTERVAL = 300.0          # Segundos entre ciclos
+MONITOR_MIN_INTERVAL = 10.0       # Menor intervalo aceito de um cliente
+MONITOR_FULL_RESCAN_EVERY = 12    # A cada N ciclos, varredura completa (SNMP em toda a faixa)
+MONITOR_DOWN_AFTER = 2            # Ciclos leves sem resposta antes de declarar um host inativo
+
+Event = Dict[str, Any]
+# Entregues aos assinantes: ('diff', ciclo, eventos) ou ('error', mensagem)
+MonitorEvent = Tuple[Any, ...]
+# Estado de um host num ciclo: registro guardado ou resultado novo da varredura
+HostState = Union[HostRecord, HostInfo]
+
+# Campos comparados entre ciclos para gerar eventos "changed"
+_WATCHED_FIELDS = ('name', 'mac', 'vendor')
+_SYS_NAME = 'Nome SNMP'
+
+
+def diff_host(old: HostState, new: HostState) -> List[Event]:
+    """Compara dois estados de um mesmo host e devolve os eventos de mudança."""
+    events: List[Event] = []
+    for field in _WATCHED_FIELDS:
+        if old.get(field) != new.get(field):
+            events.append({'event': 'changed', 'ip': new['ip'], 'field': field,
+                           'old': old.get(field), 'new': new.get(field)})
+    old_snmp = old.get('snmp_info') or {}
+    new_snmp = new.get('snmp_info') or {}
+    if old_snmp.get(_SYS_NAME) != new_snmp.get(_SYS_NAME):  # type: ignore[union-attr]
+        events.append({'event': 'changed', 'ip': new['ip'], 'field': 'sysName',
+                       'old': old_snmp.get(_SYS_NAME), 'new': new_snmp.get(_SYS_NAME)})  # type: ignore[union-attr]
+    return events
+
+
+class MonitorSubscription:
+    """
+    Fila limitada dos ciclos de um monitor para um assinante.
+
+    Como nos jobs, o monitor espera um assinante com a fila cheia por até
+    `SUBSCRIBER_STALL_TIMEOUT` segundos e depois o desliga com um evento de
+    erro, sem acumular ciclos sem limite.
+    """
+
+    __slots__ = ('_queue',)
+
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self._queue: 'asyncio.Queue[MonitorEvent]' = asyncio.Queue(maxsize)
+
+    async def get(self) -> MonitorEvent:
+        return await self._queue.get()
+
+    async def put(self, event: MonitorEvent, timeout: float) -> bool:
+        """Entrega um ciclo; False se o assinante não abriu espaço a tempo."""
+        try:
+            await asyncio.wait_for(self._queue.put(event), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def abort(self, message: str) -> None:
+        """Descarta os ciclos pendentes e encerra o fluxo com um evento de erro."""
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(('error', message))
+
+
+class Monitor:
+    """
+    Monitoramento contínuo de uma faixa com varreduras incrementais.
+
+    O primeiro ciclo (e um a cada `full_rescan_every`) é uma varredura
+    completa. Nos ciclos leves intermediários:
+
+    - toda a faixa recebe um único Echo Request (IcmpSweep, um socket);
+    - hosts conhecidos que não respondem a ICMP recebem só um GET de sysName,
+      que também é comparado com o guardado;
+    - o MAC dos hosts conhecidos é conferido no snapshot da tabela ARP, sem
+      enviar pacotes;
+    - apenas hosts novos ou com MAC alterado passam pelo enriquecimento
+      completo (scan_host).
+
+    Cada ciclo produz somente as diferenças (host up/down, campos alterados),
+    entregues a todos os assinantes (ver MonitorSubscription).
+    """
+
+    def __init__(self, host_range: HostRange, community: Community = 'public',
+                 interval: float = MONITOR_INTERVAL,
+                 full_rescan_every: int = MONITOR_FULL_RESCAN_EVERY,
+                 down_after: int = MONITOR_DOWN_AFTER):
+        self.host_range = host_range
+        self.community = community
+        self.interval = interval
+        self.full_rescan_every = max(1, full_rescan_every)
+        self.down_after = max(1, down_after)
+        self.cycle = 0
+        self.hosts: Dict[str, HostRecord] = {}
+        self._misses: Dict[str, int] = {}
+        self._subscribers: Set[MonitorSubscription] = set()
+        self._task: Optional['asyncio.Task[None]'] = None
+
+    def subscribe(self) -> MonitorSubscription:
+        subscription = MonitorSubscription()
+        self._subscribers.add(subscription)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription: MonitorSubscription) -> None:
+        self._subscribers.discard(subscription)
+        if not self._subscribers:
+            self.stop()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                events = await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[MONITOR] Erro no ciclo {self.cycle} de {self.host_range}: {e}")
+                events = []
+            await self._publish(('diff', self.cycle, events))
+            await asyncio.sleep(self.interval)
+
+    async def _publish(self, event: MonitorEvent) -> None:
+        subscriptions = list(self._subscribers)
+        delivered = await asyncio.gather(
+            *(subscription.put(event, SUBSCRIBER_STALL_TIMEOUT) for subscription in subscriptions))
+        for subscription, ok in zip(subscriptions, delivered):
+            if not ok and subscription in self._subscribers:
+                self._subscribers.discard(subscription)
+                subscription.abort(
+                    f"Cliente não acompanhou o monitoramento por {SUBSCRIBER_STALL_TIMEOUT:.0f}s; "
+                    "entrega interrompida")
+
+    async def run_cycle(self) -> List[Event]:
+        """Executa um ciclo (completo ou leve) e devolve os eventos gerados."""
+        self.cycle += 1
+        if (self.cycle - 1) % self.full_rescan_every == 0:
+            current = {host['ip']: host async for host in scan_stream(self.host_range, self.community)}
+            self._misses.clear()
+            return self._apply(current)
+        return self._apply(await self._light_cycle())
+
+    async def _light_cycle(self) -> Dict[str, HostState]:
+        alive = await IcmpSweep().sweep(self.host_range)
+
+        # Hosts conhecidos em silêncio no ICMP: um único GET de sysName
+        quiet = [ip for ip in self.hosts if ip not in alive]
+        snmp_results = await asyncio.gather(*(self._probe_sys_name(ip) for ip in quiet))
+        responsive = set(alive)
+        renamed: Dict[str, HostState] = {}
+        for ip, result in zip(quiet, snmp_results):
+            if not result:
+                continue
+            responsive.add(ip)
+            known = self.hosts[ip]
+            snmp_info = known.snmp_info or {}
+            if snmp_info.get(_SYS_NAME) != result[1]:
+                # O GET já trouxe o sysName novo: _apply gera o "changed" sem varrer o host
+                info = known.to_info()
+                info['snmp_info'] = {**snmp_info, _SYS_NAME: result[1]}
+                renamed[ip] = info
+
+        # MAC movido: conferido no snapshot da tabela de vizinhos
+        NEIGHBOR_TABLE.refresh()
+        moved = []
+        for ip in responsive:
+            known = self.hosts.get(ip)
+            if known is None:
+                continue
+            mac = NEIGHBOR_TABLE.lookup(ip)
+            if mac and known.get('mac') and mac != known['mac']:
+                moved.append(ip)
+
+        new = [ip for ip in responsive if ip not in self.hosts]
+        current: Dict[str, HostState] = {
+            ip: renamed.get(ip, info) for ip, info in self.hosts.items() if ip in responsive
+        }
+        async for host in scan_stream(new + moved, self.community):
+            current[host['ip']] = host
+
+        # Hosts que pararam de responder só caem após `down_after` ciclos
+        for ip, info in self.hosts.items():
+            if ip in responsive:
+                self._misses.pop(ip, None)
+            else:
+                misses = self._misses.get(ip, 0) + 1
+                self._misses[ip] = misses
+                if misses < self.down_after:
+                    current[ip] = info
+        return current
+
+    async def _probe_sys_name(self, ip: str) -> Optional[ProbeResult]:
+        # Com uma lista de credenciais, só a que o host já aceitou
+        auth = await snmp_auth(ip, self.community)
+        return await probe_snmp(ip, auth=auth) if auth is not None else None
+
+    def _apply(self, current: Dict[str, HostState]) -> List[Event]:
+        # Entre ciclos os hosts ficam como HostRecord; só os resultados novos
+        # chegam como dicionário e são compactados aqui
+        events: List[Event] = []
+        hosts: Dict[str, HostRecord] = {}
+        for ip, info in current.items():
+            old = self.hosts.get(ip)
+            if old is None:
+                events.append({'event': 'up', 'ip': ip,
+                               'host': info.to_info() if isinstance(info, HostRecord) else info})
+            elif old is not info:
+                events.extend(diff_host(old, info))
+            hosts[ip] = info if isinstance(info, HostRecord) else HostRecord.from_info(info)
+        for ip in self.hosts:
+            if ip not in current:
+                events.append({'event': 'down', 'ip': ip})
+                self._misses.pop(ip, None)
+        self.hosts = hosts
+        return events
+
+
+class MonitorRegistry:
+    """
+    Monitores ativos, compartilhados entre clientes que assinam a mesma faixa.
+
+    O monitor nasce com o primeiro assinante e para quando o último sai.
+    """
+
+    def __init__(self) -> None:
+        self._monitors: Dict[Tuple[HostRange, Community, float], Monitor] = {}
+
+    def attach(self, host_range: HostRange, community: Community,
+               interval: float) -> Tuple[Monitor, MonitorSubscription]:
+        key = (host_range, community, interval)
+        monitor = self._monitors.get(key)
+        if monitor is None:
+            monitor = self._monitors[key] = Monitor(host_range, community, interval)
+        return monitor, monitor.subscribe()
+
+    def detach(self, monitor: Monitor, subscription: MonitorSubscription) -> None:
+        monitor.unsubscribe(subscription)
+        if not monitor.subscribers:
+            key = (monitor.host_range, monitor.community, monitor.interval)
+            self._monitors.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._monitors)
+
+
+MONITORS = MonitorRegistry()
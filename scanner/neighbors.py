@@ -0,0 +1,120 @@
+import asyncio
+import time
+from functools import partial
+from typing import Dict, Optional
+
+from getmac import get_mac_address
+
+ARP_TABLE_PATH = '/proc/net/arp'
+NEIGHBOR_MAX_AGE = 5.0        # Idade máxima (s) do snapshot antes de reler a tabela
+NEIGHBOR_MISS_REFRESH = 0.5   # Intervalo mínimo (s) entre releituras motivadas por misses
+
+_ATF_COMPLETE = 0x2
+_EMPTY_MAC = '00:00:00:00:00:00'
+
+
+def parse_arp_table(text: str) -> Dict[str, str]:
+    """
+    Interpreta o conteúdo de /proc/net/arp.
+
+    Entradas incompletas (sem a flag ATF_COM) ou sem endereço de hardware
+    são ignoradas.
+
+    Returns:
+        Um dicionário {ip: mac} com MACs em minúsculas separados por ':'.
+    """
+    entries: Dict[str, str] = {}
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        ip, _, flags, mac = fields[:4]
+        try:
+            complete = int(flags, 16) & _ATF_COMPLETE
+        except ValueError:
+            continue
+        mac = mac.lower()
+        if complete and mac != _EMPTY_MAC:
+            entries[ip] = mac
+    return entries
+
+
+class NeighborTable:
+    """
+    Snapshot da tabela de vizinhos (ARP) do sistema em um dicionário.
+
+    Em vez de reler a tabela inteira a cada host, como faz
+    getmac.get_mac_address(ip=...), o arquivo é lido uma vez e consultado em
+    memória. A releitura acontece quando o snapshot passa de `max_age`
+    segundos ou quando um IP não é encontrado (limitada a uma a cada
+    `miss_refresh` segundos), e é aplicada de forma incremental.
+
+    A consulta individual via getmac fica como fallback para o que o
+    snapshot não cobre: sistemas sem /proc/net/arp, endereços IPv6 e IPv4
+    ausentes da tabela mesmo após a releitura (o próprio IP do servidor,
+    que nunca aparece nela, ou entradas que o kernel já descartou e que o
+    getmac provoca de novo com um pacote).
+    """
+
+    def __init__(self, path: str = ARP_TABLE_PATH, max_age: float = NEIGHBOR_MAX_AGE,
+                 miss_refresh: float = NEIGHBOR_MISS_REFRESH):
+        self.path = path
+        self.max_age = max_age
+        self.miss_refresh = miss_refresh
+        self.available = True
+        self.refreshes = 0
+        self._entries: Dict[str, str] = {}
+        self._loaded_at = float('-inf')
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def refresh(self) -> int:
+        """
+        Relê a tabela e aplica as diferenças ao snapshot.
+
+        Returns:
+            Quantas entradas foram adicionadas, alteradas ou removidas.
+        """
+        self._loaded_at = time.monotonic()
+        try:
+            with open(self.path, encoding='ascii', errors='replace') as f:
+                current = parse_arp_table(f.read())
+        except OSError:
+            self.available = False
+            return 0
+
+        self.available = True
+        self.refreshes += 1
+        changes = 0
+        for ip in [ip for ip in self._entries if ip not in current]:
+            del self._entries[ip]
+            changes += 1
+        for ip, mac in current.items():
+            if self._entries.get(ip) != mac:
+                self._entries[ip] = mac
+                changes += 1
+        return changes
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """Consulta o snapshot, relendo a tabela se estiver velho ou em caso de miss."""
+        age = time.monotonic() - self._loaded_at
+        if age > self.max_age:
+            self.refresh()
+            age = 0.0
+        mac = self._entries.get(ip)
+        if mac is None and age > self.miss_refresh:
+            self.refresh()
+            mac = self._entries.get(ip)
+        return mac
+
+    async def resolve(self, ip: str) -> Optional[str]:
+        """Resolve o MAC de um IP pela tabela, recorrendo ao getmac quando ela não tem o IP."""
+        mac = self.lookup(ip)
+        if mac is not None:
+            return mac
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(get_mac_address, ip=ip))
+
+
+NEIGHBOR_TABLE = NeighborTable()
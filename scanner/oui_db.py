@@ -0,0 +1,256 @@
+import argparse
+import csv
+import io
+import mmap
+import os
+import struct
+import sys
+import urllib.request
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .utils import user_data_dir
+
+DEFAULT_INDEX_PATH = os.path.join(user_data_dir(), 'oui.idx')
+
+# Registros públicos do IEEE: MA-L (24 bits), MA-M (28 bits) e MA-S (36 bits)
+IEEE_REGISTRY_URLS = (
+    'https://standards-oui.ieee.org/oui/oui.csv',
+    'https://standards-oui.ieee.org/oui28/mam.csv',
+    'https://standards-oui.ieee.org/oui36/oui36.csv',
+)
+
+# Tamanhos de prefixo, do mais específico para o mais geral (longest-prefix match)
+PREFIX_BITS = (36, 28, 24)
+_REGISTRY_BITS = {'MA-L': 24, 'MA-M': 28, 'MA-S': 36}
+_REGISTRY_COLUMNS = ('Registry', 'Assignment', 'Organization Name')
+
+# Cabeçalho: magic, versão, reservado, quantidade por tabela (36/28/24 bits),
+# quantidade de strings, tamanho do bloco de strings. Tudo little-endian.
+_MAGIC = b'OUIX'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHH5I')
+_HEADER_SIZE = 32  # Cabeçalho alinhado a 8 bytes para os arrays de uint64
+
+OUIEntry = Tuple[int, int, str]  # (bits do prefixo, prefixo, fabricante)
+
+
+def mac_to_int(mac: str) -> Optional[int]:
+    """Converte um MAC em qualquer notação usual (':', '-', '.', nenhuma) para inteiro de 48 bits."""
+    digits = ''.join(ch for ch in mac if ch not in ':-. ')
+    if len(digits) != 12:
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+
+def parse_registry_csv(stream: Iterable[str]) -> Iterator[OUIEntry]:
+    """
+    Lê um CSV de registro do IEEE (oui.csv, mam.csv ou oui36.csv).
+
+    As colunas usadas são "Registry" (MA-L/MA-M/MA-S), "Assignment" (prefixo
+    em hexadecimal) e "Organization Name".
+
+    Raises:
+        ValueError: Se o cabeçalho não tiver essas colunas (ex: uma página de
+            erro baixada no lugar do CSV), em vez de gerar um índice vazio.
+    """
+    reader = csv.DictReader(stream)
+    missing = [column for column in _REGISTRY_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"CSV de registro do IEEE sem as colunas: {', '.join(missing)}")
+    for row in reader:
+        bits = _REGISTRY_BITS.get((row.get('Registry') or '').strip())
+        assignment = (row.get('Assignment') or '').strip()
+        vendor = (row.get('Organization Name') or '').strip()
+        if bits is None or not assignment or not vendor or len(assignment) * 4 != bits:
+            continue
+        try:
+            yield bits, int(assignment, 16), vendor
+        except ValueError:
+            continue
+
+
+def build_index(entries: Iterable[OUIEntry], output: str) -> int:
+    """
+    Grava o índice compacto de OUIs.
+
+    Cada tamanho de prefixo vira uma tabela de chaves uint64 ordenadas com um
+    array paralelo de índices uint32 para um bloco de strings deduplicado.
+
+    Returns:
+        O número de prefixos gravados.
+    """
+    tables: Dict[int, Dict[int, int]] = {bits: {} for bits in PREFIX_BITS}
+    strings: List[bytes] = []
+    string_ids: Dict[str, int] = {}
+    for bits, prefix, vendor in entries:
+        vendor_id = string_ids.get(vendor)
+        if vendor_id is None:
+            vendor_id = string_ids[vendor] = len(strings)
+            strings.append(vendor.encode('utf-8'))
+        tables[bits][prefix] = vendor_id
+
+    offsets = array('I', [0])
+    for encoded in strings:
+        offsets.append(offsets[-1] + len(encoded))
+    blob = b''.join(strings)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tmp_path = output + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        header = _HEADER.pack(_MAGIC, _VERSION, 0, *(len(tables[b]) for b in PREFIX_BITS),
+                              len(strings), len(blob))
+        f.write(header.ljust(_HEADER_SIZE, b'\x00'))
+        for bits in PREFIX_BITS:
+            keys = sorted(tables[bits])
+            f.write(_little_endian(array('Q', keys)))
+            f.write(_little_endian(array('I', [tables[bits][k] for k in keys])))
+        f.write(_little_endian(offsets))
+        f.write(blob)
+    os.replace(tmp_path, output)
+    return sum(len(t) for t in tables.values())
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class OUIDatabase:
+    """
+    Índice de OUIs do IEEE mapeado em memória.
+
+    O arquivo é aberto com mmap e as tabelas são lidas diretamente como
+    memoryviews de inteiros, sem desserialização: carregar o índice é
+    instantâneo e as páginas só entram na memória quando consultadas. A
+    busca é binária em cada tabela, da mais específica (MA-S, 36 bits) para
+    a mais geral (MA-L, 24 bits).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._load()
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def _load(self) -> None:
+        magic, version, _, *counts = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Índice de OUI inválido: {self.path}")
+        *table_counts, string_count, blob_size = counts
+
+        view = memoryview(self._mmap)
+        offset = _HEADER_SIZE
+        self._tables: List[Tuple[int, Sequence[int], Sequence[int]]] = []
+        for bits, count in zip(PREFIX_BITS, table_counts):
+            keys = self._array(view, offset, count, 'Q')
+            offset += count * 8
+            values = self._array(view, offset, count, 'I')
+            offset += count * 4
+            self._tables.append((bits, keys, values))
+        self._offsets = self._array(view, offset, string_count + 1, 'I')
+        offset += (string_count + 1) * 4
+        self._blob = view[offset:offset + blob_size]
+        self._size = sum(table_counts)
+
+    @staticmethod
+    def _array(view: memoryview, offset: int, count: int, typecode: str) -> Sequence[int]:
+        size = array(typecode).itemsize
+        chunk = view[offset:offset + count * size]
+        if sys.byteorder == 'little':
+            return chunk.cast(typecode)
+        # Em máquinas big-endian copia e converte (sem acesso direto ao mmap)
+        values = array(typecode, chunk.tobytes())
+        values.byteswap()
+        return values
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _vendor(self, vendor_id: int) -> str:
+        start, end = self._offsets[vendor_id], self._offsets[vendor_id + 1]
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def lookup_int(self, mac: int) -> Optional[str]:
+        """Busca o fabricante de um MAC já convertido para inteiro de 48 bits."""
+        for bits, keys, values in self._tables:
+            key = mac >> (48 - bits)
+            index = bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                return self._vendor(values[index])
+        return None
+
+    def lookup(self, mac: str) -> Optional[str]:
+        """Busca o fabricante de um MAC em texto, ou None se desconhecido."""
+        value = mac_to_int(mac)
+        return self.lookup_int(value) if value is not None else None
+
+    def close(self) -> None:
+        # Libera as views antes de fechar o mmap
+        self._tables = []
+        self._offsets = []
+        self._blob.release()
+        self._mmap.close()
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_INDEX_PATH) -> Optional['OUIDatabase']:
+        """Abre o índice se ele existir e for válido; caso contrário, None."""
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+
+def _read_sources(sources: Iterable[str]) -> Iterator[OUIEntry]:
+    for source in sources:
+        if source.startswith(('http://', 'https://')):
+            print(f"Baixando {source}...")
+            with urllib.request.urlopen(source, timeout=60) as response:
+                yield from parse_registry_csv(io.TextIOWrapper(response, encoding='utf-8'))
+        else:
+            with open(source, encoding='utf-8', newline='') as f:
+                yield from parse_registry_csv(f)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Linha de comando: gera o índice a partir dos CSVs do IEEE ou consulta um MAC."""
+    parser = argparse.ArgumentParser(description="Índice offline de fabricantes (OUI do IEEE).")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Gera o índice a partir de oui.csv, mam.csv e oui36.csv")
+    build.add_argument('sources', nargs='*', help="Arquivos CSV do IEEE (padrão: baixar do site do IEEE)")
+    build.add_argument('-o', '--output', default=DEFAULT_INDEX_PATH, help=f"Padrão: {DEFAULT_INDEX_PATH}")
+
+    lookup = sub.add_parser('lookup', help="Consulta o fabricante de um ou mais MACs")
+    lookup.add_argument('macs', nargs='+')
+    lookup.add_argument('-i', '--index', default=DEFAULT_INDEX_PATH)
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        try:
+            count = build_index(_read_sources(args.sources or IEEE_REGISTRY_URLS), args.output)
+        except ValueError as e:
+            print(f"ERRO: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"{count} prefixos gravados em {args.output}")
+    else:
+        database = OUIDatabase.open(args.index)
+        if database is None:
+            print(f"ERRO: índice não encontrado em {args.index}", file=sys.stderr)
+            sys.exit(1)
+        for mac in args.macs:
+            print(f"{mac}: {database.lookup(mac) or 'Unknown'}")
+
+
+if __name__ == '__main__':
+    main()
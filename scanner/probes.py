@@ -1,10 +1,32 @@
+import asyncio
+import socket
+import time
+import weakref
+from contextlib import contextmanager
 from icmplib import async_ping
-from typing import Tuple, Optional, Dict
-from pysnmp.hlapi.asyncio import get_cmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
+from typing import Any, Tuple, Optional, Dict, Iterator, List, Sequence
+from pysnmp.hlapi.asyncio import (
+    get_cmd, SnmpEngine, CommunityData, UdpTransportTarget, Udp6TransportTarget,
+    ContextData, ObjectType, ObjectIdentity, NoSuchObject, NoSuchInstance, EndOfMibView,
+)
+
+from .cache import AsyncTTLCache
+from .metrics import SNMP_OIDS_TOTAL, STAGE_SECONDS
+from .rate_control import ICMP_RTTS, SNMP_RTTS, report_loss, report_rtt
 
 
 ProbeResult = Tuple[str, Optional[str]]
 
+SNMP_PORT = 161
+SNMP_TIMEOUT = 1                # Timeout (s) até haver RTTs medidos na sub-rede
+ICMP_TIMEOUT = 1
+TCP_CONNECT_TIMEOUT = 0.5       # Espera (s) por SYN-ACK ou RST nas sondagens de atividade TCP
+SNMP_RETRIES = 1
+SNMP_ENGINE_POOL_SIZE = 4       # Engines (e sockets UDP) por loop de eventos
+SNMP_ENGINE_MAX_TARGETS = 4096  # Alvos atendidos por um engine antes de reciclá-lo
+SNMP_TARGET_CACHE_SIZE = 16384  # Alvos UDP (ip, porta, timeout) guardados entre sondagens
+SNMP_TARGET_TTL = 3600.0        # Validade (s) de um alvo guardado
+
 SNMP_OIDS: Dict[str, str] = {
     'Descrição do Sistema': '1.3.6.1.2.1.1.1.0',
     'Object ID': '1.3.6.1.2.1.1.2.0',
@@ -32,8 +54,10 @@ async def probe_icmp(ip: str) -> Optional[ProbeResult]:
         Levanta PermissionError se não tiver privilégios para criar raw sockets.
     """
     try:
-        host = await async_ping(ip, count=1, timeout=1)
+        with STAGE_SECONDS.time('icmp'):
+            host = await async_ping(ip, count=1, timeout=ICMP_RTTS.timeout_for(ip, ICMP_TIMEOUT))
         if host.is_alive:
+            report_rtt(ICMP_RTTS, ip, host.avg_rtt / 1000)
             return ("icmp", f"{host.avg_rtt}ms")
         return None
     except PermissionError:
@@ -45,87 +69,275 @@ async def probe_icmp(ip: str) -> Optional[ProbeResult]:
         return None
 
 
-async def probe_snmp(ip: str, community: str = 'public') -> Optional[ProbeResult]:
+async def probe_tcp(ip: str, ports: Sequence[int],
+                    timeout: float = TCP_CONNECT_TIMEOUT) -> Optional[ProbeResult]:
+    """
+    Verifica se um host está ativo tentando conexões TCP a algumas portas,
+    todas ao mesmo tempo.
+
+    Tanto o handshake completo quanto a recusa (RST) provam que há um host
+    no endereço; a primeira resposta encerra as demais tentativas, e a
+    conexão é fechada logo em seguida, sem enviar dados.
+
+    Returns:
+        Uma tupla ("tcp", porta) em caso de sucesso (ex: ("tcp", "22")),
+        ou None se nenhuma porta responder dentro do timeout.
+    """
+    loop = asyncio.get_running_loop()
+    family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+
+    async def connect(port: int) -> int:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, (ip, port))
+        except ConnectionRefusedError:
+            pass  # RST: porta fechada, mas o host respondeu
+        finally:
+            sock.close()
+        return port
+
+    with STAGE_SECONDS.time('tcp_connect'):
+        attempts = {asyncio.ensure_future(connect(port)) for port in ports}
+        deadline = loop.time() + timeout
+        try:
+            while attempts:
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if not task.exception():
+                        return ("tcp", str(task.result()))
+        finally:
+            for task in attempts:
+                task.cancel()
+    return None
+
+
+class _PooledEngine:
+    """Um SnmpEngine do pool e sua contabilidade de uso."""
+
+    __slots__ = ('engine', 'uses', 'in_flight', 'retired')
+
+    def __init__(self) -> None:
+        self.engine = SnmpEngine()
+        self.uses = 0
+        self.in_flight = 0
+        self.retired = False
+
+
+# Posições do pool num loop de eventos; None até o primeiro uso (ou após aposentar)
+_EngineSlots = List[Optional[_PooledEngine]]
+
+
+class SnmpEnginePool:
+    """
+    Pool de SnmpEngines de longa duração compartilhados entre os hosts.
+
+    Cada engine mantém um único socket UDP no seu dispatcher, então todas as
+    sondagens que passam por ele reaproveitam o mesmo transporte. Como o
+    dispatcher fica preso ao loop em que foi criado, o pool guarda um conjunto
+    de engines por loop de eventos.
+
+    O pysnmp registra uma entrada de alvo no LCD do engine para cada endereço
+    sondado; para que a memória não cresça indefinidamente em varreduras
+    grandes, um engine é aposentado após `max_targets` usos e fechado assim
+    que suas requisições pendentes terminam.
+    """
+
+    def __init__(self, size: int = SNMP_ENGINE_POOL_SIZE,
+                 max_targets: int = SNMP_ENGINE_MAX_TARGETS):
+        self.size = size
+        self.max_targets = max_targets
+        self._slots: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _EngineSlots]' = \
+            weakref.WeakKeyDictionary()
+        self._next = 0
+
+    def _acquire(self) -> _PooledEngine:
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = [None] * self.size
+
+        index = self._next % self.size
+        self._next += 1
+        slot = slots[index]
+        if slot is None:
+            slot = slots[index] = _PooledEngine()
+
+        slot.uses += 1
+        if slot.uses >= self.max_targets:
+            # O próximo pedido nesta posição cria um engine novo
+            slot.retired = True
+            slots[index] = None
+        return slot
+
+    @contextmanager
+    def lease(self) -> Iterator[SnmpEngine]:
+        """Empresta um engine do pool durante uma requisição SNMP."""
+        slot = self._acquire()
+        slot.in_flight += 1
+        try:
+            yield slot.engine
+        finally:
+            slot.in_flight -= 1
+            if slot.retired and not slot.in_flight:
+                _close_engine(slot.engine)
+
+    def close(self) -> None:
+        """Fecha todos os engines criados no loop de eventos corrente."""
+        loop = asyncio.get_running_loop()
+        for slot in self._slots.pop(loop, []):
+            if slot is not None:
+                _close_engine(slot.engine)
+
+
+def _close_engine(snmp_engine: SnmpEngine) -> None:
+    """Encerra o dispatcher SNMP, evitando leaks de file descriptors."""
+    try:
+        snmp_engine.close_dispatcher()
+    except Exception:
+        pass
+
+
+ENGINE_POOL = SnmpEnginePool()
+
+
+# Sem entradas negativas: um create() que falhou é tentado de novo na próxima sondagem
+_TRANSPORT_TARGETS: AsyncTTLCache[Any] = AsyncTTLCache(
+    'snmp_target', SNMP_TARGET_CACHE_SIZE, SNMP_TARGET_TTL, 0.0)
+
+
+async def _create_target(ip: str, port: int, timeout: float):
+    target_class = Udp6TransportTarget if ':' in ip else UdpTransportTarget
+    return await target_class.create((ip, port), timeout=timeout, retries=SNMP_RETRIES)
+
+
+async def _transport_target(ip: str, timeout: float):
+    """
+    Alvo UDP de um host, pela API pública do pysnmp (create()).
+
+    O create() resolve o endereço com getaddrinfo no executor padrão; para
+    não repetir isso a cada sondagem, o alvo é guardado por (ip, porta,
+    timeout). O timeout adaptativo é arredondado a 10 ms para que a chave
+    não mude a cada RTT medido. Retorna None se o endereço não resolver.
+    """
+    key = (ip, SNMP_PORT, round(timeout, 2))
+    return await _TRANSPORT_TARGETS.get_or_load(key, lambda: _create_target(*key))
+
+
+async def snmp_get_many(ip: str, oids: Sequence[str], community: str = 'public',
+                        auth: Any = None) -> Optional[Dict[str, str]]:
+    """
+    Lê vários OIDs de um host com uma única PDU GET.
+
+    Varbinds ausentes são descartados individualmente: no SNMPv2c chegam como
+    noSuchObject/noSuchInstance; no SNMPv1 o agente rejeita a PDU inteira com
+    noSuchName e aponta o varbind culpado em error_index, que é removido antes
+    de repetir a requisição com os demais.
+
+    Returns:
+        Um dicionário {oid: valor} (possivelmente vazio se o host responder
+        sem nenhum dos OIDs), ou None se o host não responder.
+
+    `auth` substitui a comunidade v1 por outros dados de autenticação do
+    pysnmp (v2c ou v3, ver credentials.Credential).
+    """
+    pending = list(oids)
+    values: Dict[str, str] = {}
+    if auth is None:
+        auth = CommunityData(community, mpModel=0)
+
+    # Timeout da sub-rede, derivado dos RTTs medidos (rate_control)
+    timeout = SNMP_RTTS.timeout_for(ip, SNMP_TIMEOUT)
+    with ENGINE_POOL.lease() as snmp_engine:
+        target = await _transport_target(ip, timeout)
+        if target is None:
+            return None
+        while pending:
+            started = time.monotonic()
+            error_indication, error_status, error_index, var_binds = await get_cmd(
+                snmp_engine,
+                auth,
+                target,
+                ContextData(),
+                *[ObjectType(ObjectIdentity(oid)) for oid in pending],
+                lookupMib=False,
+            )
+
+            elapsed = time.monotonic() - started
+            STAGE_SECONDS.observe(elapsed, 'snmp_get')
+            if error_indication:
+                # Timeout ou comunidade incorreta: o host não respondeu
+                if values:
+                    _count_oids(oids, values)
+                return values or None
+            if elapsed < timeout:
+                report_rtt(SNMP_RTTS, ip, elapsed)
+            else:
+                # Só respondeu à retransmissão: o primeiro pacote se perdeu
+                report_loss()
+            if error_status:
+                bad = int(error_index) - 1
+                if 0 <= bad < len(pending):
+                    del pending[bad]
+                    continue
+                break
+            for oid, (_, value) in zip(pending, var_binds):
+                if isinstance(value, (NoSuchObject, NoSuchInstance, EndOfMibView)):
+                    continue
+                values[oid] = str(value)
+            break
+
+    _count_oids(oids, values)
+    return values
+
+
+def _count_oids(oids: Sequence[str], values: Dict[str, str]) -> None:
+    """Contabiliza, por OID, se o host que respondeu tinha ou não o valor."""
+    for oid in oids:
+        SNMP_OIDS_TOTAL.inc(oid, 'ok' if oid in values else 'missing')
+
+
+async def probe_snmp(ip: str, community: str = 'public', auth: Any = None) -> Optional[ProbeResult]:
     """
     Executa uma sondagem SNMP assíncrona para obter o sysName de um dispositivo.
 
     Args:
         ip: O endereço IP para sondar.
         community: A string de comunidade SNMP.
+        auth: Outros dados de autenticação (v2c/v3), no lugar da comunidade v1.
 
     Returns:
         Uma tupla ("snmp", sysName) em caso de sucesso,
         ou None se o dispositivo não responder, a comunidade estiver errada,
         ou ocorrer outro erro SNMP.
     """
-    snmp_engine = SnmpEngine()
+    sys_name_oid = SNMP_OIDS['Nome SNMP']
     try:
-        error_indication, error_status, error_index, var_binds = await get_cmd(
-            snmp_engine,
-            CommunityData(community, mpModel=0),
-            UdpTransportTarget((ip, 161), timeout=1, retries=1),
-            ContextData(),
-            ObjectType(ObjectIdentity('1.3.6.1.2.1.1.5.0'))  # OID para sysName
-        )
-
-        if error_indication:
-            # Trata erros como timeout ou comunidade incorreta
-            # print(f"SNMP Error for {ip}: {error_indication}")
-            return None
-        elif error_status:
-            # Trata erros de protocolo
-            # print(f"SNMP Protocol Error for {ip}: {error_status.prettyPrint()}")
-            return None
-        else:
-            # Extrai o valor do sysName
-            sys_name = str(var_binds[0][1])
-            return ("snmp", sys_name)
+        values = await snmp_get_many(ip, [sys_name_oid], community, auth)
     except Exception:
         # Captura outras exceções, como falhas de rede
         return None
-    finally:
-        # Encerra o dispatcher SNMP, se disponível, evitando leaks de file descriptors.
-        try:
-            dispatcher = snmp_engine.transportDispatcher
-            if dispatcher:
-                dispatcher.closeDispatcher()
-        except Exception:
-            pass
+    if not values or sys_name_oid not in values:
+        return None
+    return ("snmp", values[sys_name_oid])
 
 
-async def probe_snmp_info(ip: str, community: str = 'public') -> Optional[Dict[str, str]]:
+async def probe_snmp_info(ip: str, community: str = 'public',
+                          auth: Any = None) -> Optional[Dict[str, str]]:
     """
     Executa uma sondagem SNMP e devolve um dicionário com diversos atributos
-    do host (descritos em SNMP_OIDS).
+    do host (descritos em SNMP_OIDS), todos pedidos na mesma PDU GET.
 
     Retorna None se nenhuma informação for obtida.
     """
-    snmp_engine = SnmpEngine()
-    info: Dict[str, str] = {}
-
     try:
-        for desc, oid in SNMP_OIDS.items():
-            error_indication, error_status, error_index, var_binds = await get_cmd(
-                snmp_engine,
-                CommunityData(community, mpModel=0),
-                UdpTransportTarget((ip, 161), timeout=1, retries=1),
-                ContextData(),
-                ObjectType(ObjectIdentity(oid))
-            )
-
-            if error_indication or error_status:
-                continue  # Tenta próximo OID
-            else:
-                value = str(var_binds[0][1])
-                info[desc] = value
-
-        return info if info else None
+        values = await snmp_get_many(ip, list(SNMP_OIDS.values()), community, auth)
     except Exception:
         return None
-    finally:
-        try:
-            dispatcher = snmp_engine.transportDispatcher
-            if dispatcher:
-                dispatcher.closeDispatcher()
-        except Exception:
-            pass
+    if not values:
+        return None
+    info = {desc: values[oid] for desc, oid in SNMP_OIDS.items() if oid in values}
+    return info or None
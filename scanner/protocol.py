@@ -0,0 +1,123 @@
+import json
+import math
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# Protocolo v1: NDJSON, um objeto JSON por linha. Todo quadro carrega a
+# versão ("v") e o tipo ("type"); quadros ligados a um job carregam também o
+# identificador escolhido pelo cliente ("id"), o que permite várias
+# varreduras simultâneas na mesma conexão.
+PROTOCOL_VERSION = 1
+SUPPORTED_VERSIONS = (1,)
+MAX_FRAME_SIZE = 64 * 1024
+MAX_PORTS_FIELD = 16  # Portas aceitas num campo de lista de portas (ex: 'tcp_ports')
+
+Frame = Dict[str, Any]
+
+
+class ProtocolError(ValueError):
+    """Quadro malformado ou incompatível com a versão do protocolo."""
+
+
+class BadRequest(Exception):
+    """
+    Quadro bem formado com um campo inválido. A sessão responde com um erro
+    de código 'bad_request' ligado ao job e segue atendendo a conexão.
+    """
+
+
+def is_framed(first_line: bytes) -> bool:
+    """Indica se a primeira linha recebida pertence ao protocolo NDJSON."""
+    return first_line.lstrip().startswith(b'{')
+
+
+def encode_frame(frame: Frame) -> bytes:
+    """Serializa um quadro como uma linha NDJSON."""
+    frame.setdefault('v', PROTOCOL_VERSION)
+    return json.dumps(frame, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def decode_frame(line: bytes) -> Frame:
+    """
+    Decodifica e valida uma linha NDJSON.
+
+    Raises:
+        ProtocolError: se a linha não for um objeto JSON, se a versão não for
+        suportada ou se faltar o campo "type".
+    """
+    if len(line) > MAX_FRAME_SIZE:
+        raise ProtocolError("Quadro excede o tamanho máximo")
+    try:
+        frame = json.loads(line.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ProtocolError(f"JSON inválido: {e}") from None
+    if not isinstance(frame, dict):
+        raise ProtocolError("Quadro deve ser um objeto JSON")
+    if frame.get('v') not in SUPPORTED_VERSIONS:
+        raise ProtocolError(f"Versão de protocolo não suportada: {frame.get('v')!r}")
+    if not isinstance(frame.get('type'), str):
+        raise ProtocolError("Campo 'type' ausente")
+    return frame
+
+
+def make_frame(frame_type: str, request_id: Optional[str] = None, **fields: Any) -> Frame:
+    """Monta um quadro de resposta, opcionalmente ligado a um job."""
+    frame: Frame = {'v': PROTOCOL_VERSION, 'type': frame_type}
+    if request_id is not None:
+        frame['id'] = request_id
+    frame.update(fields)
+    return frame
+
+
+def error_frame(message: str, request_id: Optional[str] = None, code: Optional[str] = None) -> Frame:
+    """Monta um quadro de erro (com um código legível por máquina, se houver)."""
+    frame = make_frame('error', request_id, message=message)
+    if code is not None:
+        frame['code'] = code
+    return frame
+
+
+def float_field(frame: Frame, name: str, default: Optional[float]) -> Optional[float]:
+    """
+    Lê um campo numérico de um quadro recebido. Ausente ou null vale
+    `default`; aceita número ou string numérica.
+
+    Raises:
+        BadRequest: se o valor não for um número finito.
+    """
+    value = frame.get(name)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise BadRequest(f"Campo '{name}' deve ser numérico")
+    try:
+        number = float(value)
+    except ValueError:
+        raise BadRequest(f"Campo '{name}' deve ser numérico") from None
+    if not math.isfinite(number):
+        raise BadRequest(f"Campo '{name}' deve ser um número finito")
+    return number
+
+
+def int_field(frame: Frame, name: str, default: int) -> int:
+    """Como float_field, para campos inteiros (a parte fracionária é descartada)."""
+    value = float_field(frame, name, default)
+    return default if value is None else int(value)
+
+
+def ports_field(frame: Frame, name: str, default: Sequence[int]) -> Tuple[int, ...]:
+    """
+    Lê uma lista de portas TCP/UDP (vazia é válida). Ausente ou null vale
+    `default`.
+
+    Raises:
+        BadRequest: se não for uma lista de até MAX_PORTS_FIELD inteiros entre 1 e 65535.
+    """
+    value = frame.get(name)
+    if value is None:
+        return tuple(default)
+    if not isinstance(value, list) or len(value) > MAX_PORTS_FIELD:
+        raise BadRequest(f"Campo '{name}' deve ser uma lista de até {MAX_PORTS_FIELD} portas")
+    for port in value:
+        if isinstance(port, bool) or not isinstance(port, int) or not 0 < port < 65536:
+            raise BadRequest(f"Porta inválida em '{name}': {port!r}")
+    return tuple(dict.fromkeys(value))
@@ -0,0 +1,245 @@
+import asyncio
+import ipaddress
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import Deque, Optional, Tuple, Union
+
+from .metrics import METRICS
+
+# Controle AIMD
+RATE_DECREASE = 0.5         # Fator da redução multiplicativa
+RTT_INFLATION = 2.0         # RTT acima de N× o mínimo da sub-rede indica fila (congestionamento)
+RTT_INFLATION_SLACK = 0.01  # Folga absoluta (s), para que jitter em LANs de sub-ms não conte
+PROBE_INITIAL_WINDOW = 64   # Sondagens simultâneas no início, antes de qualquer medida
+PROBE_MIN_WINDOW = 8
+PROBE_MAX_WINDOW = 2048     # Teto global, somando todas as varreduras (cada uma segue limitada por MAX_CONCURRENCY)
+
+# Timeouts por sub-rede
+RTT_SAMPLES = 256           # Amostras mantidas por sub-rede
+RTT_MIN_SAMPLES = 8         # Abaixo disso, vale o timeout padrão de quem pergunta
+RTT_TIMEOUT_PERCENTILE = 99
+RTT_TIMEOUT_FACTOR = 3.0    # Timeout = fator × percentil
+RTT_TIMEOUT_MIN = 0.2
+RTT_TIMEOUT_MAX = 3.0
+RTT_SUBNET_PREFIX = {4: 24, 6: 64}
+RTT_MAX_SUBNETS = 65536
+
+
+class RttEstimator:
+    """Amostras recentes de RTT (s) de uma sub-rede, em um buffer circular."""
+
+    __slots__ = ('samples', 'count', '_timeout', '_timeout_at')
+
+    def __init__(self) -> None:
+        self.samples = array('d')
+        self.count = 0
+        self._timeout: Optional[float] = None
+        self._timeout_at = 0
+
+    def add(self, rtt: float) -> None:
+        if len(self.samples) < RTT_SAMPLES:
+            self.samples.append(rtt)
+        else:
+            self.samples[self.count % RTT_SAMPLES] = rtt
+        self.count += 1
+
+    @property
+    def base(self) -> Optional[float]:
+        """Menor RTT recente: a estimativa do caminho sem fila."""
+        return min(self.samples) if self.samples else None
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def inflated(self, rtt: float) -> bool:
+        base = self.base
+        return base is not None and rtt > base * RTT_INFLATION + RTT_INFLATION_SLACK
+
+    def timeout(self, default: float) -> float:
+        if len(self.samples) < RTT_MIN_SAMPLES:
+            return default
+        # Recalcula a cada 16 amostras; ordenar 256 floats por sondagem seria desperdício
+        if self._timeout is None or self.count - self._timeout_at >= 16:
+            value = self.percentile(RTT_TIMEOUT_PERCENTILE) * RTT_TIMEOUT_FACTOR
+            self._timeout = min(RTT_TIMEOUT_MAX, max(RTT_TIMEOUT_MIN, value))
+            self._timeout_at = self.count
+        return self._timeout
+
+
+class RttTable:
+    """
+    RTTs medidos por sub-rede (/24 em IPv4, /64 em IPv6) para um tipo de sondagem.
+
+    Cada sub-rede ganha seu próprio timeout, derivado do percentil alto dos
+    RTTs observados: uma LAN rápida deixa de esperar 1 s por host inativo,
+    e um enlace WAN lento não perde respostas que chegam depois do padrão.
+    """
+
+    def __init__(self, max_subnets: int = RTT_MAX_SUBNETS):
+        self.max_subnets = max_subnets
+        self._subnets: 'OrderedDict[Tuple[int, int], RttEstimator]' = OrderedDict()
+
+    @staticmethod
+    def _subnet(ip: str) -> Tuple[int, int]:
+        address = ipaddress.ip_address(ip)
+        return address.version, int(address) >> (address.max_prefixlen - RTT_SUBNET_PREFIX[address.version])
+
+    def estimator(self, ip: str) -> RttEstimator:
+        key = self._subnet(ip)
+        estimator = self._subnets.get(key)
+        if estimator is None:
+            estimator = self._subnets[key] = RttEstimator()
+            if len(self._subnets) > self.max_subnets:
+                self._subnets.popitem(last=False)
+        else:
+            self._subnets.move_to_end(key)
+        return estimator
+
+    def observe(self, ip: str, rtt: float) -> bool:
+        """
+        Registra um RTT (s).
+
+        Returns:
+            True se a amostra está inflada em relação ao mínimo da sub-rede,
+            isto é, se indica fila no caminho.
+        """
+        estimator = self.estimator(ip)
+        inflated = estimator.inflated(rtt)
+        estimator.add(rtt)
+        return inflated
+
+    def timeout_for(self, ip: str, default: float) -> float:
+        """Timeout da sub-rede do IP, ou `default` enquanto houver poucas medidas."""
+        estimator = self._subnets.get(self._subnet(ip))
+        return estimator.timeout(default) if estimator is not None else default
+
+    def __len__(self) -> int:
+        return len(self._subnets)
+
+
+class AimdController:
+    """
+    Controle AIMD (additive increase, multiplicative decrease) de um limite.
+
+    Cada resposta sem sinal de congestionamento soma `increase / valor` ao
+    limite (cerca de `increase` por janela de respostas, como no TCP). Perda
+    ou RTT inflado multiplicam o limite por `decrease`, no máximo uma vez por
+    RTT suavizado: uma rajada de perdas da mesma janela conta como um único
+    evento.
+    """
+
+    def __init__(self, initial: float, minimum: float, maximum: float,
+                 increase: float = 1.0, decrease: float = RATE_DECREASE):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.value = min(maximum, max(minimum, initial))
+        self.increase = increase
+        self.decrease = decrease
+        self.srtt: Optional[float] = None
+        self.decreases = 0
+        self._last_decrease = float('-inf')
+
+    @property
+    def limit(self) -> int:
+        return int(self.value)
+
+    def on_success(self, rtt: float) -> None:
+        self.srtt = rtt if self.srtt is None else self.srtt * 0.875 + rtt * 0.125
+        self.value = min(self.maximum, self.value + self.increase / self.value)
+
+    def on_congestion(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < max(self.srtt or 0.0, 0.05):
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.value = max(self.minimum, self.value * self.decrease)
+
+
+class AdaptiveLimiter:
+    """
+    Limite de sondagens em andamento ajustado por um AimdController.
+
+    Usado como `async with PROBE_LIMITER:` em volta das sondagens. O limite é
+    global ao processo, pois todas as varreduras compartilham o mesmo enlace;
+    varreduras simultâneas dividem a mesma janela em vez de somarem as suas.
+    """
+
+    def __init__(self, controller: AimdController):
+        self.controller = controller
+        self.in_flight = 0
+        self._waiters: Deque['asyncio.Future[None]'] = deque()
+
+    @property
+    def limit(self) -> int:
+        return self.controller.limit
+
+    async def acquire(self) -> None:
+        while self.in_flight >= self.controller.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Acordado e cancelado ao mesmo tempo: repassa a vez
+                    self._wake()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        free = self.controller.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+    def on_success(self, rtt: float) -> None:
+        self.controller.on_success(rtt)
+        self._wake()
+
+    def on_congestion(self) -> None:
+        self.controller.on_congestion()
+
+
+# Uma tabela por tipo de sondagem: o RTT de um agente SNMP inclui o tempo de
+# processamento do agente e não serve de referência para o ICMP (e vice-versa).
+SNMP_RTTS = RttTable()
+ICMP_RTTS = RttTable()
+
+
+PROBE_LIMITER = AdaptiveLimiter(AimdController(PROBE_INITIAL_WINDOW, PROBE_MIN_WINDOW, PROBE_MAX_WINDOW))
+
+METRICS.gauge('scanner_probes_in_flight', 'Sondagens de host em andamento.', lambda: PROBE_LIMITER.in_flight)
+METRICS.gauge('scanner_probe_window', 'Limite atual da janela AIMD de sondagens.', lambda: PROBE_LIMITER.limit)
+METRICS.gauge('scanner_probes_waiting', 'Sondagens esperando vaga na janela.', lambda: len(PROBE_LIMITER._waiters))
+
+Controller = Union[AimdController, AdaptiveLimiter]
+
+
+def report_rtt(table: RttTable, ip: str, rtt: float, controller: Controller = PROBE_LIMITER) -> None:
+    """Registra uma resposta: alimenta o timeout da sub-rede e o controle AIMD."""
+    if table.observe(ip, rtt):
+        controller.on_congestion()
+    else:
+        controller.on_success(rtt)
+
+
+def report_loss(controller: Controller = PROBE_LIMITER) -> None:
+    """Registra a perda de um pacote de um host que está respondendo (retransmissão)."""
+    controller.on_congestion()
@@ -0,0 +1,135 @@
+import ipaddress
+import socket
+import struct
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .engine import HostInfo
+from .oui_db import mac_to_int
+from .probes import SNMP_OIDS
+
+MAX_EXTRA_SNMP_FIELDS = 32   # Nomes SNMP fora de SNMP_OIDS que ganham um bit; os demais ficam num dicionário
+
+# Nomes dos atributos SNMP, na ordem em que os valores ficam guardados. Um
+# nome desconhecido (ex: trabalhador remoto com outra versão) entra no fim,
+# até MAX_EXTRA_SNMP_FIELDS deles.
+_SNMP_FIELDS: List[str] = list(SNMP_OIDS)
+_SNMP_INDEX: Dict[str, int] = {name: index for index, name in enumerate(_SNMP_FIELDS)}
+_MAX_SNMP_FIELDS = len(_SNMP_FIELDS) + MAX_EXTRA_SNMP_FIELDS
+
+_INFO_KEYS = ('ip', 'name', 'mac', 'vendor', 'snmp_info')
+
+
+def _snmp_index(name: str) -> Optional[int]:
+    """Posição do atributo na tupla de valores, ou None se a lista já está cheia."""
+    index = _SNMP_INDEX.get(name)
+    if index is None and len(_SNMP_FIELDS) < _MAX_SNMP_FIELDS:
+        index = _SNMP_INDEX[name] = len(_SNMP_FIELDS)
+        _SNMP_FIELDS.append(sys.intern(name))
+    return index
+
+
+def _pack_mac(mac: Optional[str]) -> Union[int, str, None]:
+    """MAC como inteiro de 48 bits; o texto original se não for um MAC Ethernet."""
+    if not mac:
+        return None
+    value = mac_to_int(mac)
+    return mac if value is None else value
+
+
+class HostRecord:
+    """
+    Registro compacto de um host ativo, para guardar muitos em memória
+    (jobs em andamento, monitores).
+
+    O IP fica como inteiro, o MAC como inteiro de 48 bits (ou o texto
+    recebido, se não for um MAC Ethernet), o fabricante internado (poucos
+    valores distintos repetidos em milhares de hosts) e os atributos SNMP
+    como uma tupla só com os valores presentes, sem as chaves: um bit por
+    atributo de SNMP_OIDS diz quais estão lá. O dicionário HostInfo só é
+    montado quando pedido (to_info ou acesso por chave), e format_host_info
+    escreve direto a partir dos campos.
+    """
+
+    __slots__ = ('_address', '_version', 'name', '_mac', 'vendor', '_snmp_fields', '_snmp',
+                 '_snmp_extra')
+
+    def __init__(self, ip: str, name: Optional[str] = None, mac: Optional[str] = None,
+                 vendor: Optional[str] = None, snmp_info: Optional[Dict[str, str]] = None):
+        address = ipaddress.ip_address(ip)
+        self._address = int(address)
+        self._version = address.version
+        self.name = name
+        self._mac = _pack_mac(mac)
+        self.vendor = sys.intern(vendor) if vendor else vendor
+        self._snmp_fields = 0
+        self._snmp: Optional[Tuple[str, ...]] = None
+        # Atributos sem posição em _SNMP_FIELDS (lista cheia): raros, guardados com a chave
+        self._snmp_extra: Optional[Dict[str, str]] = None
+        if snmp_info is not None:
+            present = []
+            for field, value in snmp_info.items():
+                index = _snmp_index(field)
+                if index is None:
+                    if self._snmp_extra is None:
+                        self._snmp_extra = {}
+                    self._snmp_extra[field] = value
+                else:
+                    present.append((index, value))
+            present.sort()
+            for index, _ in present:
+                self._snmp_fields |= 1 << index
+            self._snmp = tuple(value for _, value in present)
+
+    @classmethod
+    def from_info(cls, info: HostInfo) -> 'HostRecord':
+        return cls(info['ip'], info.get('name'), info.get('mac'), info.get('vendor'), info.get('snmp_info'))
+
+    @property
+    def ip(self) -> str:
+        if self._version == 4:
+            return socket.inet_ntoa(struct.pack('!I', self._address))
+        return str(ipaddress.IPv6Address(self._address))
+
+    @property
+    def mac(self) -> Optional[str]:
+        if self._mac is None or isinstance(self._mac, str):
+            return self._mac
+        return ':'.join(f'{byte:02x}' for byte in self._mac.to_bytes(6, 'big'))
+
+    def snmp_items(self) -> Iterator[Tuple[str, str]]:
+        """(descrição, valor) dos atributos SNMP presentes, sem montar o dicionário."""
+        values = iter(self._snmp or ())
+        fields, index = self._snmp_fields, 0
+        while fields:
+            if fields & 1:
+                yield _SNMP_FIELDS[index], next(values)
+            fields >>= 1
+            index += 1
+        if self._snmp_extra is not None:
+            yield from self._snmp_extra.items()
+
+    @property
+    def snmp_info(self) -> Optional[Dict[str, str]]:
+        if self._snmp is None:
+            return None
+        return dict(self.snmp_items())
+
+    def to_info(self) -> HostInfo:
+        """Converte para o dicionário HostInfo (quadros NDJSON, histórico)."""
+        return {key: getattr(self, key) for key in _INFO_KEYS}
+
+    # Leitura no estilo de HostInfo, para quem compara registros e dicionários
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in _INFO_KEYS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _INFO_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"HostRecord({self.ip})"
@@ -1,27 +1,36 @@
 import asyncio
-import socket
-from getmac import get_mac_address
-from .mac_vendor_lookup import MACVendorLookup
 from .utils import parse_cidr  # Importa a função do nosso novo módulo
-from .probes import probe_snmp_info, probe_icmp  # funções necessárias
-from typing import Optional, Dict, List
-import concurrent.futures
-
-# Tipo de resultado detalhado, alinhado ao formato da versão "Scanner com SNMP"
-HostInfo = Dict[str, Optional[str]]
-
-
-def reverse_dns(ip: str) -> Optional[str]:
-    """Tenta resolver o nome DNS do host (PTR record)."""
-    try:
-        return socket.gethostbyaddr(ip)[0]
-    except Exception:
-        return None
-
-
-def format_host_info(info: HostInfo) -> str:
-    """Formata o dicionário HostInfo para string de resposta ao cliente."""
+from .credentials import Community, parse_credentials
+from .engine import HostInfo, MAX_CONCURRENCY
+from .mac_vendor_lookup import MACVendorLookup
+from .dns_resolver import PTR_RESOLVER
+from .probes import ENGINE_POOL
+from .jobs import JOBS, JobRejected
+from .metrics import STAGE_SECONDS, start_metrics_server
+from .protocol import is_framed
+from .records import HostRecord
+from .session import ClientSession
+from .sharding import SHARD_POOL
+from .store import RESULT_STORE
+from .timeseries import TIMESERIES
+from typing import Optional, Dict, List, Union
+
+
+def format_host_info(info: Union[HostInfo, HostRecord]) -> str:
+    """
+    Formata o dicionário HostInfo (ou um HostRecord guardado, lido direto
+    dos campos compactos) para string de resposta ao cliente.
+    """
     lines: List[str] = []
+    if isinstance(info, HostRecord):
+        ip = info.ip
+        lines.append(f"Nome DNS: {info.name or ip}")
+        lines.append(f"Endereço IP: {ip}")
+        lines.append(f"MAC Address: {info.mac or ''}")
+        lines.append(f"Fabricante: {info.vendor or ''}")
+        for desc, value in info.snmp_items():
+            lines.append(f"{desc}: {value}")
+        return '\n'.join(lines) + '\n\n'
     lines.append(f"Nome DNS: {info.get('name') or info['ip']}")
     lines.append(f"Endereço IP: {info['ip']}")
     lines.append(f"MAC Address: {info.get('mac', '') or ''}")
@@ -33,58 +42,26 @@ def format_host_info(info: HostInfo) -> str:
     return '\n'.join(lines) + '\n\n'
 
 
-def scan_host(ip: str, community: str) -> Optional[HostInfo]:
-    """Escaneia um host individual e devolve informações detalhadas ou None."""
-    host_info: HostInfo = {
-        'ip': ip,
-        'name': None,
-        'mac': None,
-        'vendor': None,
-        'snmp_info': None,
-    }
-
-    try:
-        # Primeiro tenta SNMP completo
-        snmp_full = asyncio.run(probe_snmp_info(ip, community))
-        if snmp_full:
-            host_info['snmp_info'] = snmp_full
-
-        # Checa se host está vivo: SNMP ok ou ICMP responde
-        alive = bool(snmp_full)
-        if not alive:
-            icmp_result = asyncio.run(probe_icmp(ip))
-            alive = bool(icmp_result)
-        if not alive:
-            return None  # host aparentemente inativo
-
-        # Enriquecimento de dados
-        host_info['name'] = reverse_dns(ip)
-        mac = get_mac_address(ip=ip)
-        host_info['mac'] = mac
-        host_info['vendor'] = MACVendorLookup.get_vendor(mac) if mac else "Unknown"
-        return host_info
-
-    except PermissionError:
-        print(f"AVISO: Permissões insuficientes para ICMP em {ip}.")
-        return None
-    except Exception as e:
-        print(f"Erro ao escanear {ip}: {e}")
-        return None
+def format_summary(active: int, total: int, elapsed: float) -> str:
+    """Formata o quadro final enviado ao cliente ao término da varredura."""
+    return f"--- Varredura concluída: {active} host(s) ativo(s) de {total} endereço(s) em {elapsed:.2f}s ---\n"
 
 
 HOST = '0.0.0.0'
 PORT = 35640
-MAX_WORKERS = 50  # Número de threads para a varredura paralela
 
 
 async def handle_client(reader, writer):
     """
     Corrotina para lidar com cada conexão de cliente.
-    Fase 5: Orquestra a varredura paralela.
+    Fase 5: Orquestra a varredura concorrente no próprio loop de eventos.
+
+    Conexões cuja primeira mensagem é um objeto JSON passam para o protocolo
+    NDJSON v1 (ClientSession); as demais seguem o formato texto
+    "CIDR;comunidade[;sweep]" com uma varredura por conexão.
     """
     addr = writer.get_extra_info('peername')
     print(f"[NOVA CONEXÃO] {addr} conectado.")
-    loop = asyncio.get_running_loop()
 
     try:
         data = await reader.read(1024)
@@ -92,48 +69,88 @@ async def handle_client(reader, writer):
             print(f"[{addr}] Cliente desconectou sem enviar dados.")
             return
 
+        if is_framed(data):
+            print(f"[{addr}] Sessão NDJSON v1 iniciada.")
+            await ClientSession(reader, writer, addr).run(data)
+            return
+
         message = data.decode().strip()
         print(f"[{addr}] Recebido: {message}")
 
-        # Extrair CIDR e comunidade (formato: "CIDR;comunidade")
+        # Extrair CIDR, comunidade e modo (formato: "CIDR;comunidade[,comunidade...][;sweep]")
         parts = message.split(';')
         cidr_part = parts[0]
-        community = parts[1] if len(parts) > 1 else 'public'
-
-        # Validar e gerar lista de hosts para varredura
-        ip_list = parse_cidr(cidr_part)
-        if ip_list is None:
+        community: Community = parts[1] if len(parts) > 1 else 'public'
+        sweep_only = len(parts) > 2 and parts[2].strip() == 'sweep'
+        if ',' in community:
+            # Várias comunidades: cada uma tentada em v2c e v1, e a primeira que responder vence
+            try:
+                community = parse_credentials([name.strip() for name in community.split(',') if name.strip()])
+            except ValueError as e:
+                writer.write(f"ERRO: {e}\n".encode())
+                await writer.drain()
+                return
+
+        # Validar e obter a faixa (preguiçosa) de hosts para varredura
+        host_range = parse_cidr(cidr_part)
+        if host_range is None:
             print(f"[{addr}] CIDR inválido recebido: {cidr_part}")
             error_message = "ERRO: Notação CIDR inválida. Use o formato '192.168.1.0/24'.\n"
             writer.write(error_message.encode())
             await writer.drain()
             return
 
-        if ip_list:
-            print(
-                f"[{addr}] Varrendo {len(ip_list)} hosts para {cidr_part} com comunidade '{community}'...")
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                # Mapeia a função scan_host para cada IP na lista
-                tasks = [loop.run_in_executor(
-                    executor, scan_host, ip, community) for ip in ip_list]
-
-                # Aguarda a conclusão de todas as tarefas
-                results = await asyncio.gather(*tasks)
-
-            # Filtra os Nones e formata a resposta
-            active_hosts = [res for res in results if res]
-
-            if active_hosts:
-                response_lines = []
-                for info in active_hosts:
-                    response_lines.append(format_host_info(info))
-
-                response = "\n".join(response_lines) + "\n"
+        if host_range:
+            mode = 'sweep' if sweep_only else 'full'
+            if sweep_only:
+                print(f"[{addr}] Varredura ICMP de {host_range.size} hosts para {cidr_part}...")
             else:
-                response = "Nenhum host ativo encontrado na faixa especificada.\n"
-
-            writer.write(response.encode())
+                credentials = f"comunidade '{community}'" if isinstance(community, str) \
+                    else f"{len(community)} credenciais"
+                print(f"[{addr}] Varrendo {host_range.size} hosts para {cidr_part} com {credentials}...")
+
+            # Pedidos idênticos em andamento compartilham o mesmo job; as
+            # sondagens rodam como corrotinas, limitadas por MAX_CONCURRENCY
+            try:
+                job, events, shared = JOBS.submit(cidr_part.strip(), host_range, community, mode, MAX_CONCURRENCY)
+            except JobRejected as e:
+                writer.write(f"ERRO: {e}\n".encode())
+                await writer.drain()
+                return
+            if shared:
+                print(f"[{addr}] Acompanhando a varredura já em andamento ({job.id}).")
+
+            # Cada host é enviado assim que termina; drain() aplica
+            # contrapressão caso o cliente leia mais devagar que a varredura
+            # (a fila do assinante é limitada e o job espera por ela).
+            active = 0
+            elapsed = 0.0
+            try:
+                position = JOBS.position(job)
+                if position:
+                    writer.write(f"Aguardando na fila de varreduras (posição {position})...\n".encode())
+                while True:
+                    event = await events.get()
+                    if event[0] == 'host':
+                        active += 1
+                        with STAGE_SECONDS.time('response_write'):
+                            writer.write(format_host_info(event[1]).encode())
+                            await writer.drain()
+                    elif event[0] == 'error':
+                        writer.write(f"ERRO: {event[1]}\n".encode())
+                        await writer.drain()
+                        return
+                    else:
+                        elapsed = event[2]
+                        break
+            finally:
+                # Desiste do job já, cancelando sondagens pendentes se o
+                # cliente desconectou no meio da varredura e era o único.
+                JOBS.detach(job, events)
+
+            if not active:
+                writer.write("Nenhum host ativo encontrado na faixa especificada.\n".encode())
+            writer.write(format_summary(active, host_range.size, elapsed).encode())
             await writer.drain()
 
         else:
@@ -156,6 +173,9 @@ async def main():
     """
     Ponto de entrada principal para iniciar o servidor asyncio.
     """
+    # Mapeia o índice de OUIs já na partida, não no primeiro host encontrado
+    MACVendorLookup.database()
+
     server = await asyncio.start_server(
         handle_client,
         HOST,
@@ -166,7 +186,22 @@ async def main():
     addr = server.sockets[0].getsockname()
     print(f'[ESCUTANDO] Servidor escutando em {addr[0]}:{addr[1]}')
 
-    async with server:
-        await server.serve_forever()
+    # Endpoint /metrics (Prometheus) em porta separada
+    metrics_server = await start_metrics_server()
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        # Libera os sockets UDP dos engines SNMP e do resolvedor DNS
+        ENGINE_POOL.close()
+        PTR_RESOLVER.close()
+        # Grava os lotes pendentes do histórico e das séries temporais
+        RESULT_STORE.close()
+        TIMESERIES.close()
+        # Encerra os processos de varredura paralela, se tiverem sido criados
+        SHARD_POOL.close()
 
 # O bloco if __name__ == "__main__" foi movido para run_server.py
@@ -0,0 +1,450 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from .cache import ENRICHMENT_CACHE
+from .cluster import CLUSTER, HEARTBEAT_INTERVAL, RemoteWorker
+from .credentials import Community, parse_credentials
+from .discovery import DISCOVERY_TCP_PORTS
+from .engine import MAX_CONCURRENCY
+from .jobs import JOBS, JobRejected
+from .metrics import STAGE_SECONDS
+from .monitor import MONITOR_INTERVAL, MONITOR_MIN_INTERVAL, MONITORS
+from .protocol import (
+    BadRequest, Frame, ProtocolError, SUPPORTED_VERSIONS, decode_frame, encode_frame, error_frame,
+    float_field, int_field, make_frame, ports_field,
+)
+from .sharding import SHARD_POOL
+from .store import RESULT_STORE
+from .timeseries import METRIC_IDS, POLL_INTERVAL, POLL_MIN_INTERVAL, TIMESERIES, SnmpPoller
+from .utils import HostRange, parse_cidr
+from .walk import INTERFACE_COLUMNS, SNMP_BULK_REPETITIONS, WALK_CONCURRENCY, walk_stream
+
+PROGRESS_INTERVAL = 1.0  # Segundos entre quadros de progresso de um job
+
+
+def _millis(frame: Frame, name: str) -> Optional[int]:
+    """Campo em segundos (instante ou passo de série) convertido para milissegundos."""
+    seconds = float_field(frame, name, None)
+    return None if seconds is None else int(seconds * 1000)
+
+
+class ClientSession:
+    """
+    Sessão persistente do protocolo NDJSON v1.
+
+    Uma mesma conexão carrega vários jobs concorrentes, cada um identificado
+    pelo "id" escolhido pelo cliente. Os quadros de todos os jobs são
+    intercalados no socket sob um único lock de escrita. Quando o cliente
+    encerra o envio (EOF), a sessão aguarda os jobs em andamento antes de
+    fechar; se a conexão cair, os jobs são cancelados.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, addr: Any):
+        self.reader = reader
+        self.writer = writer
+        self.addr = addr
+        self._buffer = b''
+        self._jobs: Dict[str, 'asyncio.Task[None]'] = {}
+        self._write_lock = asyncio.Lock()
+        self._worker: Optional[RemoteWorker] = None
+        self._challenge: Optional[str] = None
+        self._handlers: Dict[str, Callable[[Frame], Awaitable[None]]] = {
+            'hello': self._on_hello,
+            'scan': self._on_scan,
+            'cancel': self._on_cancel,
+            'stats': self._on_stats,
+            'monitor': self._on_monitor,
+            'history': self._on_history,
+            'poll': self._on_poll,
+            'series': self._on_series,
+            'register': self._on_register,
+            'interfaces': self._on_interfaces,
+        }
+
+    async def send(self, frame: Frame) -> None:
+        """Escreve um quadro no socket, com contrapressão."""
+        async with self._write_lock:
+            with STAGE_SECONDS.time('response_write'):
+                self.writer.write(encode_frame(frame))
+                await self.writer.drain()
+
+    async def _read_line(self) -> bytes:
+        if b'\n' in self._buffer:
+            line, self._buffer = self._buffer.split(b'\n', 1)
+            return line + b'\n'
+        try:
+            rest = await self.reader.readline()
+        except ValueError:
+            # Linha maior que o limite do StreamReader
+            await self.send(error_frame("Quadro excede o tamanho máximo"))
+            return b''
+        line, self._buffer = self._buffer + rest, b''
+        return line
+
+    async def run(self, initial: bytes = b'') -> None:
+        """
+        Processa quadros até o fim da conexão.
+
+        Args:
+            initial: Bytes já lidos do socket antes de a sessão assumir.
+        """
+        self._buffer = initial
+        try:
+            while True:
+                line = await self._read_line()
+                if not line:
+                    break
+                if line.strip():
+                    await self._dispatch(line)
+
+            # Cliente terminou de enviar; conclui os jobs pendentes
+            if self._jobs:
+                await asyncio.gather(*self._jobs.values(), return_exceptions=True)
+        finally:
+            for task in self._jobs.values():
+                task.cancel()
+            if self._worker is not None:
+                print(f"[CLUSTER] Trabalhador {self._worker.name} desconectou.")
+                CLUSTER.unregister(self._worker, "conexão encerrada")
+
+    async def _dispatch(self, line: bytes) -> None:
+        try:
+            frame = decode_frame(line)
+        except ProtocolError as e:
+            await self.send(error_frame(str(e)))
+            return
+        handler = self._handlers.get(frame['type'])
+        if handler is None:
+            await self.send(error_frame(f"Tipo de quadro desconhecido: {frame['type']}", frame.get('id')))
+            return
+        try:
+            await handler(frame)
+        except BadRequest as e:
+            # Campo inválido: recusa só este pedido, a sessão e os outros jobs seguem
+            await self.send(error_frame(str(e), frame.get('id'), code='bad_request'))
+
+    def _start_job(self, request_id: str, job: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(job)
+        self._jobs[request_id] = task
+        task.add_done_callback(lambda _: self._jobs.pop(request_id, None))
+
+    async def _on_hello(self, frame: Frame) -> None:
+        await self.send(make_frame(
+            'hello', frame.get('id'), versions=list(SUPPORTED_VERSIONS), types=sorted(self._handlers)))
+
+    async def _on_stats(self, frame: Frame) -> None:
+        await self.send(make_frame(
+            'stats', frame.get('id'), caches=ENRICHMENT_CACHE.stats(), jobs=JOBS.stats(),
+            workers=CLUSTER.stats()))
+
+    async def _on_register(self, frame: Frame) -> None:
+        """
+        Converte a conexão em um trabalhador remoto do cluster.
+
+        O primeiro `register` recebe um `challenge` com um nonce; o segundo
+        traz a prova (HMAC com o segredo do cluster). Um registro recusado
+        encerra a conexão. Daqui em diante, os quadros recebidos (host, done,
+        heartbeat) são do trabalhador e vão para ele, não para os handlers de
+        cliente.
+        """
+        if self._worker is not None:
+            await self.send(error_frame("Conexão já registrada como trabalhador"))
+            return
+        if self._challenge is None or 'proof' not in frame:
+            self._challenge = CLUSTER.challenge()
+            await self.send(make_frame('challenge', nonce=self._challenge))
+            return
+        nonce, self._challenge = self._challenge, None
+        try:
+            self._worker = CLUSTER.register(self, frame, nonce)
+        except (TypeError, ValueError) as e:
+            print(f"[CLUSTER] Registro recusado de {self.addr}: {e}")
+            await self.send(error_frame(f"Registro inválido: {e}"))
+            self.writer.close()
+            return
+        self._handlers = self._worker.handlers
+        print(f"[CLUSTER] Trabalhador {self._worker.name} registrado de {self.addr}: "
+              f"{', '.join(map(str, self._worker.networks)) or 'sem redes locais'}, "
+              f"{self._worker.capacity} shard(s) por vez")
+        await self.send(make_frame('registered', name=self._worker.name, heartbeat=HEARTBEAT_INTERVAL))
+
+    async def _on_history(self, frame: Frame) -> None:
+        """
+        Consulta o histórico gravado, sem sondar a rede: por faixa, MAC ou IP.
+
+        Cada host vai num quadro 'history' próprio, seguido de um 'done' com a
+        contagem, para que uma faixa grande não vire uma única linha enorme.
+        """
+        request_id = frame.get('id')
+        query: Dict[str, Any]
+        hosts: List[Dict[str, Any]]
+        try:
+            if 'cidr' in frame:
+                host_range = parse_cidr(str(frame['cidr']))
+                if host_range is None:
+                    await self.send(error_frame("Notação CIDR inválida. Use o formato '192.168.1.0/24'.", request_id))
+                    return
+                query = {'cidr': frame['cidr']}
+                hosts = await RESULT_STORE.last_state(host_range)
+            elif 'mac' in frame:
+                query = {'mac': frame['mac']}
+                host = await RESULT_STORE.mac_last_seen(str(frame['mac']))
+                hosts = [host] if host is not None else []
+            elif 'ip' in frame:
+                limit = max(1, int_field(frame, 'limit', 100))
+                query = {'ip': frame['ip']}
+                hosts = await RESULT_STORE.host_history(str(frame['ip']), limit)
+            else:
+                await self.send(error_frame("Informe 'cidr', 'mac' ou 'ip'", request_id))
+                return
+        except ValueError as e:
+            await self.send(error_frame(f"Consulta inválida: {e}", request_id))
+            return
+        for host in hosts:
+            await self.send(make_frame('history', request_id, host=host, **query))
+        await self.send(make_frame('done', request_id, count=len(hosts), **query))
+
+    async def _on_series(self, frame: Frame) -> None:
+        """Consulta uma série coletada por 'poll': pontos brutos ou agregados por intervalo."""
+        request_id = frame.get('id')
+        metric = frame.get('metric')
+        if metric not in METRIC_IDS:
+            await self.send(error_frame(f"Métrica desconhecida: {metric}", request_id))
+            return
+        try:
+            ip = str(frame['ip'])
+            start, end = _millis(frame, 'start'), _millis(frame, 'end')
+            step = _millis(frame, 'step') or None
+            if step or frame.get('aggregate'):
+                buckets = await TIMESERIES.aggregate(ip, metric, start, end, step)
+                for bucket in buckets:
+                    bucket['t'] /= 1000
+                await self.send(make_frame('series', request_id, ip=ip, metric=metric, buckets=buckets))
+            else:
+                timestamps, values = await TIMESERIES.query(ip, metric, start, end)
+                points = [[t / 1000, v] for t, v in zip(timestamps, values)]
+                await self.send(make_frame('series', request_id, ip=ip, metric=metric, points=points))
+        except (KeyError, ValueError) as e:
+            await self.send(error_frame(f"Consulta inválida: {e}", request_id))
+
+    async def _on_cancel(self, frame: Frame) -> None:
+        request_id = frame.get('id')
+        task = self._jobs.get(request_id)  # type: ignore[arg-type]
+        if task is None:
+            await self.send(error_frame("Job desconhecido ou já concluído", request_id))
+            return
+        task.cancel()
+        await self.send(make_frame('cancelled', request_id))
+
+    async def _validate_job(self, frame: Frame) -> Optional[HostRange]:
+        """Valida id e CIDR de um quadro que inicia job; envia o erro se inválido."""
+        request_id = frame.get('id')
+        if not isinstance(request_id, str) or not request_id:
+            await self.send(error_frame("Campo 'id' obrigatório para jobs"))
+            return None
+        if request_id in self._jobs:
+            await self.send(error_frame("Já existe um job com este id", request_id))
+            return None
+
+        host_range = parse_cidr(str(frame.get('cidr', '')))
+        if host_range is None:
+            await self.send(error_frame("Notação CIDR inválida. Use o formato '192.168.1.0/24'.", request_id))
+        return host_range
+
+    async def _community(self, frame: Frame) -> Optional[Community]:
+        """
+        Comunidade (v1) ou lista de credenciais de um quadro de job; envia o
+        erro e devolve None se as credenciais forem inválidas.
+        """
+        if 'credentials' not in frame:
+            return str(frame.get('community', 'public'))
+        # Várias credenciais tentadas ao mesmo tempo em cada host; a que
+        # funcionar fica guardada para as próximas consultas
+        try:
+            return parse_credentials(frame['credentials'])
+        except (TypeError, ValueError) as e:
+            await self.send(error_frame(str(e), frame['id']))
+            return None
+
+    async def _on_monitor(self, frame: Frame) -> None:
+        host_range = await self._validate_job(frame)
+        if host_range is None:
+            return
+        request_id = frame['id']
+        community = await self._community(frame)
+        if community is None:
+            return
+        interval = max(float_field(frame, 'interval', MONITOR_INTERVAL), MONITOR_MIN_INTERVAL)
+
+        print(f"[{self.addr}] Job {request_id}: monitoramento de {frame['cidr']} a cada {interval:.0f}s")
+        self._start_job(request_id, self._run_monitor(request_id, host_range, community, interval))
+
+    async def _run_monitor(self, request_id: str, host_range: HostRange,
+                           community: Community, interval: float) -> None:
+        monitor, subscription = MONITORS.attach(host_range, community, interval)
+        try:
+            await self.send(make_frame(
+                'accepted', request_id, total=host_range.size, mode='monitor', interval=interval))
+            if monitor.cycle:
+                # Monitor já em andamento: envia o estado atual como base, um
+                # quadro por host (compactos até aqui) e um marcador de fim
+                cycle, records = monitor.cycle, list(monitor.hosts.values())
+                for record in records:
+                    await self.send(make_frame('snapshot', request_id, cycle=cycle, host=record.to_info()))
+                await self.send(make_frame('snapshot_done', request_id, cycle=cycle, count=len(records)))
+            while True:
+                event = await subscription.get()
+                if event[0] == 'error':
+                    await self.send(error_frame(event[1], request_id))
+                    return
+                _, cycle, events = event
+                if events:
+                    await self.send(make_frame('diff', request_id, cycle=cycle, events=events))
+        finally:
+            MONITORS.detach(monitor, subscription)
+
+    async def _on_poll(self, frame: Frame) -> None:
+        host_range = await self._validate_job(frame)
+        if host_range is None:
+            return
+        request_id = frame['id']
+        community = await self._community(frame)
+        if community is None:
+            return
+        interval = max(float_field(frame, 'interval', POLL_INTERVAL), POLL_MIN_INTERVAL)
+
+        print(f"[{self.addr}] Job {request_id}: coleta de contadores em {frame['cidr']} a cada {interval:.0f}s")
+        self._start_job(request_id, self._run_poll(request_id, host_range, community, interval))
+
+    async def _run_poll(self, request_id: str, host_range: HostRange,
+                        community: Community, interval: float) -> None:
+        poller = SnmpPoller(host_range, community, interval)
+        await self.send(make_frame(
+            'accepted', request_id, total=host_range.size, mode='poll', interval=interval))
+        cycles = poller.cycles()
+        try:
+            async for cycle, polled, responded in cycles:
+                await self.send(make_frame(
+                    'polled', request_id, cycle=cycle, polled=polled, responded=responded))
+        finally:
+            await cycles.aclose()
+
+    async def _on_interfaces(self, frame: Frame) -> None:
+        host_range = await self._validate_job(frame)
+        if host_range is None:
+            return
+        request_id = frame['id']
+        community = await self._community(frame)
+        if community is None:
+            return
+        max_repetitions = max(1, int_field(frame, 'max_repetitions', SNMP_BULK_REPETITIONS))
+        concurrency = min(int_field(frame, 'concurrency', WALK_CONCURRENCY), MAX_CONCURRENCY)
+        names = frame.get('columns') or list(INTERFACE_COLUMNS)
+        if not isinstance(names, list):
+            await self.send(error_frame("Campo 'columns' deve ser uma lista", request_id))
+            return
+        unknown = [name for name in names if name not in INTERFACE_COLUMNS]
+        if unknown:
+            await self.send(error_frame(f"Colunas desconhecidas: {', '.join(map(str, unknown))}", request_id))
+            return
+        columns = {name: INTERFACE_COLUMNS[name] for name in names}
+
+        print(f"[{self.addr}] Job {request_id}: tabela de interfaces de {host_range.size} hosts em {frame['cidr']}")
+        self._start_job(request_id, self._run_interfaces(
+            request_id, host_range, community, columns, max_repetitions, concurrency))
+
+    async def _run_interfaces(self, request_id: str, host_range: HostRange, community: Community,
+                              columns: Dict[str, str], max_repetitions: int, concurrency: int) -> None:
+        await self.send(make_frame('accepted', request_id, total=host_range.size, mode='interfaces'))
+        started = time.monotonic()
+        hosts = set()
+        rows = 0
+        stream = walk_stream(host_range, community, columns, max_repetitions, max(1, concurrency))
+        try:
+            async for ip, row in stream:
+                hosts.add(ip)
+                rows += 1
+                await self.send(make_frame('interface', request_id, ip=ip, row=row))
+        finally:
+            await stream.aclose()
+        await self.send(make_frame(
+            'done', request_id, hosts=len(hosts), rows=rows, total=host_range.size,
+            elapsed=round(time.monotonic() - started, 3)))
+
+    async def _on_scan(self, frame: Frame) -> None:
+        host_range = await self._validate_job(frame)
+        if host_range is None:
+            return
+        request_id = frame['id']
+        mode = frame.get('mode', 'full')
+        if mode not in ('full', 'sweep'):
+            await self.send(error_frame(f"Modo desconhecido: {mode}", request_id))
+            return
+        community = await self._community(frame)
+        if community is None:
+            return
+        concurrency = min(int_field(frame, 'concurrency', MAX_CONCURRENCY), MAX_CONCURRENCY)
+        # Portas da segunda chance da descoberta para quem não responde ao ICMP ([] desativa)
+        tcp_ports = ports_field(frame, 'tcp_ports', DISCOVERY_TCP_PORTS)
+        # Varredura completa dividida entre processos (a de ICMP já usa um único socket)
+        sharded = bool(frame.get('sharded')) and mode == 'full'
+        # Ou entre trabalhadores remotos, cada um no seu segmento de rede
+        distributed = bool(frame.get('distributed')) and mode == 'full'
+        if distributed and not CLUSTER.workers:
+            await self.send(error_frame("Nenhum trabalhador registrado no coordenador", request_id))
+            return
+
+        if distributed:
+            detail = f" ({len(CLUSTER.workers)} trabalhadores)"
+        elif sharded:
+            detail = f" ({SHARD_POOL.workers} processos)"
+        else:
+            detail = ""
+        print(f"[{self.addr}] Job {request_id}: {mode} de {host_range.size} hosts em {frame['cidr']}{detail}")
+        self._start_job(request_id, self._run_scan(
+            request_id, str(frame['cidr']), host_range, community, mode, concurrency, sharded, distributed,
+            tcp_ports))
+
+    async def _run_scan(self, request_id: str, cidr: str, host_range: HostRange,
+                        community: Community, mode: str, concurrency: int,
+                        sharded: bool = False, distributed: bool = False,
+                        tcp_ports: Sequence[int] = DISCOVERY_TCP_PORTS) -> None:
+        try:
+            job, events, shared = JOBS.submit(
+                cidr, host_range, community, mode, max(1, concurrency), sharded, distributed, tcp_ports)
+        except JobRejected as e:
+            await self.send(error_frame(str(e), request_id))
+            return
+        total = host_range.size
+        active = 0
+
+        async def report_progress() -> None:
+            while True:
+                await asyncio.sleep(PROGRESS_INTERVAL)
+                await self.send(make_frame(
+                    'progress', request_id, dispatched=job.dispatched, total=total, active=active))
+
+        progress: Optional['asyncio.Future[None]'] = None
+        try:
+            await self.send(make_frame(
+                'accepted', request_id, total=total, mode=mode, job=job.id, shared=shared,
+                queued=JOBS.position(job)))
+            progress = asyncio.ensure_future(report_progress())
+            while True:
+                event = await events.get()
+                if event[0] == 'host':
+                    active += 1
+                    await self.send(make_frame('host', request_id, host=event[1]))
+                elif event[0] == 'error':
+                    await self.send(error_frame(event[1], request_id))
+                    return
+                else:
+                    await self.send(make_frame(
+                        'done', request_id, active=event[1], total=total, elapsed=round(event[2], 3)))
+                    return
+        finally:
+            if progress is not None:
+                progress.cancel()
+            # Cancelamento ou desconexão: o job para se este era o último assinante
+            JOBS.detach(job, events)
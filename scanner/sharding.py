@@ -0,0 +1,127 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Set
+
+from .credentials import Community
+from .discovery import DISCOVERY_TCP_PORTS
+from .engine import MAX_CONCURRENCY, HostInfo, scan_hosts
+from .mac_vendor_lookup import MACVendorLookup
+from .utils import HostRange
+
+SHARD_WORKERS = os.cpu_count() or 1  # Processos trabalhadores
+SHARD_SIZE = 256                     # Endereços por shard
+SHARD_PREFETCH = 2                   # Shards na fila de cada trabalhador, para nenhum ficar ocioso
+
+# Loop de eventos próprio de cada processo trabalhador, reaproveitado entre
+# shards: os engines SNMP, sockets DNS e caches continuam válidos.
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker() -> None:
+    global _worker_loop
+    # Ctrl+C é tratado pelo processo principal, que encerra o pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    MACVendorLookup.database()
+
+
+def _scan_shard(version: int, first: int, last: int, community: Community,
+                concurrency: int, tcp_ports: Sequence[int]) -> List[HostInfo]:
+    """Executado no trabalhador: varre um shard no loop do processo."""
+    assert _worker_loop is not None
+    shard = HostRange(version, first, last)
+    return _worker_loop.run_until_complete(scan_hosts(shard, community, concurrency, tcp_ports))
+
+
+class ShardPool:
+    """
+    Varreduras divididas entre processos, para usar todos os núcleos.
+
+    Num único processo, montar e decodificar PDUs SNMP (BER, pysnmp) satura
+    um núcleo bem antes da rede. Aqui a faixa é cortada em shards que rodam
+    em um pool de processos (contexto spawn, sem herdar sockets nem o loop
+    do servidor), cada um com seu loop de eventos e seus engines SNMP. O
+    processo principal só junta os resultados, na ordem em que os shards
+    terminam.
+
+    O pool é criado na primeira varredura e reaproveitado pelas seguintes.
+    """
+
+    def __init__(self, workers: int = SHARD_WORKERS):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    @staticmethod
+    def shards(host_range: HostRange, size: int = SHARD_SIZE) -> Iterable[HostRange]:
+        return host_range.chunks(size)
+
+    async def stream(self, shards: Iterable[HostRange], community: Community,
+                     concurrency: int = MAX_CONCURRENCY,
+                     tcp_ports: Sequence[int] = DISCOVERY_TCP_PORTS) -> AsyncIterator[HostInfo]:
+        """
+        Varre os shards no pool e produz cada host ativo, shard a shard.
+
+        Args:
+            shards: Sub-faixas a varrer (ex: ShardPool.shards(faixa)), consumidas
+                sob demanda: só `workers * SHARD_PREFETCH` ficam em andamento.
+            concurrency: Limite total de sondagens simultâneas, dividido
+                entre os trabalhadores.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        per_worker = max(1, concurrency // self.workers)
+        shard_iter = iter(shards)
+        in_flight: Set['asyncio.Future[List[HostInfo]]'] = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(in_flight) < self.workers * SHARD_PREFETCH:
+                    shard = next(shard_iter, None)
+                    if shard is None:
+                        exhausted = True
+                        break
+                    in_flight.add(loop.run_in_executor(
+                        pool, _scan_shard, shard.version, shard.first, shard.last,
+                        community, per_worker, tuple(tcp_ports)))
+                if not in_flight:
+                    break
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    for host in future.result():
+                        yield host
+        except BrokenProcessPool:
+            # Um trabalhador morreu: a próxima varredura recria o pool
+            self._executor = None
+            raise
+        finally:
+            # Shards ainda na fila não chegam a rodar; os em execução terminam sozinhos
+            for future in in_flight:
+                future.cancel()
+
+    def close(self) -> None:
+        """Encerra os processos trabalhadores."""
+        if self._executor is not None:
+            try:
+                # Shards ainda na fila são descartados (Python 3.9+)
+                self._executor.shutdown(wait=True, cancel_futures=True)
+            except TypeError:
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+SHARD_POOL = ShardPool()
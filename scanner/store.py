@@ -0,0 +1,284 @@
+import asyncio
+import ipaddress
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .engine import HostInfo
+from .utils import HostRange, user_data_dir
+
+STORE_PATH = os.path.join(user_data_dir(), 'history.sqlite3')
+STORE_BATCH_SIZE = 500        # Linhas por transação de escrita
+STORE_FLUSH_INTERVAL = 1.0    # Espera máxima (s) antes de gravar um lote incompleto
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scans (
+    id TEXT PRIMARY KEY,
+    cidr TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    active INTEGER
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    scan_id TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    ip BLOB NOT NULL,
+    ip_text TEXT NOT NULL,
+    mac TEXT,
+    name TEXT,
+    vendor TEXT,
+    snmp_info TEXT
+);
+CREATE INDEX IF NOT EXISTS hosts_ip ON hosts (ip, seen_at);
+CREATE INDEX IF NOT EXISTS hosts_mac ON hosts (mac, seen_at);
+CREATE INDEX IF NOT EXISTS hosts_seen_at ON hosts (seen_at);
+CREATE TABLE IF NOT EXISTS latest (
+    ip BLOB PRIMARY KEY,
+    scan_id TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    ip_text TEXT NOT NULL,
+    mac TEXT,
+    name TEXT,
+    vendor TEXT,
+    snmp_info TEXT
+) WITHOUT ROWID;
+'''
+
+_INSERT_HOST = '''
+INSERT INTO hosts (scan_id, seen_at, ip, ip_text, mac, name, vendor, snmp_info)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_UPSERT_LATEST = '''
+INSERT INTO latest (scan_id, seen_at, ip, ip_text, mac, name, vendor, snmp_info)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (ip) DO UPDATE SET
+    scan_id = excluded.scan_id, seen_at = excluded.seen_at,
+    mac = COALESCE(excluded.mac, latest.mac),
+    name = COALESCE(excluded.name, latest.name),
+    vendor = COALESCE(excluded.vendor, latest.vendor),
+    snmp_info = COALESCE(excluded.snmp_info, latest.snmp_info)
+WHERE excluded.seen_at >= latest.seen_at
+'''
+_HOST_COLUMNS = 'scan_id, seen_at, ip_text, mac, name, vendor, snmp_info'
+
+HostRow = Tuple[str, float, bytes, str, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+def _row_to_host(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    scan_id, seen_at, ip_text, mac, name, vendor, snmp_info = row
+    return {
+        'ip': ip_text,
+        'name': name,
+        'mac': mac,
+        'vendor': vendor,
+        'snmp_info': json.loads(snmp_info) if snmp_info else None,
+        'seen_at': seen_at,
+        'scan_id': scan_id,
+    }
+
+
+class ResultStore:
+    """
+    Histórico persistente das varreduras em SQLite.
+
+    Cada HostInfo vira uma linha em `hosts`, indexada por IP, MAC e horário,
+    e a tabela `latest` guarda o último estado conhecido de cada IP: um campo
+    ausente na varredura mais recente (uma varredura ICMP não traz MAC, nome
+    nem SNMP) mantém o último valor conhecido. Os IPs são gravados
+    empacotados (4 ou 16 bytes big-endian), então uma faixa CIDR vira um
+    BETWEEN sobre a chave primária.
+
+    As escritas não bloqueiam a varredura: record() apenas enfileira a linha,
+    e uma thread dedicada (que também abre o banco e cria o esquema) grava
+    lotes de até `batch_size` linhas por transação. As consultas usam outra
+    conexão (modo WAL) em um executor próprio, sem disputar com o escritor.
+    """
+
+    def __init__(self, path: str = STORE_PATH, batch_size: int = STORE_BATCH_SIZE,
+                 flush_interval: float = STORE_FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: 'queue.SimpleQueue[Any]' = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._reader: Optional[ThreadPoolExecutor] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._start_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _ensure_started(self) -> None:
+        if self._writer is not None:
+            return
+        with self._start_lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._write_loop, name='result-store-writer', daemon=True)
+            self._writer.start()
+
+    # --- Escrita -----------------------------------------------------------
+
+    def begin_scan(self, cidr: str, mode: str) -> str:
+        """Registra o início de uma varredura e devolve seu identificador."""
+        self._ensure_started()
+        scan_id = uuid.uuid4().hex
+        self._queue.put(('begin', (scan_id, cidr, mode, time.time())))
+        return scan_id
+
+    def record(self, scan_id: str, info: HostInfo, seen_at: Optional[float] = None) -> None:
+        """Enfileira um host encontrado; a gravação acontece em lote."""
+        self._ensure_started()
+        snmp_info = info.get('snmp_info')
+        mac = info.get('mac')
+        row: HostRow = (
+            scan_id,
+            seen_at if seen_at is not None else time.time(),
+            ipaddress.ip_address(info['ip']).packed,
+            info['ip'],  # type: ignore[arg-type]
+            mac.lower() if mac else None,
+            info.get('name'),
+            info.get('vendor'),
+            json.dumps(snmp_info, ensure_ascii=False) if snmp_info else None,
+        )
+        self._queue.put(('host', row))
+
+    def finish_scan(self, scan_id: str, active: int) -> None:
+        """Registra o fim de uma varredura."""
+        self._queue.put(('finish', (time.time(), active, scan_id)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Bloqueia até que tudo o que foi enfileirado esteja gravado."""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def _open_writer(self) -> Optional[sqlite3.Connection]:
+        try:
+            conn = self._connect()
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            return conn
+        except (OSError, sqlite3.Error) as e:
+            print(f"[HISTÓRICO] Histórico desativado: não foi possível abrir {self.path}: {e}")
+            return None
+
+    def _write_loop(self) -> None:
+        # Aberto aqui, fora do loop de eventos; sem banco, os lotes são descartados
+        conn = self._open_writer()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] not in ('flush', 'close'):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            closing = self._write_batch(conn, batch)
+            if closing:
+                if conn is not None:
+                    conn.close()
+                return
+
+    def _write_batch(self, conn: Optional[sqlite3.Connection], batch: List[Any]) -> bool:
+        hosts = [item[1] for item in batch if item[0] == 'host']
+        closing = False
+        if conn is not None:
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT OR IGNORE INTO scans (id, cidr, mode, started_at) VALUES (?, ?, ?, ?)',
+                        [item[1] for item in batch if item[0] == 'begin'])
+                    if hosts:
+                        conn.executemany(_INSERT_HOST, hosts)
+                        conn.executemany(_UPSERT_LATEST, hosts)
+                    conn.executemany(
+                        'UPDATE scans SET finished_at = ?, active = ? WHERE id = ?',
+                        [item[1] for item in batch if item[0] == 'finish'])
+            except sqlite3.Error as e:
+                print(f"[HISTÓRICO] Falha ao gravar {len(hosts)} hosts: {e}")
+        for kind, payload in batch:
+            if kind == 'flush':
+                payload.set()
+            elif kind == 'close':
+                payload.set()
+                closing = True
+        return closing
+
+    # --- Consultas ---------------------------------------------------------
+
+    async def _query(self, sql: str, params: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        self._ensure_started()
+        if self._reader is None:
+            self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='result-store-reader')
+
+        def run() -> List[Tuple[Any, ...]]:
+            # Grava o lote em andamento para que a consulta veja os últimos hosts
+            self.flush()
+            try:
+                if self._read_conn is None:
+                    self._read_conn = self._connect()
+                return self._read_conn.execute(sql, params).fetchall()
+            except (OSError, sqlite3.Error) as e:
+                raise ValueError(f"histórico indisponível ({e})") from None
+
+        return await asyncio.get_running_loop().run_in_executor(self._reader, run)
+
+    async def last_state(self, host_range: HostRange) -> List[Dict[str, Any]]:
+        """Último estado conhecido de cada IP da faixa, sem sondar a rede."""
+        first = host_range.address(host_range.first).packed
+        last = host_range.address(host_range.last).packed
+        rows = await self._query(
+            f'SELECT {_HOST_COLUMNS} FROM latest '
+            'WHERE ip BETWEEN ? AND ? AND length(ip) = ? ORDER BY ip',
+            (first, last, len(first)))
+        return [_row_to_host(row) for row in rows]
+
+    async def mac_last_seen(self, mac: str) -> Optional[Dict[str, Any]]:
+        """A aparição mais recente de um MAC, ou None se nunca visto."""
+        rows = await self._query(
+            f'SELECT {_HOST_COLUMNS} FROM hosts WHERE mac = ? ORDER BY seen_at DESC LIMIT 1',
+            (mac.lower().replace('-', ':'),))
+        return _row_to_host(rows[0]) if rows else None
+
+    async def host_history(self, ip: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """As últimas `limit` aparições de um IP, da mais recente para a mais antiga."""
+        rows = await self._query(
+            f'SELECT {_HOST_COLUMNS} FROM hosts WHERE ip = ? ORDER BY seen_at DESC LIMIT ?',
+            (ipaddress.ip_address(ip).packed, limit))
+        return [_row_to_host(row) for row in rows]
+
+    def close(self) -> None:
+        """Grava o que estiver pendente e fecha as conexões."""
+        if self._writer is not None:
+            done = threading.Event()
+            self._queue.put(('close', done))
+            done.wait()
+            self._writer.join()
+            self._writer = None
+        if self._reader is not None:
+            self._reader.shutdown(wait=True)
+            self._reader = None
+        if self._read_conn is not None:
+            self._read_conn.close()
+            self._read_conn = None
+
+
+RESULT_STORE = ResultStore()
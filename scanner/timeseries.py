@@ -0,0 +1,597 @@
+import asyncio
+import ipaddress
+import mmap
+import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from .credentials import Community, snmp_auth
+from .engine import MAX_CONCURRENCY
+from .probes import SNMP_OIDS, snmp_get_many
+from .utils import HostRange, user_data_dir
+
+TIMESERIES_PATH = os.path.join(user_data_dir(), 'timeseries')
+TS_SEGMENT_POINTS = 1024       # Pontos por bloco comprimido gravado em disco
+TS_SEGMENT_MAX_AGE = 3600.0    # Idade máxima (s) de um bloco em memória antes de gravá-lo
+TS_DECODED_BLOCKS = 512        # Blocos selados já decodificados mantidos em memória (LRU)
+POLL_INTERVAL = 60.0           # Segundos entre coletas
+POLL_MIN_INTERVAL = 5.0        # Menor intervalo aceito de um cliente
+POLL_REDISCOVER_EVERY = 10     # A cada N ciclos, consulta a faixa inteira (e não só quem respondeu)
+
+# Métricas armazenadas: nome curto -> OID. A posição na tupla é o id gravado nos blocos,
+# então novas métricas devem ser acrescentadas ao final.
+TS_METRICS: Tuple[Tuple[str, str], ...] = (
+    ('cpu_idle', SNMP_OIDS['CPU Idle (%)']),
+    ('mem_total_kb', SNMP_OIDS['Memória Total (kB)']),
+    ('mem_free_kb', SNMP_OIDS['Memória Livre (kB)']),
+    ('uptime', SNMP_OIDS['Tempo de Atividade']),
+)
+METRIC_IDS: Dict[str, int] = {name: index for index, (name, _) in enumerate(TS_METRICS)}
+
+# Bloco: magic, versão, métrica, pontos, primeiro/último instante (ms), primeiro
+# valor, tamanho das colunas de tempo e de valores. Tudo little-endian.
+_BLOCK_MAGIC = b'TSB1'
+_BLOCK_VERSION = 1
+_BLOCK_HEADER = struct.Struct('<4sBBHqqqII')
+
+Series = Tuple[array, array]   # (instantes em ms, valores), ambos array('q')
+_BlockRef = Tuple[int, int, int, int]  # (métrica, primeiro instante, último instante, offset)
+# Cópia do bloco em memória para a consulta: (pontos, primeiro instante, primeiro valor,
+# deltas de tempo, deltas de valor, último instante)
+_HeadCopy = Tuple[int, int, int, bytes, bytes, int]
+Sample = Tuple[str, Optional[Dict[str, int]]]
+
+# Zigzag de um varint de um byte, indexado pelo próprio byte
+_ZIGZAG_BYTE = tuple((b >> 1) if not b & 1 else -((b + 1) >> 1) for b in range(0x80))
+_HIGH_BYTES = bytes(range(0x80, 0x100))
+# Uma sequência de varints de um byte, ou um único varint de vários bytes
+_VARINT_RUNS = re.compile(rb'[\x00-\x7f]+|[\x80-\xff]+[\x00-\x7f]')
+
+
+def _put_varint(buf: bytearray, value: int) -> None:
+    """Acrescenta um inteiro com sinal em zigzag + varint (1 byte para |v| < 64)."""
+    value = value << 1 if value >= 0 else ((-value) << 1) - 1
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _varints(data: Iterable[int]) -> Iterable[int]:
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        yield (value >> 1) if not value & 1 else -((value + 1) >> 1)
+        value = shift = 0
+
+
+class _SeriesEncoder:
+    """
+    Bloco em construção de uma série, já comprimido.
+
+    Como no Gorilla, cada ponto é codificado ao chegar: o instante como
+    delta-of-delta (zero para coletas em intervalo fixo) e o valor como delta
+    do anterior, ambos em zigzag + varint. Uma série regular custa cerca de
+    2 bytes por ponto, inclusive enquanto ainda está em memória.
+    """
+
+    __slots__ = ('metric', 'count', 'first_time', 'first_value', 'last_time',
+                 'last_delta', 'last_value', 'created', 'times', 'values')
+
+    def __init__(self, metric: int):
+        self.metric = metric
+        self.count = 0
+        self.first_time = self.first_value = 0
+        self.last_time = self.last_delta = self.last_value = 0
+        self.created = time.monotonic()
+        self.times = bytearray()
+        self.values = bytearray()
+
+    def append(self, timestamp: int, value: int) -> None:
+        if self.count == 0:
+            self.first_time = self.last_time = timestamp
+            self.first_value = self.last_value = value
+        else:
+            delta = timestamp - self.last_time
+            _put_varint(self.times, delta - self.last_delta)
+            _put_varint(self.values, value - self.last_value)
+            self.last_time, self.last_delta, self.last_value = timestamp, delta, value
+        self.count += 1
+
+    def header(self) -> bytes:
+        return _BLOCK_HEADER.pack(_BLOCK_MAGIC, _BLOCK_VERSION, self.metric, self.count,
+                                  self.first_time, self.last_time, self.first_value,
+                                  len(self.times), len(self.values))
+
+    def decode(self) -> Series:
+        return _decode(self.count, self.first_time, self.first_value, self.times, self.values)
+
+
+def _varint_column(data: Any) -> List[int]:
+    """
+    Decodifica uma coluna inteira de varints zigzag.
+
+    Varints de um byte (delta-of-delta zero, deltas pequenos) são traduzidos
+    em bloco por uma tabela, sem laço em Python; só os de vários bytes passam
+    pelo laço. Uma coluna com poucos varints longos (ex: o primeiro intervalo
+    de uma série regular) é percorrida em trechos pela expressão regular.
+    """
+    data = bytes(data)
+    multibyte = len(data) - len(data.translate(None, _HIGH_BYTES))
+    if not multibyte:
+        return list(map(_ZIGZAG_BYTE.__getitem__, data))
+    if multibyte * 8 > len(data):
+        return list(_varints(data))
+    column: List[int] = []
+    for run in _VARINT_RUNS.findall(data):
+        if run[0] < 0x80:
+            column.extend(map(_ZIGZAG_BYTE.__getitem__, run))
+        else:
+            column.extend(_varints(run))
+    return column
+
+
+def _decode(count: int, first_time: int, first_value: int, times: Any, values: Any) -> Series:
+    """
+    Reconstrói as colunas de um bloco a partir dos deltas.
+
+    As somas acumuladas (delta-of-delta -> delta -> instante, delta -> valor)
+    rodam em C com itertools.accumulate.
+    """
+    timestamps = array('q', accumulate(accumulate(_varint_column(times)), initial=first_time))
+    samples = array('q', accumulate(_varint_column(values), initial=first_value))
+    if len(timestamps) != count or len(samples) != count:
+        raise ValueError("Bloco de série temporal corrompido")
+    return timestamps, samples
+
+
+def _host_key(ip: str) -> str:
+    return ipaddress.ip_address(ip).packed.hex()
+
+
+class TimeSeriesStore:
+    """
+    Armazenamento compacto de séries temporais de contadores SNMP.
+
+    Cada (host, métrica) é uma série de pontos (instante em ms, inteiro). Os
+    pontos recentes ficam em um bloco comprimido em memória (_SeriesEncoder);
+    ao atingir `segment_points` pontos ou `segment_max_age` segundos, o bloco
+    é anexado ao arquivo do host (um por IP, só de escrita ao final).
+
+    Como no ResultStore, o loop de eventos não toca o disco: append() só
+    codifica o ponto e, ao selar um bloco, o entrega a uma thread de escrita;
+    as consultas rodam em um executor próprio de uma thread, que antes espera
+    a gravação dos blocos já selados.
+
+    As leituras abrem o arquivo com mmap e consultam um índice dos cabeçalhos
+    dos blocos, de modo que só os blocos que cruzam o intervalo pedido são
+    descomprimidos. Os blocos selados não mudam, então os últimos
+    `decoded_blocks` decodificados ficam em cache e consultas repetidas (ex:
+    um painel atualizado a cada minuto) só decodificam o bloco em memória. As
+    colunas decodificadas são array('q'): o recorte do intervalo usa busca
+    binária e os agregados (min/max/soma) rodam em C sobre fatias dos arrays.
+    A decodificação em si ainda cria um inteiro Python por ponto.
+    """
+
+    def __init__(self, path: str = TIMESERIES_PATH, segment_points: int = TS_SEGMENT_POINTS,
+                 segment_max_age: float = TS_SEGMENT_MAX_AGE,
+                 decoded_blocks: int = TS_DECODED_BLOCKS):
+        self.path = path
+        self.segment_points = min(segment_points, 0xFFFF)
+        self.segment_max_age = segment_max_age
+        self.decoded_blocks = decoded_blocks
+        self._heads: Dict[Tuple[str, int], _SeriesEncoder] = {}
+        self._sealed_until: Dict[Tuple[str, int], int] = {}
+        # Índice dos arquivos: escrito pela thread de escrita e lido pelo executor
+        self._index: Dict[str, List[_BlockRef]] = {}
+        self._index_lock = threading.Lock()
+        # Só o executor de leitura (uma thread) usa o cache de blocos decodificados
+        self._decoded: 'OrderedDict[Tuple[str, int], Series]' = OrderedDict()
+        self._queue: 'queue.SimpleQueue[Any]' = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._reader: Optional[ThreadPoolExecutor] = None
+        self._start_lock = threading.Lock()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + '.tsdb')
+
+    def _ensure_started(self) -> None:
+        if self._writer is not None:
+            return
+        with self._start_lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._write_loop, name='timeseries-writer', daemon=True)
+            self._writer.start()
+
+    # --- Escrita -----------------------------------------------------------
+
+    def append(self, ip: str, timestamp: int, values: Dict[str, int]) -> None:
+        """
+        Acrescenta uma amostra de um host.
+
+        Args:
+            ip: O endereço do host.
+            timestamp: Instante da coleta em milissegundos (época Unix).
+            values: {métrica: valor} com as métricas de TS_METRICS obtidas.
+        """
+        key = _host_key(ip)
+        for name, value in values.items():
+            metric = METRIC_IDS[name]
+            head = self._heads.get((key, metric))
+            last_time = head.last_time if head is not None else self._sealed_until.get((key, metric))
+            if last_time is not None and timestamp <= last_time:
+                # Fora de ordem (ex: duas coletas simultâneas da mesma faixa)
+                continue
+            if head is None:
+                head = self._heads[(key, metric)] = _SeriesEncoder(metric)
+            head.append(timestamp, value)
+            if (head.count >= self.segment_points
+                    or time.monotonic() - head.created >= self.segment_max_age):
+                self._seal(key, metric)
+
+    def _seal(self, key: str, metric: int) -> None:
+        head = self._heads.pop((key, metric), None)
+        if head is None or not head.count:
+            return
+        self._sealed_until[(key, metric)] = head.last_time
+        # A partir daqui o bloco não muda mais: a thread de escrita grava o próprio objeto
+        self._ensure_started()
+        self._queue.put(('seal', key, head))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Sela todos os blocos em memória e espera a gravação deles em disco."""
+        for key, metric in list(self._heads):
+            self._seal(key, metric)
+        return self._sync(timeout)
+
+    def _sync(self, timeout: Optional[float] = None) -> bool:
+        """Bloqueia até que os blocos já selados estejam gravados."""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put(('sync', None, done))
+        return done.wait(timeout)
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            heads: Dict[str, List[_SeriesEncoder]] = {}
+            for kind, key, payload in batch:
+                if kind == 'seal':
+                    heads.setdefault(key, []).append(payload)
+            for key, blocks in heads.items():
+                self._write_blocks(key, blocks)
+            closing = False
+            for kind, _, payload in batch:
+                if kind in ('sync', 'close'):
+                    payload.set()
+                    closing = closing or kind == 'close'
+            if closing:
+                return
+
+    def _write_blocks(self, key: str, blocks: List[_SeriesEncoder]) -> None:
+        # Sob o lock do índice: uma consulta vê o arquivo e o índice do mesmo tamanho
+        with self._index_lock:
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                with open(self._file(key), 'ab') as f:
+                    refs = []
+                    for head in blocks:
+                        refs.append((head.metric, head.first_time, head.last_time, f.tell()))
+                        f.write(head.header())
+                        f.write(head.times)
+                        f.write(head.values)
+            except OSError as e:
+                print(f"[SÉRIES] Falha ao gravar {len(blocks)} bloco(s) de {key}: {e}")
+                # O índice será relido do arquivo na próxima consulta
+                self._index.pop(key, None)
+                return
+            index = self._index.get(key)
+            if index is not None:
+                index.extend(refs)
+
+    # --- Consultas ---------------------------------------------------------
+
+    def _blocks(self, key: str, data: mmap.mmap) -> List[_BlockRef]:
+        """Índice dos blocos do arquivo, lido só dos cabeçalhos e guardado em memória."""
+        index = self._index.get(key)
+        if index is not None:
+            return index
+        index = []
+        offset = 0
+        while offset + _BLOCK_HEADER.size <= len(data):
+            magic, version, metric, _, first, last, _, times_len, values_len = \
+                _BLOCK_HEADER.unpack_from(data, offset)
+            end = offset + _BLOCK_HEADER.size + times_len + values_len
+            if magic != _BLOCK_MAGIC or version != _BLOCK_VERSION or end > len(data):
+                # Final truncado (ex: queda durante a gravação): ignora o resto
+                break
+            index.append((metric, first, last, offset))
+            offset = end
+        self._index[key] = index
+        return index
+
+    def _open_blocks(self, key: str, metric: int, low: int,
+                     high: int) -> Tuple[Optional[mmap.mmap], List[_BlockRef]]:
+        """Mapeia o arquivo do host e escolhe os blocos da métrica que cruzam [low, high]."""
+        with self._index_lock:
+            try:
+                with open(self._file(key), 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Arquivo inexistente ou vazio: só há o bloco em memória
+                return None, []
+            blocks = [ref for ref in self._blocks(key, data)
+                      if ref[0] == metric and ref[2] >= low and ref[1] <= high]
+        return data, blocks
+
+    def _decoded_block(self, key: str, data: mmap.mmap, offset: int) -> Series:
+        cached = self._decoded.get((key, offset))
+        if cached is not None:
+            self._decoded.move_to_end((key, offset))
+            return cached
+        _, _, _, count, first_time, _, first_value, times_len, values_len = \
+            _BLOCK_HEADER.unpack_from(data, offset)
+        begin = offset + _BLOCK_HEADER.size
+        series = _decode(count, first_time, first_value,
+                         data[begin:begin + times_len],
+                         data[begin + times_len:begin + times_len + values_len])
+        self._decoded[(key, offset)] = series
+        if len(self._decoded) > self.decoded_blocks:
+            self._decoded.popitem(last=False)
+        return series
+
+    def _read(self, key: str, metric: int, start: Optional[int], end: Optional[int],
+              head: Optional[_HeadCopy]) -> Series:
+        """Monta a série no executor de leitura: blocos selados e cópia do bloco em memória."""
+        # Blocos selados antes da consulta ainda podem estar na fila de escrita
+        self._sync()
+        low = start if start is not None else -sys.maxsize - 1
+        high = end if end is not None else sys.maxsize
+        parts: List[Series] = []
+
+        data, blocks = self._open_blocks(key, metric, low, high)
+        if data is not None:
+            with data:
+                parts.extend(self._decoded_block(key, data, offset) for _, _, _, offset in blocks)
+
+        if head is not None and head[5] >= low and head[1] <= high:
+            parts.append(_decode(*head[:5]))
+
+        timestamps, values = array('q'), array('q')
+        for part_times, part_values in parts:
+            lo = bisect_left(part_times, low)
+            hi = bisect_right(part_times, high)
+            timestamps.extend(part_times[lo:hi])
+            values.extend(part_values[lo:hi])
+        return timestamps, values
+
+    def _head_copy(self, key: str, metric: int) -> Optional[_HeadCopy]:
+        # Tirada no loop de eventos, que continua acrescentando pontos ao bloco
+        head = self._heads.get((key, metric))
+        if head is None or not head.count:
+            return None
+        return (head.count, head.first_time, head.first_value,
+                bytes(head.times), bytes(head.values), head.last_time)
+
+    async def _run_reader(self, function: Any, *args: Any) -> Any:
+        if self._reader is None:
+            self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='timeseries-reader')
+        return await asyncio.get_running_loop().run_in_executor(self._reader, function, *args)
+
+    async def query(self, ip: str, metric: str, start: Optional[int] = None,
+                    end: Optional[int] = None) -> Series:
+        """
+        Pontos de uma série no intervalo fechado [start, end] (ms).
+
+        Returns:
+            (instantes, valores) como array('q'), em ordem cronológica.
+        """
+        metric_id = METRIC_IDS[metric]
+        key = _host_key(ip)
+        return await self._run_reader(self._read, key, metric_id, start, end,
+                                      self._head_copy(key, metric_id))
+
+    async def aggregate(self, ip: str, metric: str, start: Optional[int] = None,
+                        end: Optional[int] = None, step: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Agregados (min, max, média, contagem, último) de uma série.
+
+        Args:
+            step: Largura dos intervalos em ms. Se omitido, um único agregado
+                cobre todo o período.
+
+        Returns:
+            Uma lista de {'t', 'min', 'max', 'avg', 'count', 'last'}, onde 't'
+            é o início do intervalo; intervalos sem pontos são omitidos.
+        """
+        metric_id = METRIC_IDS[metric]
+        key = _host_key(ip)
+        head = self._head_copy(key, metric_id)
+
+        def run() -> List[Dict[str, Any]]:
+            return _buckets(self._read(key, metric_id, start, end, head), start, step)
+
+        return await self._run_reader(run)
+
+    def close(self) -> None:
+        """Grava os blocos em memória e encerra as threads de escrita e de leitura."""
+        self.flush()
+        if self._writer is not None:
+            done = threading.Event()
+            self._queue.put(('close', None, done))
+            done.wait()
+            self._writer.join()
+            self._writer = None
+        if self._reader is not None:
+            self._reader.shutdown(wait=True)
+            self._reader = None
+        # O caminho pode mudar entre usos (ex: bench/run.py): nada de índice antigo
+        self._index.clear()
+        self._decoded.clear()
+
+
+def _buckets(series: Series, start: Optional[int], step: Optional[int]) -> List[Dict[str, Any]]:
+    timestamps, values = series
+    if not timestamps:
+        return []
+    if not step or step <= 0:
+        return [_summary(timestamps[0], values)]
+
+    buckets: List[Dict[str, Any]] = []
+    origin = start if start is not None else timestamps[0]
+    bucket = origin + (timestamps[0] - origin) // step * step
+    lo = 0
+    while lo < len(timestamps):
+        hi = bisect_left(timestamps, bucket + step, lo)
+        if hi > lo:
+            buckets.append(_summary(bucket, values[lo:hi]))
+            bucket += step
+        else:
+            bucket = origin + (timestamps[lo] - origin) // step * step
+        lo = hi
+    return buckets
+
+
+def _summary(timestamp: int, values: array) -> Dict[str, Any]:
+    return {
+        't': timestamp,
+        'min': min(values),
+        'max': max(values),
+        'avg': sum(values) / len(values),
+        'count': len(values),
+        'last': values[-1],
+    }
+
+TIMESERIES = TimeSeriesStore()
+
+
+class SnmpPoller:
+    """
+    Coleta periódica dos contadores de TS_METRICS de uma faixa.
+
+    Cada ciclo envia um único GET com todos os OIDs por host, com a
+    comunidade (v1) ou com a credencial aprendida para o host quando
+    `community` é uma lista de credenciais. Depois da
+    primeira passada, só os hosts que responderam são consultados; a faixa
+    inteira volta a ser percorrida a cada `rediscover_every` ciclos, para
+    encontrar dispositivos novos. Todas as amostras de um ciclo recebem o
+    mesmo instante (o agendado), o que mantém os deltas de tempo constantes
+    e a série praticamente sem custo de armazenamento para os instantes.
+    """
+
+    def __init__(self, host_range: HostRange, community: Community = 'public',
+                 interval: float = POLL_INTERVAL, store: TimeSeriesStore = TIMESERIES,
+                 concurrency: int = MAX_CONCURRENCY,
+                 rediscover_every: int = POLL_REDISCOVER_EVERY):
+        self.host_range = host_range
+        self.community = community
+        self.interval = interval
+        self.store = store
+        self.concurrency = concurrency
+        self.rediscover_every = max(1, rediscover_every)
+        self.cycle = 0
+        self.responsive: List[str] = []
+
+    async def _sample(self, ip: str,
+                      semaphore: asyncio.Semaphore) -> Tuple[str, Optional[Dict[str, int]]]:
+        async with semaphore:
+            try:
+                auth = await snmp_auth(ip, self.community)
+                result = None
+                if auth is not None:
+                    result = await snmp_get_many(ip, [oid for _, oid in TS_METRICS], auth=auth)
+            except Exception:
+                result = None
+        if result is None:
+            return ip, None
+        values: Dict[str, int] = {}
+        for name, oid in TS_METRICS:
+            try:
+                values[name] = int(result[oid])
+            except (KeyError, ValueError):
+                continue
+        return ip, values
+
+    async def run_cycle(self, timestamp: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Executa uma coleta.
+
+        Returns:
+            (hosts consultados, hosts que responderam).
+        """
+        self.cycle += 1
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        if (self.cycle - 1) % self.rediscover_every == 0:
+            targets: Iterable[str] = self.host_range
+        else:
+            targets = self.responsive
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        polled = 0
+        responsive: List[str] = []
+        pending: Set['asyncio.Future[Sample]'] = set()
+        try:
+            for ip in targets:
+                polled += 1
+                pending.add(asyncio.ensure_future(self._sample(ip, semaphore)))
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    self._collect(done, timestamp, responsive)
+            if pending:
+                done, pending = await asyncio.wait(pending)
+                self._collect(done, timestamp, responsive)
+        finally:
+            for task in pending:
+                task.cancel()
+        self.responsive = responsive
+        return polled, len(responsive)
+
+    def _collect(self, done: Iterable['asyncio.Future[Sample]'],
+                 timestamp: int, responsive: List[str]) -> None:
+        for task in done:
+            ip, values = task.result()
+            if values is None:
+                continue
+            responsive.append(ip)
+            if values:
+                self.store.append(ip, timestamp, values)
+
+    async def cycles(self) -> AsyncIterator[Tuple[int, int, int]]:
+        """
+        Coleta indefinidamente, em instantes alinhados ao intervalo.
+
+        Yields:
+            (ciclo, hosts consultados, hosts que responderam) ao fim de cada coleta.
+        """
+        interval_ms = int(self.interval * 1000)
+        next_run = (int(time.time() * 1000) // interval_ms + 1) * interval_ms
+        while True:
+            await asyncio.sleep(max(0.0, next_run / 1000 - time.time()))
+            polled, responded = await self.run_cycle(next_run)
+            yield self.cycle, polled, responded
+            next_run += interval_ms
+            now = int(time.time() * 1000)
+            if next_run <= now:
+                # Ciclo mais longo que o intervalo: pula os instantes perdidos
+                next_run = (now // interval_ms + 1) * interval_ms
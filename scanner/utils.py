@@ -1,24 +1,142 @@
 import ipaddress
-from typing import List, Optional
+import os
+from typing import Iterator, List, Optional, Union
 
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
 
-def parse_cidr(cidr_string: str) -> Optional[List[str]]:
+DATA_DIR_ENV = 'SCANNER_DATA_DIR'  # Variável de ambiente que sobrepõe o diretório de dados
+DATA_DIR_NAME = 'network-scanner'  # Subdiretório criado na área de dados do usuário
+
+
+def user_data_dir() -> str:
+    """
+    Diretório gravável dos dados do servidor (histórico, séries temporais).
+
+    Usa $SCANNER_DATA_DIR se definida; senão a área de dados do usuário
+    ($XDG_DATA_HOME ou ~/.local/share, %LOCALAPPDATA% no Windows), e nunca o
+    diretório do pacote, que pode ser somente leitura ou compartilhado.
+    """
+    override = os.environ.get(DATA_DIR_ENV)
+    if override:
+        return override
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser(os.path.join('~', '.local', 'share'))
+    return os.path.join(base, DATA_DIR_NAME)
+
+
+class HostRange:
     """
-    Analisa uma string CIDR e retorna uma lista de IPs de hosts.
+    Faixa contígua de endereços de host, expandida sob demanda.
+
+    Guarda apenas o primeiro e o último endereço como inteiros, de modo que
+    um /8 ou um /64 IPv6 ocupam o mesmo espaço que um /30. Os endereços são
+    gerados um a um durante a iteração, e a faixa pode ser dividida em
+    pedaços para trabalhadores paralelos.
+    """
+
+    __slots__ = ('version', 'first', 'last')
+
+    def __init__(self, version: int, first: int, last: int):
+        self.version = version
+        self.first = first
+        self.last = last
+
+    @classmethod
+    def from_network(cls, network: Union[ipaddress.IPv4Network, ipaddress.IPv6Network]) -> 'HostRange':
+        """Cria a faixa de hosts de uma rede, com a mesma semântica de hosts()."""
+        first = int(network.network_address)
+        last = int(network.broadcast_address)
+        if network.version == 4 and network.prefixlen < 31:
+            # Exclui endereço de rede e broadcast
+            first, last = first + 1, last - 1
+        elif network.version == 6 and network.prefixlen < 127:
+            # Exclui o endereço anycast Subnet-Router
+            first += 1
+        return cls(network.version, first, last)
+
+    @property
+    def size(self) -> int:
+        """Quantidade de endereços na faixa (pode exceder sys.maxsize)."""
+        return self.last - self.first + 1
+
+    def address(self, value: int) -> IPAddress:
+        """Converte um inteiro desta faixa em objeto de endereço."""
+        if self.version == 4:
+            return ipaddress.IPv4Address(value)
+        return ipaddress.IPv6Address(value)
+
+    def __iter__(self) -> Iterator[str]:
+        make = ipaddress.IPv4Address if self.version == 4 else ipaddress.IPv6Address
+        value = self.first
+        while value <= self.last:
+            yield str(make(value))
+            value += 1
+
+    def __len__(self) -> int:
+        # Levanta OverflowError para faixas maiores que sys.maxsize; use `size`.
+        return self.size
+
+    def __bool__(self) -> bool:
+        return self.last >= self.first
+
+    def __contains__(self, ip: object) -> bool:
+        try:
+            addr = ipaddress.ip_address(ip)  # type: ignore[arg-type]
+        except ValueError:
+            return False
+        return addr.version == self.version and self.first <= int(addr) <= self.last
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, HostRange):
+            return NotImplemented
+        return (self.version, self.first, self.last) == (other.version, other.first, other.last)
+
+    def __hash__(self) -> int:
+        return hash((self.version, self.first, self.last))
+
+    def __repr__(self) -> str:
+        return f"HostRange({self.address(self.first)} - {self.address(self.last)})"
+
+    def chunks(self, chunk_size: int) -> Iterator['HostRange']:
+        """Gera sub-faixas consecutivas de até `chunk_size` endereços."""
+        start = self.first
+        while start <= self.last:
+            end = min(start + chunk_size - 1, self.last)
+            yield HostRange(self.version, start, end)
+            start = end + 1
+
+    def split(self, parts: int) -> List['HostRange']:
+        """Divide a faixa em até `parts` sub-faixas de tamanho equilibrado."""
+        parts = max(1, min(parts, self.size))
+        base, extra = divmod(self.size, parts)
+        result: List[HostRange] = []
+        start = self.first
+        for index in range(parts):
+            count = base + (1 if index < extra else 0)
+            result.append(HostRange(self.version, start, start + count - 1))
+            start += count
+        return result
+
+
+def parse_cidr(cidr_string: str) -> Optional[HostRange]:
+    """
+    Analisa uma string CIDR e retorna a faixa de IPs de hosts.
+
+    A faixa é preguiçosa: iterá-la gera as strings de IP uma a uma, então
+    redes arbitrariamente grandes não são materializadas em memória.
 
     Args:
         cidr_string: A notação de rede em formato CIDR (ex: "192.168.1.0/24").
 
     Returns:
-        Uma lista de strings de IP, ou None se o CIDR for inválido.
+        Um HostRange iterável de strings de IP, ou None se o CIDR for inválido.
     """
     try:
         network = ipaddress.ip_network(cidr_string.strip(), strict=False)
-        host_ips = [str(ip) for ip in network.hosts()]
-        # Para redes /32, hosts() retorna vazio; incluímos o próprio endereço.
-        if not host_ips:
-            host_ips = [str(network.network_address)]
-        return host_ips
+        # Para redes /32 (e /128), a faixa contém o próprio endereço.
+        return HostRange.from_network(network)
     except ValueError:
         # Retorna None para indicar que a string CIDR era inválida
         return None
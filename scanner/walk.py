@@ -0,0 +1,204 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from pysnmp.hlapi.asyncio import (
+    bulk_cmd, ContextData, ObjectType, ObjectIdentity, EndOfMibView, NoSuchInstance, NoSuchObject,
+)
+
+from .credentials import Community, snmp_auth
+from .metrics import STAGE_SECONDS
+from .probes import ENGINE_POOL, SNMP_TIMEOUT, _transport_target
+from .rate_control import SNMP_RTTS, report_loss, report_rtt
+
+SNMP_BULK_REPETITIONS = 10  # Linhas pedidas por GETBULK (cada uma com todas as colunas)
+WALK_CONCURRENCY = 64       # Hosts percorridos ao mesmo tempo numa faixa
+WALK_QUEUE_SIZE = 1024      # Linhas prontas aguardando o consumidor (contrapressão)
+
+_IF_ENTRY = '1.3.6.1.2.1.2.2.1'
+_IFX_ENTRY = '1.3.6.1.2.1.31.1.1.1'
+
+# Colunas da ifTable e da ifXTable (IF-MIB), todas indexadas por ifIndex
+INTERFACE_COLUMNS: Dict[str, str] = {
+    'ifDescr': f'{_IF_ENTRY}.2',
+    'ifType': f'{_IF_ENTRY}.3',
+    'ifMtu': f'{_IF_ENTRY}.4',
+    'ifSpeed': f'{_IF_ENTRY}.5',
+    'ifPhysAddress': f'{_IF_ENTRY}.6',
+    'ifAdminStatus': f'{_IF_ENTRY}.7',
+    'ifOperStatus': f'{_IF_ENTRY}.8',
+    'ifInOctets': f'{_IF_ENTRY}.10',
+    'ifInErrors': f'{_IF_ENTRY}.14',
+    'ifOutOctets': f'{_IF_ENTRY}.16',
+    'ifOutErrors': f'{_IF_ENTRY}.20',
+    'ifName': f'{_IFX_ENTRY}.1',
+    'ifHCInOctets': f'{_IFX_ENTRY}.6',
+    'ifHCOutOctets': f'{_IFX_ENTRY}.10',
+    'ifHighSpeed': f'{_IFX_ENTRY}.15',
+    'ifAlias': f'{_IFX_ENTRY}.18',
+}
+
+# Colunas cujo valor é um endereço físico, formatado como MAC
+_ADDRESS_COLUMNS = {'ifPhysAddress'}
+
+RowValue = Union[int, str]
+Row = Dict[str, RowValue]
+Index = Tuple[int, ...]
+
+
+def _oid_tuple(oid: str) -> Index:
+    return tuple(int(arc) for arc in oid.split('.'))
+
+
+def _row(index: Index, cells: Row, columns: Dict[str, str]) -> Row:
+    """Monta a linha com o índice primeiro e as colunas na ordem da definição."""
+    row: Row = {'index': '.'.join(map(str, index))}
+    row.update((name, cells[name]) for name in columns if name in cells)
+    return row
+
+
+def _convert(column: str, value: object) -> RowValue:
+    if hasattr(value, 'asOctets'):
+        raw = value.asOctets()  # type: ignore[attr-defined]
+        if column in _ADDRESS_COLUMNS:
+            return ':'.join(f'{byte:02X}' for byte in raw)
+        return raw.decode('utf-8', errors='replace')
+    try:
+        return int(value)  # type: ignore[call-overload]
+    except (TypeError, ValueError):
+        return str(value)
+
+
+async def walk_table(ip: str, columns: Dict[str, str], community: Community = 'public',
+                     max_repetitions: int = SNMP_BULK_REPETITIONS) -> AsyncIterator[Row]:
+    """
+    Percorre colunas de uma tabela SNMP com GETBULK e produz cada linha assim
+    que ela fica completa.
+
+    Todas as colunas andam juntas, na mesma PDU: cada GETBULK traz até
+    `max_repetitions` linhas inteiras, em vez de um GETNEXT por célula. Uma
+    linha é entregue quando todas as colunas já passaram do seu índice, então
+    tabelas esparsas (colunas ausentes em algumas linhas) também funcionam.
+    As linhas saem em ordem de índice, com a chave 'index' (ex: '3' ou '1.5').
+
+    Uma comunidade única vai em SNMPv2c (GETBULK não existe no v1); com uma
+    lista de credenciais, vale a credencial aprendida para o host (v2c ou
+    v3; um host que só aceita v1 não produz linhas). Um host que não
+    responde ao primeiro pedido simplesmente não produz linhas.
+    """
+    auth = await snmp_auth(ip, community, '2c')
+    if auth is None or getattr(auth, 'message_processing_model', 1) == 0:
+        return
+    prefixes = {name: _oid_tuple(oid) for name, oid in columns.items()}
+    cursors: Dict[str, Index] = dict(prefixes)
+    active: List[str] = list(columns)
+    rows: Dict[Index, Row] = {}
+    timeout = SNMP_RTTS.timeout_for(ip, SNMP_TIMEOUT)
+
+    with ENGINE_POOL.lease() as snmp_engine:
+        target = await _transport_target(ip, timeout)
+        if target is None:
+            return
+        while active:
+            started = time.monotonic()
+            error_indication, error_status, _, var_binds = await bulk_cmd(
+                snmp_engine, auth, target, ContextData(), 0, max(1, max_repetitions),
+                *[ObjectType(ObjectIdentity('.'.join(map(str, cursors[name])))) for name in active],
+                lookupMib=False,
+            )
+            elapsed = time.monotonic() - started
+            STAGE_SECONDS.observe(elapsed, 'snmp_bulk')
+            if error_indication or error_status:
+                break
+            if elapsed < timeout:
+                report_rtt(SNMP_RTTS, ip, elapsed)
+            else:
+                report_loss()
+            if not var_binds:
+                break
+
+            finished = set()
+            for position, (oid, value) in enumerate(var_binds):
+                name = active[position % len(active)]
+                if name in finished:
+                    continue
+                oid_tuple = tuple(oid)
+                prefix = prefixes[name]
+                if (isinstance(value, (EndOfMibView, NoSuchObject, NoSuchInstance))
+                        or oid_tuple[:len(prefix)] != prefix or oid_tuple <= cursors[name]):
+                    # Saiu da coluna (ou o agente não avançou): coluna encerrada
+                    finished.add(name)
+                    continue
+                index = oid_tuple[len(prefix):]
+                rows.setdefault(index, {})[name] = _convert(name, value)
+                cursors[name] = oid_tuple
+            active = [name for name in active if name not in finished]
+
+            # Linhas abaixo do menor cursor ativo não recebem mais colunas
+            low: Optional[Index] = min(
+                (cursors[name][len(prefixes[name]):] for name in active), default=None)
+            for index in sorted(rows):
+                if low is not None and index >= low:
+                    break
+                yield _row(index, rows.pop(index), columns)
+
+    for index in sorted(rows):
+        yield _row(index, rows[index], columns)
+
+
+async def walk_interfaces(ip: str, community: Community = 'public',
+                          max_repetitions: int = SNMP_BULK_REPETITIONS) -> AsyncIterator[Row]:
+    """Percorre ifTable e ifXTable de um host, uma interface por vez."""
+    async for row in walk_table(ip, INTERFACE_COLUMNS, community, max_repetitions):
+        yield row
+
+
+async def walk_stream(ips: Iterable[str], community: Community,
+                      columns: Optional[Dict[str, str]] = None,
+                      max_repetitions: int = SNMP_BULK_REPETITIONS,
+                      concurrency: int = WALK_CONCURRENCY) -> AsyncIterator[Tuple[str, Row]]:
+    """
+    Percorre a mesma tabela em vários hosts ao mesmo tempo e produz pares
+    (ip, linha) na ordem em que chegam, intercalando os hosts.
+
+    No máximo `concurrency` hosts ficam em andamento; a fila de linhas é
+    limitada, então um consumidor lento segura os walks em vez de acumular
+    tabelas inteiras em memória.
+    """
+    table = columns or INTERFACE_COLUMNS
+    queue: 'asyncio.Queue[Optional[Tuple[str, Row]]]' = asyncio.Queue(WALK_QUEUE_SIZE)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def walk_host(ip: str) -> None:
+        try:
+            async for row in walk_table(ip, table, community, max_repetitions):
+                await queue.put((ip, row))
+        except Exception as e:
+            print(f"Erro ao percorrer a tabela de {ip}: {e}")
+        finally:
+            semaphore.release()
+
+    async def produce() -> None:
+        tasks = set()
+        try:
+            for ip in ips:
+                await semaphore.acquire()
+                task = asyncio.ensure_future(walk_host(ip))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        await queue.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        producer.cancel()
@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import ipaddress
+import os
+import socket
+from typing import Any, Dict, List, Optional
+
+from .cluster import CLUSTER_SECRET_ENV, HEARTBEAT_INTERVAL, registration_proof
+from .credentials import decode_community
+from .discovery import DISCOVERY_TCP_PORTS
+from .dns_resolver import PTR_RESOLVER
+from .engine import MAX_CONCURRENCY, scan_stream
+from .mac_vendor_lookup import MACVendorLookup
+from .probes import ENGINE_POOL
+from .protocol import BadRequest, Frame, ProtocolError, decode_frame, encode_frame, make_frame, ports_field
+from .utils import HostRange
+
+WORKER_CAPACITY = 4        # Shards varridos ao mesmo tempo por trabalhador
+RECONNECT_DELAY = 1.0      # Espera inicial antes de reconectar ao coordenador
+RECONNECT_MAX_DELAY = 30.0
+
+
+class ScanWorker:
+    """
+    Trabalhador remoto: conecta-se ao coordenador (o servidor), registra-se
+    com as redes em que está e varre os shards que receber.
+
+    Usa o mesmo motor do servidor, no segmento L2 do próprio trabalhador,
+    então MAC e fabricante saem da tabela de vizinhos local. Se a conexão
+    cair, os shards em andamento são abandonados (o coordenador os
+    redistribui) e o trabalhador reconecta com espera exponencial.
+    """
+
+    def __init__(self, host: str, port: int, name: str,
+                 networks: List[str], capacity: int = WORKER_CAPACITY, secret: str = ''):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.networks = networks
+        self.capacity = capacity
+        self.secret = secret
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._write_lock = asyncio.Lock()
+        self._shards: Dict[str, 'asyncio.Task[None]'] = {}
+
+    async def send(self, frame: Frame) -> None:
+        assert self._writer is not None
+        async with self._write_lock:
+            self._writer.write(encode_frame(frame))
+            await self._writer.drain()
+
+    async def run(self) -> None:
+        """Mantém o trabalhador conectado ao coordenador, reconectando se preciso."""
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                print(f"[TRABALHADOR] Coordenador {self.host}:{self.port} indisponível ({e}); "
+                      f"nova tentativa em {delay:.0f}s")
+            else:
+                delay = RECONNECT_DELAY
+                try:
+                    await self._serve(reader, writer)
+                except (ConnectionError, ProtocolError) as e:
+                    print(f"[TRABALHADOR] Conexão com o coordenador perdida: {e}")
+                finally:
+                    writer.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _register(self, nonce: Optional[str] = None) -> None:
+        fields: Dict[str, Any] = {'name': self.name, 'networks': self.networks, 'capacity': self.capacity}
+        if nonce is not None:
+            fields['proof'] = registration_proof(self.secret, nonce, self.name)
+        await self.send(make_frame('register', **fields))
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writer = writer
+        await self._register()
+        heartbeat: Optional['asyncio.Task[None]'] = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    print("[TRABALHADOR] Coordenador encerrou a conexão.")
+                    return
+                if not line.strip():
+                    continue
+                frame = decode_frame(line)
+                if frame['type'] == 'challenge':
+                    if not self.secret:
+                        raise ConnectionError(f"o coordenador exige o segredo do cluster ({CLUSTER_SECRET_ENV})")
+                    await self._register(str(frame.get('nonce', '')))
+                elif frame['type'] == 'registered':
+                    interval = float(frame.get('heartbeat', HEARTBEAT_INTERVAL))
+                    print(f"[TRABALHADOR] Registrado como {frame.get('name')} em {self.host}:{self.port}")
+                    heartbeat = asyncio.ensure_future(self._heartbeat(interval))
+                elif frame['type'] == 'shard':
+                    self._start_shard(frame)
+                elif frame['type'] == 'cancel':
+                    task = self._shards.pop(frame.get('id'), None)  # type: ignore[arg-type]
+                    if task is not None:
+                        task.cancel()
+                elif frame['type'] == 'error':
+                    if heartbeat is None:
+                        # Registro recusado (segredo errado, nome em uso): tenta de novo depois
+                        raise ConnectionError(f"registro recusado: {frame.get('message')}")
+                    print(f"[TRABALHADOR] Erro do coordenador: {frame.get('message')}")
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            for task in self._shards.values():
+                task.cancel()
+            self._shards.clear()
+            self._writer = None
+
+    async def _heartbeat(self, interval: float) -> None:
+        while True:
+            await self.send(make_frame('heartbeat', in_flight=len(self._shards)))
+            await asyncio.sleep(interval)
+
+    def _start_shard(self, frame: Frame) -> None:
+        shard_id = str(frame.get('id'))
+        task = asyncio.ensure_future(self._run_shard(shard_id, frame))
+        self._shards[shard_id] = task
+        task.add_done_callback(lambda _: self._shards.pop(shard_id, None))
+
+    async def _run_shard(self, shard_id: str, frame: Frame) -> None:
+        try:
+            first = ipaddress.ip_address(str(frame['first']))
+            last = ipaddress.ip_address(str(frame['last']))
+            shard = HostRange(first.version, int(first), int(last))
+            community = decode_community(frame)
+            concurrency = min(int(frame.get('concurrency', MAX_CONCURRENCY)), MAX_CONCURRENCY)
+            tcp_ports = ports_field(frame, 'tcp_ports', DISCOVERY_TCP_PORTS)
+        except (KeyError, TypeError, ValueError, BadRequest) as e:
+            await self.send(make_frame('error', shard_id, message=f"Shard inválido: {e}"))
+            return
+
+        print(f"[TRABALHADOR] Shard {shard_id}: {shard.size} hosts ({shard})")
+        active = 0
+        stream = scan_stream(shard, community, max(1, concurrency), tcp_ports)
+        try:
+            async for info in stream:
+                active += 1
+                await self.send(make_frame('host', shard_id, host=info))
+        except asyncio.CancelledError:
+            raise
+        except ConnectionError:
+            return
+        except Exception as e:
+            await self.send(make_frame('error', shard_id, message=f"Falha na varredura: {e}"))
+            return
+        finally:
+            await stream.aclose()
+        await self.send(make_frame('done', shard_id, active=active))
+
+
+async def serve(host: str, port: int, name: str, networks: List[str], capacity: int,
+                secret: str = '') -> None:
+    MACVendorLookup.database()
+    try:
+        await ScanWorker(host, port, name, networks, capacity, secret).run()
+    finally:
+        ENGINE_POOL.close()
+        PTR_RESOLVER.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Linha de comando: inicia um trabalhador ligado ao coordenador."""
+    parser = argparse.ArgumentParser(description="Trabalhador de varredura distribuída.")
+    parser.add_argument('--server', default='127.0.0.1', help="Endereço do coordenador. Padrão: 127.0.0.1")
+    parser.add_argument('--port', type=int, default=35640, help="Porta do coordenador. Padrão: 35640")
+    parser.add_argument('--name', default=socket.gethostname(), help="Nome único do trabalhador. Padrão: hostname")
+    parser.add_argument('--network', action='append', default=[],
+                        help="Rede local (CIDR) alcançada por este trabalhador; pode ser repetida")
+    parser.add_argument('--capacity', type=int, default=WORKER_CAPACITY,
+                        help=f"Shards simultâneos. Padrão: {WORKER_CAPACITY}")
+    args = parser.parse_args(argv)
+
+    for cidr in args.network:
+        ipaddress.ip_network(cidr, strict=False)  # Falha cedo com CIDR inválido
+    try:
+        # O segredo vem do ambiente, não da linha de comando (visível em ps)
+        secret = os.environ.get(CLUSTER_SECRET_ENV, '')
+        if not secret:
+            print(f"AVISO: {CLUSTER_SECRET_ENV} não definida; o coordenador recusará o registro.")
+        asyncio.run(serve(args.server, args.port, args.name, args.network, args.capacity, secret))
+    except KeyboardInterrupt:
+        print("Trabalhador interrompido pelo usuário.")
+
+
+if __name__ == '__main__':
+    main()
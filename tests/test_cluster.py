@@ -0,0 +1,325 @@
+import asyncio
+import ipaddress
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pytest
+
+from scanner import cluster, session, worker
+from scanner.cluster import Cluster, ClusterError, registration_proof
+from scanner.protocol import Frame
+from scanner.session import ClientSession
+from scanner.utils import HostRange, parse_cidr
+from scanner.worker import ScanWorker
+
+SECRET = 's3cr3t'
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _InProcessWorker:
+    """
+    Trabalhador no mesmo processo: recebe os quadros do coordenador como a
+    sessão NDJSON receberia e responde pelos handlers do RemoteWorker,
+    "encontrando" os endereços pares de cada shard.
+    """
+
+    def __init__(self, fail_shards: int = 0) -> None:
+        self.writer = _Writer()
+        self.frames: List[Frame] = []
+        self.fail_shards = fail_shards
+        self.remote: Optional[cluster.RemoteWorker] = None
+        self._tasks: List['asyncio.Task[None]'] = []
+
+    async def send(self, frame: Frame) -> None:
+        self.frames.append(frame)
+        if frame['type'] == 'shard':
+            self._tasks.append(asyncio.ensure_future(self._scan(frame)))
+
+    async def _scan(self, frame: Frame) -> None:
+        await asyncio.sleep(0)
+        assert self.remote is not None
+        handlers = self.remote.handlers
+        if self.fail_shards:
+            self.fail_shards -= 1
+            await handlers['error']({'type': 'error', 'id': frame['id'], 'message': 'falha simulada'})
+            return
+        first = int(ipaddress.ip_address(frame['first']))
+        last = int(ipaddress.ip_address(frame['last']))
+        for value in range(first, last + 1):
+            if value % 2 == 0:
+                host = {'ip': str(ipaddress.ip_address(value))}
+                await handlers['host']({'type': 'host', 'id': frame['id'], 'host': host})
+        await handlers['done']({'type': 'done', 'id': frame['id']})
+
+    @property
+    def shards(self) -> List[Frame]:
+        return [frame for frame in self.frames if frame['type'] == 'shard']
+
+
+def _register(coordinator: Cluster, name: str, networks: Sequence[str] = (), capacity: int = 2,
+              session: Optional[_InProcessWorker] = None, secret: str = SECRET) -> _InProcessWorker:
+    session = session or _InProcessWorker()
+    nonce = coordinator.challenge()
+    frame = {'type': 'register', 'name': name, 'networks': list(networks), 'capacity': capacity,
+             'proof': registration_proof(secret, nonce, name)}
+    session.remote = coordinator.register(session, frame, nonce)
+    return session
+
+
+async def _collect(coordinator: Cluster, cidr: str, size: int = 64) -> List[Any]:
+    shards = coordinator.shards(parse_cidr(cidr), size)
+    return [host async for host in coordinator.stream(shards, 'public')]
+
+
+def _even_hosts(cidr: str) -> List[str]:
+    return [ip for ip in parse_cidr(cidr) if int(ipaddress.ip_address(ip)) % 2 == 0]
+
+
+def test_register_requires_secret_and_valid_proof():
+    async def main():
+        with pytest.raises(ValueError, match='desativado'):
+            _register(Cluster(None), 'w1')
+        coordinator = Cluster(SECRET)
+        with pytest.raises(ValueError, match='prova'):
+            _register(coordinator, 'w1', secret='outro')
+        # Prova de outro nonce não serve
+        nonce = coordinator.challenge()
+        frame = {'name': 'w1', 'proof': registration_proof(SECRET, coordinator.challenge(), 'w1')}
+        with pytest.raises(ValueError, match='prova'):
+            coordinator.register(_InProcessWorker(), frame, nonce)
+        assert not coordinator.workers
+
+    asyncio.run(main())
+
+
+def test_duplicate_name_keeps_first_worker():
+    async def main():
+        coordinator = Cluster(SECRET)
+        first = _register(coordinator, 'w1')
+        with pytest.raises(ValueError, match='já existe'):
+            _register(coordinator, 'w1')
+        assert coordinator.workers['w1'].session is first
+
+    asyncio.run(main())
+
+
+def test_stream_distributes_every_shard_once():
+    async def main():
+        coordinator = Cluster(SECRET)
+        workers = [_register(coordinator, f'w{i}') for i in range(3)]
+        hosts = await _collect(coordinator, '10.0.0.0/22')
+        return workers, hosts
+
+    workers, hosts = asyncio.run(main())
+    assert sorted(host['ip'] for host in hosts) == sorted(_even_hosts('10.0.0.0/22'))
+    assert sum(len(worker.shards) for worker in workers) == 16
+    assert all(worker.shards for worker in workers)
+
+
+def test_shards_prefer_worker_on_their_network():
+    async def main():
+        coordinator = Cluster(SECRET)
+        local = _register(coordinator, 'local', ['10.0.0.0/24'], capacity=8)
+        remote = _register(coordinator, 'remote', ['192.0.2.0/24'], capacity=8)
+        await _collect(coordinator, '10.0.0.0/24')
+        return local, remote
+
+    local, remote = asyncio.run(main())
+    assert len(local.shards) == 4
+    assert not remote.shards
+
+
+def test_failed_shard_is_retried_on_another_worker():
+    async def main():
+        coordinator = Cluster(SECRET)
+        flaky = _register(coordinator, 'flaky', capacity=1, session=_InProcessWorker(fail_shards=1))
+        steady = _register(coordinator, 'steady', capacity=1)
+        hosts = await _collect(coordinator, '10.0.0.0/24')
+        return flaky, steady, hosts
+
+    flaky, steady, hosts = asyncio.run(main())
+    assert sorted(host['ip'] for host in hosts) == sorted(_even_hosts('10.0.0.0/24'))
+    assert len(flaky.shards) + len(steady.shards) == 5  # 4 shards + 1 repetição
+
+
+def test_shard_failing_everywhere_aborts_scan():
+    async def main():
+        coordinator = Cluster(SECRET)
+        _register(coordinator, 'broken', session=_InProcessWorker(fail_shards=cluster.SHARD_MAX_ATTEMPTS))
+        await _collect(coordinator, '10.0.0.0/26')
+
+    with pytest.raises(ClusterError):
+        asyncio.run(main())
+
+
+def test_lost_worker_returns_its_shards():
+    async def main():
+        coordinator = Cluster(SECRET)
+        lost = _register(coordinator, 'lost', ['10.0.0.0/24'], capacity=4)
+        lost.send = _swallow(lost)  # Recebe shards e nunca responde
+        steady = _register(coordinator, 'steady', capacity=4)
+        collector = asyncio.ensure_future(_collect(coordinator, '10.0.0.0/24'))
+        await asyncio.sleep(0.05)
+        coordinator.unregister(lost.remote, 'conexão perdida')
+        hosts = await asyncio.wait_for(collector, 5)
+        return steady, hosts
+
+    steady, hosts = asyncio.run(main())
+    assert sorted(host['ip'] for host in hosts) == sorted(_even_hosts('10.0.0.0/24'))
+    assert len(steady.shards) == 4
+
+
+def _swallow(session: _InProcessWorker):
+    async def send(frame: Frame) -> None:
+        session.frames.append(frame)
+    return send
+
+
+# --- Trabalhadores reais (scanner.worker) sobre TCP em loopback ---
+
+class _Loopback:
+    """Coordenador real (ClientSession) em 127.0.0.1, com um Cluster próprio."""
+
+    def __init__(self, coordinator: Cluster) -> None:
+        self.coordinator = coordinator
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.workers: List['asyncio.Task[None]'] = []
+
+    async def __aenter__(self) -> '_Loopback':
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                await ClientSession(reader, writer, writer.get_extra_info('peername')).run()
+            finally:
+                writer.close()
+
+        self.server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        assert self.server is not None
+        self.server.close()
+        await self.server.wait_closed()
+
+    def start(self, name: str, networks: Sequence[str] = (), capacity: int = 4,
+              secret: str = SECRET) -> Tuple[ScanWorker, 'asyncio.Task[None]']:
+        assert self.server is not None
+        port = self.server.sockets[0].getsockname()[1]
+        scan_worker = ScanWorker('127.0.0.1', port, name, list(networks), capacity, secret)
+        task = asyncio.ensure_future(scan_worker.run())
+        self.workers.append(task)
+        return scan_worker, task
+
+    async def until(self, predicate: Callable[[], bool], timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            assert time.monotonic() < deadline, "condição não atingida a tempo"
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def loopback(monkeypatch):
+    coordinator = Cluster(SECRET)
+    monkeypatch.setattr(session, 'CLUSTER', coordinator)
+    # Heartbeats curtos para o teste não esperar os 15 s do reaper
+    monkeypatch.setattr(cluster, 'HEARTBEAT_INTERVAL', 0.05)
+    monkeypatch.setattr(cluster, 'HEARTBEAT_TIMEOUT', 0.3)
+    monkeypatch.setattr(session, 'HEARTBEAT_INTERVAL', 0.05)
+    return coordinator
+
+
+def _fake_scan(monkeypatch, hang_first_attempt: bool = False, delay: float = 0.0) -> Dict[int, int]:
+    """
+    Troca o motor do trabalhador por um que "encontra" os endereços pares do
+    shard. Com `hang_first_attempt`, a primeira tentativa de cada shard entrega
+    a primeira metade e trava; as seguintes terminam.
+    """
+    attempts: Dict[int, int] = {}
+
+    async def scan_stream(shard: HostRange, community: Any, concurrency: int, tcp_ports: Any):
+        attempts[shard.first] = attempts.get(shard.first, 0) + 1
+        first_attempt = attempts[shard.first] == 1
+        for value in range(shard.first, shard.last + 1):
+            if hang_first_attempt and first_attempt and value > (shard.first + shard.last) // 2:
+                await asyncio.Event().wait()
+            if value % 2 == 0:
+                await asyncio.sleep(delay)
+                yield {'ip': str(shard.address(value))}
+
+    monkeypatch.setattr(worker, 'scan_stream', scan_stream)
+    return attempts
+
+
+def test_loopback_handshake_and_heartbeat(loopback):
+    async def main():
+        async with _Loopback(loopback) as net:
+            net.start('intruso', secret='outro')
+            live, _ = net.start('vivo')
+            frozen, _ = net.start('congelado')
+            frozen._heartbeat = lambda interval: asyncio.sleep(3600)  # type: ignore[assignment]
+            await net.until(lambda: {'vivo', 'congelado'} <= set(loopback.workers))
+            registered_at = loopback.workers['vivo'].last_heartbeat
+
+            # Sem heartbeat, o reaper derruba só o trabalhador congelado
+            await net.until(lambda: 'congelado' not in loopback.workers)
+            assert 'intruso' not in loopback.workers
+            assert 'vivo' in loopback.workers
+            assert loopback.workers['vivo'].last_heartbeat > registered_at
+
+    asyncio.run(main())
+
+
+def test_loopback_killed_worker_shards_are_reassigned(loopback, monkeypatch):
+    attempts = _fake_scan(monkeypatch, hang_first_attempt=True)
+
+    async def main():
+        async with _Loopback(loopback) as net:
+            # Shards em 10.0.0.0/24 vão todos para o trabalhador local
+            _, local = net.start('local', ['10.0.0.0/24'])
+            net.start('remoto')
+            await net.until(lambda: {'local', 'remoto'} <= set(loopback.workers))
+            collector = asyncio.ensure_future(_collect(loopback, '10.0.0.0/24'))
+            await net.until(lambda: len(attempts) == 4)
+            local.cancel()  # Derruba o trabalhador no meio dos shards
+            return await asyncio.wait_for(collector, 5)
+
+    hosts = asyncio.run(main())
+    ips = [host['ip'] for host in hosts]
+    assert sorted(ips) == sorted(_even_hosts('10.0.0.0/24'))  # Sem repetir hosts já entregues
+    assert sorted(attempts.values()) == [2, 2, 2, 2]
+    assert 'local' not in loopback.workers
+
+
+def test_loopback_slow_consumer_backpressures_worker(loopback, monkeypatch):
+    monkeypatch.setattr(cluster, 'CLUSTER_EVENT_QUEUE_SIZE', 4)
+    _fake_scan(monkeypatch)
+
+    async def main():
+        async with _Loopback(loopback) as net:
+            net.start('w1', capacity=1)
+            await net.until(lambda: 'w1' in loopback.workers)
+            remote = loopback.workers['w1']
+            hosts = []
+            stream = loopback.stream(loopback.shards(parse_cidr('10.0.0.0/24'), 64), 'public')
+            async for host in stream:
+                hosts.append(host)
+                if len(hosts) == 1:
+                    # Consumidor parado além do HEARTBEAT_TIMEOUT: a sessão
+                    # fica presa no put, mas o trabalhador não é derrubado
+                    await net.until(lambda: remote.blocked)
+                    await asyncio.sleep(0.6)
+                    assert loopback.workers.get('w1') is remote
+                    assert remote.blocked
+            return hosts
+
+    hosts = asyncio.run(main())
+    assert sorted(host['ip'] for host in hosts) == sorted(_even_hosts('10.0.0.0/24'))
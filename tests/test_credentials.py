@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from scanner import credentials, timeseries
+from scanner.cache import ENRICHMENT_CACHE
+from scanner.credentials import Credential, parse_credentials, snmp_auth
+from scanner.timeseries import TS_METRICS, SnmpPoller, TimeSeriesStore
+from scanner.utils import parse_cidr
+
+IP = '192.0.2.7'
+CREDENTIALS = parse_credentials(['public', {'version': '3', 'user': 'poller', 'auth_key': 'k' * 8}])
+
+
+@pytest.fixture
+def cache():
+    ENRICHMENT_CACHE.credential.invalidate(IP)
+    yield ENRICHMENT_CACHE.credential
+    ENRICHMENT_CACHE.credential.invalidate(IP)
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    calls = []
+
+    async def probe_snmp_credentials(ip, candidates):
+        calls.append(ip)
+        return None
+
+    monkeypatch.setattr(credentials, 'probe_snmp_credentials', probe_snmp_credentials)
+    return calls
+
+
+@pytest.mark.parametrize('version,mp_model', [('1', 0), ('2c', 1)])
+def test_single_community_uses_requested_version(version, mp_model, probes):
+    auth = asyncio.run(snmp_auth(IP, 'public', version))
+    assert (auth.communityName, auth.message_processing_model) == ('public', mp_model)
+    assert probes == []
+
+
+def test_credentials_use_cached_winner(cache, probes):
+    cache.set(IP, CREDENTIALS[-1])
+    auth = asyncio.run(snmp_auth(IP, CREDENTIALS))
+    assert type(auth).__name__ == 'UsmUserData' and auth.userName == 'poller'
+    assert probes == []
+
+
+def test_cached_credential_outside_the_list_is_not_used(cache, probes):
+    cache.set(IP, Credential('2c', 'private'))
+    assert asyncio.run(snmp_auth(IP, CREDENTIALS)) is None
+    assert probes == [IP]
+
+
+def test_poller_collects_with_learned_credential(cache, tmp_path, monkeypatch):
+    cache.set(IP, CREDENTIALS[0])  # v2c "public"
+    seen = []
+
+    async def snmp_get_many(ip, oids, community='public', auth=None):
+        seen.append((community, auth.message_processing_model))
+        return {oid: '42' for _, oid in TS_METRICS}
+
+    monkeypatch.setattr(timeseries, 'snmp_get_many', snmp_get_many)
+    store = TimeSeriesStore(str(tmp_path))
+    poller = SnmpPoller(parse_cidr(f'{IP}/32'), CREDENTIALS, store=store)
+    assert asyncio.run(poller.run_cycle(1_000)) == (1, 1)
+    store.close()
+    assert seen == [('public', 1)]  # Comunidade da credencial, em v2c
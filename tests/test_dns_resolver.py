@@ -0,0 +1,190 @@
+import asyncio
+import struct
+from typing import List, Optional, Set
+
+from scanner import dns_resolver
+from scanner.dns_resolver import AsyncPTRResolver, build_ptr_query, parse_ptr_response, read_question
+
+_RCODE_NXDOMAIN = 3
+_RCODE_SERVFAIL = 2
+
+
+def _encode_name(name: str) -> bytes:
+    return b''.join(bytes([len(label)]) + label.encode('ascii') for label in name.split('.')) + b'\x00'
+
+
+def _answer(query: bytes, name: Optional[str], rcode: int = 0) -> bytes:
+    """Resposta a `query` com um PTR (comprimido, apontando para a pergunta)."""
+    txid = struct.unpack_from('!H', query)[0]
+    question = query[12:]
+    answers = b''
+    if name is not None:
+        rdata = _encode_name(name)
+        answers = b'\xc0\x0c' + struct.pack('!HHIH', 12, 1, 60, len(rdata)) + rdata
+    header = struct.pack('!HHHHHH', txid, 0x8180 | rcode, 1, 1 if name is not None else 0, 0, 0)
+    return header + question + answers
+
+
+def _ptr_name(ip: str) -> str:
+    return 'host-' + ip.replace('.', '-') + '.example'
+
+
+class _StubNameserver(asyncio.DatagramProtocol):
+    """
+    Servidor de nomes falso: responde PTR com um nome derivado do IP, e antes
+    envia uma resposta forjada (mesmo txid, outra pergunta) se `spoof`.
+    """
+
+    def __init__(self, spoof: bool = False, rcode: int = 0, silent: bool = False, delay: float = 0.0):
+        self.spoof = spoof
+        self.rcode = rcode
+        self.silent = silent
+        self.delay = delay
+        self.queries = 0
+        self.waiting = 0
+        self.peak = 0
+        self.ports: Set[int] = set()
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport) -> None:  # type: ignore[override]
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.queries += 1
+        self.ports.add(addr[1])
+        if self.silent:
+            return
+        _, name, _ = read_question(data)
+        ip = '.'.join(reversed(name.split('.')[:4]))
+        if self.spoof:
+            forged = build_ptr_query(struct.unpack_from('!H', data)[0], '10.9.9.9')
+            self.transport.sendto(_answer(forged, 'evil.example'), addr)
+        answer = _answer(data, None, self.rcode) if self.rcode else _answer(data, _ptr_name(ip))
+        if not self.delay:
+            self.transport.sendto(answer, addr)
+            return
+        # Responde depois de `delay`, contando as perguntas ainda sem resposta
+        self.waiting += 1
+        self.peak = max(self.peak, self.waiting)
+        asyncio.get_running_loop().call_later(self.delay, self._reply, answer, addr)
+
+    def _reply(self, answer: bytes, addr) -> None:
+        self.waiting -= 1
+        self.transport.sendto(answer, addr)
+
+
+async def _with_stubs(stubs: List[_StubNameserver], body):
+    loop = asyncio.get_running_loop()
+    transports = []
+    servers = []
+    try:
+        for stub in stubs:
+            transport, _ = await loop.create_datagram_endpoint(lambda stub=stub: stub, local_addr=('127.0.0.1', 0))
+            transports.append(transport)
+            servers.append(('127.0.0.1', transport.get_extra_info('sockname')[1]))
+        resolver = AsyncPTRResolver(servers, timeout=0.3, attempts=2, hosts={})
+        try:
+            return await body(resolver)
+        finally:
+            resolver.close()
+    finally:
+        for transport in transports:
+            transport.close()
+
+
+def test_parse_ptr_response_roundtrip():
+    query = build_ptr_query(0x1234, '192.0.2.10')
+    assert read_question(query) == (0x1234, '10.2.0.192.in-addr.arpa', 12)
+    assert parse_ptr_response(_answer(query, 'router.example')) == (0x1234, 0, 'router.example')
+    assert parse_ptr_response(_answer(query, None, _RCODE_NXDOMAIN)) == (0x1234, _RCODE_NXDOMAIN, None)
+
+
+def test_resolves_many_in_pipeline():
+    stub = _StubNameserver()
+    ips = [f'10.0.{i // 256}.{i % 256}' for i in range(300)]
+
+    async def body(resolver):
+        return await asyncio.gather(*(resolver.resolve(ip) for ip in ips))
+
+    assert asyncio.run(_with_stubs([stub], body)) == [_ptr_name(ip) for ip in ips]
+    assert stub.queries == len(ips)
+
+
+def test_ignores_answers_to_another_question():
+    stub = _StubNameserver(spoof=True)
+
+    async def body(resolver):
+        return await asyncio.gather(*(resolver.resolve(f'10.0.0.{i}') for i in range(1, 50)))
+
+    assert asyncio.run(_with_stubs([stub], body)) == [_ptr_name(f'10.0.0.{i}') for i in range(1, 50)]
+
+
+def test_nxdomain_is_negative_answer():
+    stub = _StubNameserver(rcode=_RCODE_NXDOMAIN)
+
+    async def body(resolver):
+        return await resolver.resolve('10.0.0.1')
+
+    assert asyncio.run(_with_stubs([stub], body)) is None
+    assert stub.queries == 1  # Sem repetir em outro servidor
+
+
+def test_falls_over_to_next_server():
+    silent, failing, good = _StubNameserver(silent=True), _StubNameserver(rcode=_RCODE_SERVFAIL), _StubNameserver()
+
+    async def body(resolver):
+        resolver.attempts = 3
+        return await resolver.resolve('10.0.0.1')
+
+    assert asyncio.run(_with_stubs([silent, failing, good], body)) == _ptr_name('10.0.0.1')
+    assert (silent.queries, failing.queries, good.queries) == (1, 1, 1)
+
+
+def test_rotates_source_port(monkeypatch):
+    monkeypatch.setattr(dns_resolver, 'DNS_SOCKET_QUERIES', 10)
+    stub = _StubNameserver()
+
+    async def body(resolver):
+        for i in range(40):
+            assert await resolver.resolve(f'10.0.0.{i}') == _ptr_name(f'10.0.0.{i}')
+
+    asyncio.run(_with_stubs([stub], body))
+    assert len(stub.ports) == 4
+
+
+def test_scan_limiter_caps_queries_in_flight():
+    stub = _StubNameserver(delay=0.02)
+
+    async def body(resolver):
+        limiter = resolver.new_scan_limiter(5)
+        scan = [resolver.resolve(f'10.0.0.{i}', limiter) for i in range(40)]
+        # Outra varredura, sem limitador próprio, não espera pelas vagas da primeira
+        other = [resolver.resolve(f'10.0.1.{i}') for i in range(10)]
+        return await asyncio.gather(*scan, *other)
+
+    names = asyncio.run(_with_stubs([stub], body))
+    assert names == [_ptr_name(f'10.0.0.{i}') for i in range(40)] + [_ptr_name(f'10.0.1.{i}') for i in range(10)]
+    assert stub.peak == 5 + 10
+
+
+def test_hosts_file_answers_locally():
+    resolver = AsyncPTRResolver([('127.0.0.1', 9)], hosts={'10.0.0.1': 'local.example'})
+    assert asyncio.run(resolver.resolve('10.0.0.1')) == 'local.example'
+
+
+def test_same_resolver_across_event_loops():
+    # Como PTR_RESOLVER: um objeto só, usado em asyncio.run sucessivos
+    resolver = AsyncPTRResolver([], timeout=0.3, hosts={})
+
+    async def run_once():
+        stub = _StubNameserver()
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: stub, local_addr=('127.0.0.1', 0))
+        resolver.nameservers = [('127.0.0.1', transport.get_extra_info('sockname')[1])]
+        try:
+            # Sem close(): os sockets do loop anterior não podem ser reaproveitados
+            return await resolver.resolve('10.0.0.1')
+        finally:
+            transport.close()
+
+    assert [asyncio.run(run_once()) for _ in range(2)] == [_ptr_name('10.0.0.1')] * 2
@@ -0,0 +1,30 @@
+import pytest
+
+from scanner.mac_vendor_lookup import MACVendorLookup
+
+
+@pytest.fixture
+def lookup(tmp_path, monkeypatch):
+    monkeypatch.setattr(MACVendorLookup, 'INDEX_PATH', str(tmp_path / 'missing.idx'))
+    monkeypatch.setattr(MACVendorLookup, '_database', None)
+    monkeypatch.setattr(MACVendorLookup, '_database_loaded', False)
+    return MACVendorLookup
+
+
+def test_missing_index_warns_once(lookup, capsys):
+    assert lookup.database() is None
+    assert lookup.database() is None
+    warnings = capsys.readouterr().out.splitlines()
+    assert len(warnings) == 1
+    assert warnings[0].startswith('AVISO: ')
+    assert 'python -m scanner.oui_db build' in warnings[0]
+
+
+@pytest.mark.parametrize('mac,vendor', [
+    ('00:50:56:12:34:56', 'VMware'),
+    ('b8-27-eb-00-00-01', 'Raspberry Pi'),
+    ('12:34:56:78:9a:bc', 'Unknown'),
+    ('', 'Unknown'),
+])
+def test_local_table_without_index(lookup, mac, vendor):
+    assert lookup.get_vendor(mac) == vendor
@@ -0,0 +1,153 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+
+import pytest
+
+from scanner import monitor
+from scanner.cache import ENRICHMENT_CACHE
+from scanner.credentials import parse_credentials
+from scanner.monitor import Monitor
+from scanner.utils import parse_cidr
+
+SYS_NAME = 'Nome SNMP'
+
+
+class _Network:
+    """Rede falsa: quem responde ao ICMP, os sysNames e os MACs da tabela ARP."""
+
+    def __init__(self) -> None:
+        self.icmp: Set[str] = set()
+        self.sys_names: Dict[str, str] = {}
+        self.macs: Dict[str, str] = {}
+        self.scanned: list = []
+        self.auths: list = []
+
+    async def sweep(self, host_range) -> Set[str]:
+        return {ip for ip in host_range if ip in self.icmp}
+
+    async def probe_snmp(self, ip: str, community: str = 'public', auth=None):
+        self.auths.append(auth)
+        name = self.sys_names.get(ip)
+        return ('snmp', name) if name is not None else None
+
+    async def scan_stream(self, ips: Iterable[str], community: str = 'public'):
+        for ip in ips:
+            if ip in self.icmp or ip in self.sys_names:
+                self.scanned.append(ip)
+                snmp_info = {SYS_NAME: self.sys_names[ip]} if ip in self.sys_names else None
+                yield {'ip': ip, 'name': None, 'mac': self.macs.get(ip), 'vendor': None,
+                       'snmp_info': snmp_info}
+
+    def lookup(self, ip: str) -> Optional[str]:
+        return self.macs.get(ip)
+
+
+@pytest.fixture
+def network(monkeypatch):
+    fake = _Network()
+
+    class _Sweep:
+        async def sweep(self, host_range):
+            return await fake.sweep(host_range)
+
+    class _Neighbors:
+        def refresh(self) -> int:
+            return 0
+
+        lookup = staticmethod(fake.lookup)
+
+    monkeypatch.setattr(monitor, 'IcmpSweep', _Sweep)
+    monkeypatch.setattr(monitor, 'probe_snmp', fake.probe_snmp)
+    monkeypatch.setattr(monitor, 'scan_stream', fake.scan_stream)
+    monkeypatch.setattr(monitor, 'NEIGHBOR_TABLE', _Neighbors())
+    return fake
+
+
+def _run(mon: Monitor):
+    return asyncio.run(mon.run_cycle())
+
+
+def test_first_cycle_reports_up(network):
+    network.icmp = {'192.0.2.1'}
+    network.sys_names = {'192.0.2.2': 'switch'}
+    events = _run(Monitor(parse_cidr('192.0.2.0/29'), full_rescan_every=10))
+    assert sorted((event['event'], event['ip']) for event in events) == [
+        ('up', '192.0.2.1'), ('up', '192.0.2.2')]
+
+
+def test_light_cycle_reports_sys_name_change_of_quiet_host(network):
+    network.sys_names = {'192.0.2.2': 'switch'}
+    mon = Monitor(parse_cidr('192.0.2.0/29'), full_rescan_every=10)
+    _run(mon)
+
+    network.sys_names['192.0.2.2'] = 'switch-renamed'
+    network.scanned.clear()
+    events = _run(mon)
+    assert events == [{'event': 'changed', 'ip': '192.0.2.2', 'field': 'sysName',
+                       'old': 'switch', 'new': 'switch-renamed'}]
+    assert network.scanned == []  # Só o GET de sysName, sem varredura completa
+    assert mon.hosts['192.0.2.2'].snmp_info == {SYS_NAME: 'switch-renamed'}
+
+    # Mesmo nome no ciclo seguinte: nada a relatar
+    assert _run(mon) == []
+
+
+def test_light_cycle_down_after_misses(network):
+    network.icmp = {'192.0.2.1'}
+    mon = Monitor(parse_cidr('192.0.2.0/29'), full_rescan_every=10, down_after=2)
+    _run(mon)
+
+    network.icmp = set()
+    assert _run(mon) == []
+    assert _run(mon) == [{'event': 'down', 'ip': '192.0.2.1'}]
+
+
+def test_light_cycle_rescans_moved_mac(network):
+    network.icmp = {'192.0.2.1'}
+    network.macs = {'192.0.2.1': '52:54:00:00:00:01'}
+    mon = Monitor(parse_cidr('192.0.2.0/29'), full_rescan_every=10)
+    _run(mon)
+
+    network.macs['192.0.2.1'] = '52:54:00:00:00:02'
+    network.scanned.clear()
+    events = _run(mon)
+    assert network.scanned == ['192.0.2.1']
+    assert events == [{'event': 'changed', 'ip': '192.0.2.1', 'field': 'mac',
+                       'old': '52:54:00:00:00:01', 'new': '52:54:00:00:00:02'}]
+
+
+def test_stalled_subscriber_is_disconnected(network, monkeypatch):
+    monkeypatch.setattr(monitor, 'SUBSCRIBER_STALL_TIMEOUT', 0.01)
+    mon = Monitor(parse_cidr('192.0.2.0/29'), full_rescan_every=10)
+
+    async def main():
+        mon._task = asyncio.get_running_loop().create_future()  # Sem ciclos automáticos
+        stalled = monitor.MonitorSubscription(maxsize=2)
+        reader = mon.subscribe()
+        mon._subscribers.add(stalled)
+        for cycle in range(1, 4):
+            await mon._publish(('diff', cycle, []))
+            assert (await reader.get())[1] == cycle
+        return stalled
+
+    stalled = asyncio.run(main())
+    # Os ciclos pendentes são descartados; só o erro fica na fila
+    event = stalled._queue.get_nowait()
+    assert event[0] == 'error' and 'monitoramento' in event[1]
+    assert stalled._queue.empty()
+    assert mon.subscribers == 1
+
+
+def test_light_cycle_uses_cached_credential(network, monkeypatch):
+    credentials = parse_credentials(['public', {'version': '3', 'user': 'monitor', 'auth_key': 'k' * 8}])
+    network.sys_names = {'192.0.2.2': 'switch'}
+    mon = Monitor(parse_cidr('192.0.2.0/29'), credentials, full_rescan_every=10)
+    _run(mon)
+
+    ENRICHMENT_CACHE.credential.set('192.0.2.2', credentials[-1])
+    try:
+        assert _run(mon) == []
+    finally:
+        ENRICHMENT_CACHE.credential.invalidate('192.0.2.2')
+    # O GET de sysName usa a credencial v3 aprendida, não uma comunidade v1
+    assert [type(auth).__name__ for auth in network.auths] == ['UsmUserData']
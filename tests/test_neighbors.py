@@ -0,0 +1,101 @@
+import asyncio
+import os
+import shutil
+
+from scanner import neighbors
+from scanner.neighbors import NeighborTable, parse_arp_table
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'data', 'proc_net_arp.txt')
+
+EXPECTED = {
+    '192.0.2.1': '52:54:00:ab:cd:01',
+    '192.0.2.20': '02:42:ac:11:00:14',
+    '10.1.0.5': 'aa:bb:cc:dd:ee:ff',
+}
+
+
+def _read_fixture() -> str:
+    with open(FIXTURE, encoding='ascii') as f:
+        return f.read()
+
+
+def test_parse_arp_table_keeps_only_complete_entries():
+    # Incompletas, sem MAC, com flags inválidas e linhas curtas ficam de fora
+    assert parse_arp_table(_read_fixture()) == EXPECTED
+
+
+def test_parse_arp_table_ignores_header_only():
+    assert parse_arp_table(_read_fixture().splitlines()[0]) == {}
+
+
+def test_lookup_reads_table_once(tmp_path):
+    path = tmp_path / 'arp'
+    shutil.copy(FIXTURE, path)
+    table = NeighborTable(str(path), max_age=60, miss_refresh=60)
+
+    assert table.lookup('192.0.2.1') == '52:54:00:ab:cd:01'
+    assert table.lookup('10.1.0.5') == 'aa:bb:cc:dd:ee:ff'
+    # Miss dentro de miss_refresh: responde do snapshot, sem reler
+    assert table.lookup('192.0.2.7') is None
+    assert table.refreshes == 1
+    assert len(table) == len(EXPECTED)
+
+
+def test_refresh_applies_differences(tmp_path):
+    path = tmp_path / 'arp'
+    shutil.copy(FIXTURE, path)
+    table = NeighborTable(str(path))
+    assert table.refresh() == len(EXPECTED)
+
+    lines = _read_fixture().splitlines()
+    lines = [line for line in lines if not line.startswith('10.1.0.5')]
+    lines.append('192.0.2.1        0x1         0x2         52:54:00:ab:cd:99     *        eth0')
+    path.write_text('\n'.join(lines) + '\n', encoding='ascii')
+
+    # Uma entrada removida e uma alterada
+    assert table.refresh() == 2
+    assert table.lookup('192.0.2.1') == '52:54:00:ab:cd:99'
+    assert table.lookup('10.1.0.5') is None
+
+
+def test_miss_refreshes_after_interval(tmp_path):
+    path = tmp_path / 'arp'
+    path.write_text(_read_fixture().splitlines()[0] + '\n', encoding='ascii')
+    table = NeighborTable(str(path), max_age=60, miss_refresh=0)
+    assert table.lookup('192.0.2.1') is None
+
+    shutil.copy(FIXTURE, path)
+    assert table.lookup('192.0.2.1') == '52:54:00:ab:cd:01'
+
+
+def test_resolve_without_table_falls_back_to_getmac(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_get_mac_address(ip):
+        calls.append(ip)
+        return '11:22:33:44:55:66'
+
+    monkeypatch.setattr(neighbors, 'get_mac_address', fake_get_mac_address)
+    table = NeighborTable(str(tmp_path / 'missing'))
+
+    assert asyncio.run(table.resolve('192.0.2.1')) == '11:22:33:44:55:66'
+    assert not table.available
+    assert calls == ['192.0.2.1']
+
+
+def test_resolve_with_table_uses_getmac_only_on_miss(monkeypatch):
+    calls = []
+
+    def fake_get_mac_address(ip):
+        calls.append(ip)
+        return '11:22:33:44:55:66' if ip == '192.0.2.99' else None
+
+    monkeypatch.setattr(neighbors, 'get_mac_address', fake_get_mac_address)
+    table = NeighborTable(FIXTURE)
+
+    assert asyncio.run(table.resolve('192.0.2.20')) == '02:42:ac:11:00:14'
+    assert calls == []
+    # Ausente da tabela (ex: o IP do próprio servidor): consulta individual
+    assert asyncio.run(table.resolve('192.0.2.99')) == '11:22:33:44:55:66'
+    assert asyncio.run(table.resolve('198.51.100.1')) is None
+    assert calls == ['192.0.2.99', '198.51.100.1']
@@ -0,0 +1,82 @@
+import io
+
+import pytest
+
+from scanner.oui_db import OUIDatabase, build_index, mac_to_int, main, parse_registry_csv
+
+# Um prefixo de cada tamanho aninhados no mesmo bloco MA-L, mais um MA-L isolado
+REGISTRY_CSV = '''Registry,Assignment,Organization Name,Organization Address
+MA-L,001B63,Large Vendor,"Rua A, 1"
+MA-M,001B63A,Medium Vendor,Rua B
+MA-S,001B63A12,Small Vendor,Rua C
+MA-L,B827EB,"Raspberry Pi Foundation",Rua D
+MA-L,ZZZZZZ,Prefixo inválido,
+MA-M,001B63,Tamanho errado,
+IAB,0050C2123,Registro ignorado,
+MA-L,FCFBFB,,
+'''
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'oui.idx')
+    assert build_index(parse_registry_csv(io.StringIO(REGISTRY_CSV)), path) == 4
+    db = OUIDatabase(path)
+    yield db
+    db.close()
+
+
+def test_parse_registry_csv_skips_invalid_rows():
+    assert list(parse_registry_csv(io.StringIO(REGISTRY_CSV))) == [
+        (24, 0x001B63, 'Large Vendor'),
+        (28, 0x001B63A, 'Medium Vendor'),
+        (36, 0x001B63A12, 'Small Vendor'),
+        (24, 0xB827EB, 'Raspberry Pi Foundation'),
+    ]
+
+
+def test_parse_registry_csv_rejects_unexpected_header():
+    with pytest.raises(ValueError, match='Organization Name'):
+        list(parse_registry_csv(io.StringIO('Registry,Assignment,Name\nMA-L,001B63,X\n')))
+    with pytest.raises(ValueError):
+        list(parse_registry_csv(io.StringIO('<html>erro</html>\n')))
+
+
+@pytest.mark.parametrize('mac,vendor', [
+    ('00:1b:63:a1:23:45', 'Small Vendor'),   # MA-S vence MA-M e MA-L
+    ('00:1B:63:A9:00:01', 'Medium Vendor'),  # MA-M vence MA-L
+    ('00-1b-63-00-00-01', 'Large Vendor'),
+    ('b827.eb00.0001', 'Raspberry Pi Foundation'),
+    ('02:00:00:00:00:01', None),
+    ('ff:ff:ff:ff:ff:ff', None),
+    ('não é um MAC', None),
+])
+def test_lookup_longest_prefix(database, mac, vendor):
+    assert database.lookup(mac) == vendor
+
+
+def test_lookup_int_and_size(database):
+    assert len(database) == 4
+    assert database.lookup_int(mac_to_int('001B63A12FFF')) == 'Small Vendor'
+    assert database.lookup_int(0) is None
+
+
+def test_open_rejects_invalid_index(tmp_path):
+    bad = tmp_path / 'bad.idx'
+    bad.write_bytes(b'NOPE' + bytes(60))
+    assert OUIDatabase.open(str(bad)) is None
+    assert OUIDatabase.open(str(tmp_path / 'missing.idx')) is None
+
+
+def test_cli_build_and_lookup(tmp_path, capsys):
+    source = tmp_path / 'oui.csv'
+    source.write_text(REGISTRY_CSV, encoding='utf-8')
+    index = str(tmp_path / 'out' / 'oui.idx')
+
+    main(['build', str(source), '-o', index])
+    main(['lookup', '-i', index, '00:1b:63:a1:23:45', '02:00:00:00:00:01'])
+    assert capsys.readouterr().out.splitlines() == [
+        f"4 prefixos gravados em {index}",
+        '00:1b:63:a1:23:45: Small Vendor',
+        '02:00:00:00:00:01: Unknown',
+    ]
@@ -0,0 +1,52 @@
+import pytest
+
+from scanner import records
+from scanner.probes import SNMP_OIDS
+from scanner.records import HostRecord
+
+KNOWN = list(SNMP_OIDS)
+
+
+def test_roundtrip_to_info():
+    info = {'ip': '192.0.2.10', 'name': 'router.example', 'mac': '52:54:00:ab:cd:01',
+            'vendor': 'Acme', 'snmp_info': {KNOWN[1]: 'b', KNOWN[0]: 'a'}}
+    record = HostRecord.from_info(info)
+    assert record.to_info() == info
+    assert list(record.snmp_items()) == [(KNOWN[0], 'a'), (KNOWN[1], 'b')]
+    assert record['ip'] == '192.0.2.10'
+    assert record.get('snmp_info') == info['snmp_info']
+    with pytest.raises(KeyError):
+        record['seen_at']
+
+
+def test_ipv6_and_empty_fields():
+    record = HostRecord('2001:db8::1')
+    assert record.to_info() == {'ip': '2001:db8::1', 'name': None, 'mac': None,
+                                'vendor': None, 'snmp_info': None}
+    assert record.get('name', '?') == '?'
+
+
+@pytest.mark.parametrize('mac', ['52:54:00:AB:CD:01', '52-54-00-ab-cd-01', '5254.00ab.cd01', '525400abcd01'])
+def test_mac_notations_are_normalized(mac):
+    assert HostRecord('192.0.2.1', mac=mac).mac == '52:54:00:ab:cd:01'
+
+
+@pytest.mark.parametrize('mac', ['02:00:00:00:00:00:00:01', 'unknown', 'zz:zz:zz:zz:zz:zz'])
+def test_unparsable_mac_is_kept_as_is(mac):
+    assert HostRecord('192.0.2.1', mac=mac).mac == mac
+
+
+def test_unknown_snmp_fields_are_capped(monkeypatch):
+    monkeypatch.setattr(records, '_SNMP_FIELDS', list(KNOWN))
+    monkeypatch.setattr(records, '_SNMP_INDEX', {name: index for index, name in enumerate(KNOWN)})
+    monkeypatch.setattr(records, '_MAX_SNMP_FIELDS', len(KNOWN) + 2)
+
+    snmp_info = {KNOWN[0]: 'a', 'extra 1': '1', 'extra 2': '2', 'extra 3': '3', 'extra 4': '4'}
+    record = HostRecord('192.0.2.1', snmp_info=snmp_info)
+    assert record.snmp_info == snmp_info
+    assert len(records._SNMP_FIELDS) == len(KNOWN) + 2
+
+    # Outros hosts com novos nomes não fazem a lista crescer
+    other = HostRecord('192.0.2.2', snmp_info={'extra 5': '5', 'extra 1': 'x'})
+    assert other.snmp_info == {'extra 1': 'x', 'extra 5': '5'}
+    assert len(records._SNMP_FIELDS) == len(KNOWN) + 2
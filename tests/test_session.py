@@ -0,0 +1,79 @@
+import asyncio
+import json
+from typing import List
+
+import pytest
+
+from scanner import session
+from scanner.monitor import MONITORS, Monitor
+from scanner.records import HostRecord
+from scanner.session import ClientSession
+from scanner.store import ResultStore
+from scanner.utils import parse_cidr
+
+
+class _Writer:
+    """StreamWriter falso: guarda os quadros escritos."""
+
+    def __init__(self) -> None:
+        self.frames: List[dict] = []
+
+    def write(self, data: bytes) -> None:
+        self.frames.extend(json.loads(line) for line in data.splitlines())
+
+    async def drain(self) -> None:
+        pass
+
+
+def _session() -> ClientSession:
+    return ClientSession(None, _Writer(), ('127.0.0.1', 0))  # type: ignore[arg-type]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    result_store = ResultStore(str(tmp_path / 'history.sqlite3'), flush_interval=0.01)
+    monkeypatch.setattr(session, 'RESULT_STORE', result_store)
+    yield result_store
+    result_store.close()
+
+
+def test_history_streams_one_frame_per_host(store):
+    scan_id = store.begin_scan('192.0.2.0/24', 'full')
+    for i in range(1, 4):
+        store.record(scan_id, {'ip': f'192.0.2.{i}', 'name': f'h{i}'}, seen_at=100.0)
+    store.finish_scan(scan_id, 3)
+    client = _session()
+
+    async def main():
+        await client._on_history({'v': 1, 'id': 'h', 'type': 'history', 'cidr': '192.0.2.0/24'})
+        await client._on_history({'v': 1, 'id': 'm', 'type': 'history', 'mac': '52:54:00:00:00:09'})
+
+    asyncio.run(main())
+    frames = client.writer.frames
+    assert [(f['type'], f['id']) for f in frames] == [('history', 'h')] * 3 + [('done', 'h'), ('done', 'm')]
+    assert sorted(f['host']['ip'] for f in frames[:3]) == ['192.0.2.1', '192.0.2.2', '192.0.2.3']
+    assert all(f['cidr'] == '192.0.2.0/24' for f in frames[:4])
+    assert (frames[3]['count'], frames[4]['count'], frames[4]['mac']) == (3, 0, '52:54:00:00:00:09')
+
+
+def test_monitor_snapshot_streams_one_frame_per_host():
+    host_range = parse_cidr('192.0.2.0/29')
+    monitor = Monitor(host_range, 'public', 300.0)
+    monitor.cycle = 4
+    monitor.hosts = {ip: HostRecord(ip, name=ip) for ip in ('192.0.2.1', '192.0.2.2')}
+    client = _session()
+
+    async def main():
+        monitor._task = asyncio.get_running_loop().create_future()  # Sem ciclos automáticos
+        MONITORS._monitors[(host_range, 'public', 300.0)] = monitor
+        job = asyncio.ensure_future(client._run_monitor('m', host_range, 'public', 300.0))
+        await asyncio.sleep(0.05)
+        job.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+
+    asyncio.run(main())
+    assert len(MONITORS) == 0
+    frames = client.writer.frames
+    assert [f['type'] for f in frames] == ['accepted', 'snapshot', 'snapshot', 'snapshot_done']
+    assert [f['host']['ip'] for f in frames[1:3]] == ['192.0.2.1', '192.0.2.2']
+    assert (frames[3]['cycle'], frames[3]['count']) == (4, 2)
@@ -0,0 +1,112 @@
+import asyncio
+import ipaddress
+import sqlite3
+import threading
+
+import pytest
+
+from scanner.store import _SCHEMA, _UPSERT_LATEST, ResultStore
+from scanner.utils import parse_cidr
+
+FULL = {'ip': '192.0.2.10', 'name': 'router.example', 'mac': '52:54:00:AB:CD:01',
+        'vendor': 'Acme', 'snmp_info': {'Nome do Sistema': 'router'}}
+SWEEP = {'ip': '192.0.2.10'}
+
+
+def _row(scan_id, seen_at, ip, mac=None, name=None, vendor=None, snmp_info=None):
+    return (scan_id, seen_at, ipaddress.ip_address(ip).packed, ip, mac, name, vendor, snmp_info)
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(':memory:')
+    connection.executescript(_SCHEMA)
+    yield connection
+    connection.close()
+
+
+def _latest(connection, ip):
+    return connection.execute(
+        'SELECT scan_id, seen_at, mac, name, vendor, snmp_info FROM latest WHERE ip = ?',
+        (ipaddress.ip_address(ip).packed,)).fetchone()
+
+
+def test_upsert_inserts_new_ip(conn):
+    conn.execute(_UPSERT_LATEST, _row('s1', 10.0, '192.0.2.1', 'aa:bb:cc:dd:ee:ff', 'a', 'V', '{}'))
+    assert _latest(conn, '192.0.2.1') == ('s1', 10.0, 'aa:bb:cc:dd:ee:ff', 'a', 'V', '{}')
+
+
+def test_upsert_keeps_enrichment_missing_from_newer_row(conn):
+    conn.execute(_UPSERT_LATEST, _row('s1', 10.0, '192.0.2.1', 'aa:bb:cc:dd:ee:ff', 'a', 'V', '{"x": 1}'))
+    # Varredura ICMP mais recente: só IP
+    conn.execute(_UPSERT_LATEST, _row('s2', 20.0, '192.0.2.1'))
+    assert _latest(conn, '192.0.2.1') == ('s2', 20.0, 'aa:bb:cc:dd:ee:ff', 'a', 'V', '{"x": 1}')
+
+
+def test_upsert_replaces_fields_present_in_newer_row(conn):
+    conn.execute(_UPSERT_LATEST, _row('s1', 10.0, '192.0.2.1', 'aa:bb:cc:dd:ee:ff', 'a', 'V', '{}'))
+    conn.execute(_UPSERT_LATEST, _row('s2', 20.0, '192.0.2.1', '11:22:33:44:55:66', None, 'W'))
+    assert _latest(conn, '192.0.2.1') == ('s2', 20.0, '11:22:33:44:55:66', 'a', 'W', '{}')
+
+
+def test_upsert_ignores_older_row(conn):
+    conn.execute(_UPSERT_LATEST, _row('s2', 20.0, '192.0.2.1', name='new'))
+    conn.execute(_UPSERT_LATEST, _row('s1', 10.0, '192.0.2.1', 'aa:bb:cc:dd:ee:ff', 'old'))
+    assert _latest(conn, '192.0.2.1') == ('s2', 20.0, None, 'new', None, None)
+
+
+def test_store_history_and_last_state(tmp_path):
+    store = ResultStore(str(tmp_path / 'history.sqlite3'), flush_interval=0.01)
+
+    async def main():
+        full = store.begin_scan('192.0.2.0/24', 'full')
+        store.record(full, FULL, seen_at=100.0)
+        store.finish_scan(full, 1)
+        sweep = store.begin_scan('192.0.2.0/24', 'sweep')
+        store.record(sweep, SWEEP, seen_at=200.0)
+        store.record(sweep, {'ip': '2001:db8::1'}, seen_at=200.0)
+        store.finish_scan(sweep, 2)
+        return (await store.last_state(parse_cidr('192.0.2.0/24')),
+                await store.host_history('192.0.2.10'),
+                await store.mac_last_seen('52-54-00-ab-cd-01'))
+
+    try:
+        state, history, last_seen = asyncio.run(main())
+    finally:
+        store.close()
+
+    assert len(state) == 1  # O IPv6 fica fora da faixa IPv4
+    assert state[0]['seen_at'] == 200.0
+    assert (state[0]['mac'], state[0]['name'], state[0]['vendor'], state[0]['snmp_info']) == (
+        '52:54:00:ab:cd:01', 'router.example', 'Acme', {'Nome do Sistema': 'router'})
+    assert [entry['seen_at'] for entry in history] == [200.0, 100.0]
+    assert history[0]['mac'] is None  # O histórico guarda cada aparição como veio
+    assert last_seen['seen_at'] == 100.0
+
+
+def test_store_opens_database_in_writer_thread(tmp_path, monkeypatch):
+    threads = []
+    original = ResultStore._connect
+
+    def connect(self):
+        threads.append(threading.current_thread().name)
+        return original(self)
+
+    monkeypatch.setattr(ResultStore, '_connect', connect)
+    store = ResultStore(str(tmp_path / 'history.sqlite3'))
+    store.begin_scan('192.0.2.0/24', 'full')
+    assert store.flush(5)
+    store.close()
+    assert threads == ['result-store-writer']
+
+
+def test_unusable_path_disables_store(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    store = ResultStore(str(blocker / 'history.sqlite3'))
+    store.record(store.begin_scan('192.0.2.0/24', 'full'), FULL)
+    assert store.flush(5)  # Lotes descartados, sem travar quem espera
+
+    with pytest.raises(ValueError, match='indisponível'):
+        asyncio.run(store.host_history('192.0.2.10'))
+    store.close()
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import random
+import threading
+from array import array
+
+import pytest
+
+from scanner import timeseries
+from scanner.timeseries import (
+    TS_METRICS, TimeSeriesStore, _put_varint, _SeriesEncoder, _varint_column, _varints,
+)
+
+METRIC = TS_METRICS[0][0]
+
+
+@pytest.mark.parametrize('value', [0, 1, -1, 63, -64, 64, -65, 2 ** 31, -2 ** 31, 2 ** 63 - 1, -2 ** 63])
+def test_varint_roundtrip(value):
+    buf = bytearray()
+    _put_varint(buf, value)
+    assert list(_varints(buf)) == [value]
+
+
+def test_small_values_take_one_byte():
+    for value in range(-64, 64):
+        buf = bytearray()
+        _put_varint(buf, value)
+        assert len(buf) == 1
+
+
+def test_varint_stream_roundtrip():
+    rng = random.Random(7)
+    values = [rng.randint(-2 ** 40, 2 ** 40) for _ in range(1000)] + [0] * 10
+    buf = bytearray()
+    for value in values:
+        _put_varint(buf, value)
+    assert list(_varints(buf)) == values
+
+
+def test_encoder_roundtrip_irregular_series():
+    rng = random.Random(11)
+    timestamps, values = [], []
+    now, counter = 1_700_000_000_000, 0
+    for _ in range(500):
+        now += rng.choice([60_000, 60_000, 59_998, 61_500, 300_000])
+        counter += rng.randint(-5, 10 ** 6)  # Contadores também zeram (wrap/reinício)
+        timestamps.append(now)
+        values.append(counter)
+    encoder = _SeriesEncoder(0)
+    for timestamp, value in zip(timestamps, values):
+        encoder.append(timestamp, value)
+    assert encoder.decode() == (array('q', timestamps), array('q', values))
+
+
+@pytest.mark.parametrize('values', [
+    [0, 1, -1, 63, -64] * 20,                          # Só varints de um byte
+    [60_000] + [0] * 200 + [-1_500, 1_500] + [0] * 50,  # Poucos varints longos
+    [random.Random(3).randint(-2 ** 40, 2 ** 40) for _ in range(300)],
+])
+def test_varint_column_matches_stream_decoder(values):
+    buf = bytearray()
+    for value in values:
+        _put_varint(buf, value)
+    assert _varint_column(buf) == list(_varints(buf)) == values
+
+
+def test_regular_series_is_compact():
+    encoder = _SeriesEncoder(0)
+    for i in range(1000):
+        encoder.append(1_700_000_000_000 + i * 60_000, i * 3)
+    # Delta-of-delta zero e delta constante: um byte por ponto em cada coluna,
+    # exceto o primeiro intervalo (60000 ms, três bytes)
+    assert len(encoder.times) == 3 + 998
+    assert len(encoder.values) == 999
+
+
+def test_store_roundtrip_through_disk(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), segment_points=100)
+    points = [(1_700_000_000_000 + i * 60_000, i * i) for i in range(250)]
+    for timestamp, value in points:
+        store.append('192.0.2.1', timestamp, {METRIC: value})
+    store.append('192.0.2.1', points[10][0], {METRIC: -1})  # Fora de ordem: ignorado
+
+    # Dois blocos selados em disco e um em memória
+    timestamps, values = asyncio.run(store.query('192.0.2.1', METRIC))
+    assert list(zip(timestamps, values)) == points
+    store.close()
+
+    reopened = TimeSeriesStore(str(tmp_path))
+    timestamps, values = asyncio.run(reopened.query('192.0.2.1', METRIC, points[50][0], points[149][0]))
+    assert list(zip(timestamps, values)) == points[50:150]
+    assert asyncio.run(reopened.query('192.0.2.2', METRIC)) == (array('q'), array('q'))
+    reopened.close()
+
+
+def test_disk_io_runs_off_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+    original = TimeSeriesStore._write_blocks
+
+    def write_blocks(self, key, blocks):
+        threads.append(threading.current_thread().name)
+        return original(self, key, blocks)
+
+    monkeypatch.setattr(TimeSeriesStore, '_write_blocks', write_blocks)
+    store = TimeSeriesStore(str(tmp_path), segment_points=10)
+
+    async def main():
+        for i in range(25):
+            store.append('192.0.2.1', 1_000 + i, {METRIC: i})
+        # Os dois blocos selados ainda podem estar na fila: a consulta espera por eles
+        return await store.query('192.0.2.1', METRIC)
+
+    timestamps, values = asyncio.run(main())
+    store.close()
+    assert list(timestamps) == [1_000 + i for i in range(25)] and list(values) == list(range(25))
+    assert set(threads) == {'timeseries-writer'}
+
+
+def test_sealed_blocks_are_decoded_once(tmp_path, monkeypatch):
+    store = TimeSeriesStore(str(tmp_path), segment_points=10)
+    for i in range(35):
+        store.append('192.0.2.1', 1_000 + i, {METRIC: i})
+    decoded = []
+    original = timeseries._decode
+
+    def decode(count, *args):
+        decoded.append(count)
+        return original(count, *args)
+
+    monkeypatch.setattr(timeseries, '_decode', decode)
+
+    async def main():
+        first = await store.query('192.0.2.1', METRIC)
+        second = await store.aggregate('192.0.2.1', METRIC)
+        return first, second
+
+    (timestamps, _), summary = asyncio.run(main())
+    store.close()
+    assert len(timestamps) == 35 and summary[0]['count'] == 35
+    # Três blocos selados decodificados uma vez; o bloco em memória (5 pontos) a cada consulta
+    assert decoded == [10, 10, 10, 5, 5]
+
+
+def test_truncated_file_keeps_complete_blocks(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), segment_points=10)
+    for i in range(25):
+        store.append('192.0.2.1', 1_000 + i, {METRIC: i})
+    store.close()
+    (path,) = [os.path.join(tmp_path, name) for name in os.listdir(tmp_path)]
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    reopened = TimeSeriesStore(str(tmp_path))
+    timestamps, _ = asyncio.run(reopened.query('192.0.2.1', METRIC))
+    reopened.close()
+    assert list(timestamps) == [1_000 + i for i in range(20)]
+
+
+def test_aggregate_buckets(tmp_path):
+    store = TimeSeriesStore(str(tmp_path))
+    for i in range(10):
+        store.append('192.0.2.1', i * 1000, {METRIC: i})
+    buckets = asyncio.run(store.aggregate('192.0.2.1', METRIC, step=5000))
+    store.close()
+    assert [(b['t'], b['min'], b['max'], b['count'], b['last']) for b in buckets] == [
+        (0, 0, 4, 5, 4), (5000, 5, 9, 5, 9)]
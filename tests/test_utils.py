@@ -0,0 +1,79 @@
+import ipaddress
+from typing import List, Optional
+
+import pytest
+
+from scanner.utils import HostRange, parse_cidr
+
+
+def _legacy_parse_cidr(cidr_string: str) -> Optional[List[str]]:
+    """O parse_cidr original, que materializava a lista de hosts."""
+    try:
+        network = ipaddress.ip_network(cidr_string.strip(), strict=False)
+        host_ips = [str(ip) for ip in network.hosts()]
+        if not host_ips:
+            host_ips = [str(network.network_address)]
+        return host_ips
+    except ValueError:
+        return None
+
+
+CIDRS = (
+    ['192.0.2.0/%d' % prefix for prefix in range(20, 33)]
+    + ['10.1.2.3/24', ' 172.16.0.0/30 ', '198.51.100.7', '0.0.0.0/28']
+    + ['2001:db8::/%d' % prefix for prefix in range(116, 129)]
+    + ['2001:db8::1234/120', 'fe80::1']
+)
+
+
+@pytest.mark.parametrize('cidr', CIDRS)
+def test_matches_legacy_parse_cidr(cidr):
+    host_range = parse_cidr(cidr)
+    expected = _legacy_parse_cidr(cidr)
+    assert list(host_range) == expected
+    assert len(host_range) == host_range.size == len(expected)
+    assert bool(host_range)
+    assert all(ip in host_range for ip in expected)
+
+
+@pytest.mark.parametrize('cidr', ['', '192.0.2.0/33', '300.0.0.0/24', 'not-a-network', '2001:db8::/129'])
+def test_invalid_cidr(cidr):
+    assert parse_cidr(cidr) is None
+    assert _legacy_parse_cidr(cidr) is None
+
+
+def test_huge_range_is_not_materialized():
+    host_range = parse_cidr('2001:db8::/64')
+    assert host_range.size == 2 ** 64 - 1
+    with pytest.raises(OverflowError):
+        len(host_range)
+    first = next(iter(host_range))
+    assert first == '2001:db8::1'
+    assert '2001:db8::ffff:ffff:ffff:ffff' in host_range
+    assert '2001:db9::1' not in host_range
+    assert '10.0.0.1' not in host_range
+    assert 'garbage' not in host_range
+
+
+@pytest.mark.parametrize('cidr,size', [('192.0.2.0/24', 16), ('192.0.2.0/24', 100), ('192.0.2.0/30', 1000)])
+def test_chunks_cover_range_in_order(cidr, size):
+    host_range = parse_cidr(cidr)
+    chunks = list(host_range.chunks(size))
+    assert all(0 < chunk.size <= size for chunk in chunks)
+    assert [ip for chunk in chunks for ip in chunk] == list(host_range)
+
+
+@pytest.mark.parametrize('parts', [1, 3, 7, 254, 1000])
+def test_split_is_balanced(parts):
+    host_range = parse_cidr('192.0.2.0/24')
+    pieces = host_range.split(parts)
+    assert len(pieces) == min(parts, host_range.size)
+    assert max(piece.size for piece in pieces) - min(piece.size for piece in pieces) <= 1
+    assert [ip for piece in pieces for ip in piece] == list(host_range)
+
+
+def test_equality_and_hash():
+    assert parse_cidr('192.0.2.0/24') == HostRange(4, int(ipaddress.ip_address('192.0.2.1')),
+                                                   int(ipaddress.ip_address('192.0.2.254')))
+    assert len({parse_cidr('192.0.2.0/24'), parse_cidr('192.0.2.5/24')}) == 1
+    assert parse_cidr('192.0.2.0/24') != parse_cidr('192.0.2.0/25')